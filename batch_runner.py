@@ -0,0 +1,307 @@
+"""
+Non-interactive batch mode.
+
+Streams prompts from a JSONL file through PromptCompressor in chunks and
+writes one CompressionResult record per prompt as it goes, either to a
+JSONL file or to numbered Parquet part files. After every chunk is on disk
+a checkpoint records how far the job got, so a restarted job skips the
+finished lines (and the LLM calls already paid for) and continues.
+
+A prompt whose compression raises (a safety-blocked response, retries
+running out) does not stop the job: its chunk is retried one prompt at a
+time and the failing prompt gets an {"id", "line", "error"} record.
+
+Input lines are either a JSON string or an object with a "prompt" (or
+"text") field and an optional "id":
+
+    {"id": "doc-1", "prompt": "Please summarize ..."}
+
+    python batch_runner.py --input prompts.jsonl --output results.jsonl --workers 8
+    python batch_runner.py --input prompts.jsonl --output results/ --format parquet
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Iterator
+
+# Ensure project root is on sys.path
+project_root = Path(__file__).resolve().parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from layers.prompt_compressing_layer import PromptCompressor
+from evaluation.result import CompressionResult
+
+
+def read_prompts(path: str, start_line: int = 0) -> Iterator[tuple[int, str | None, str | None]]:
+    """
+    Yields (line_number, id, prompt) from `start_line` on, one line at a time.
+    Lines that cannot be parsed yield prompt=None and are reported, not fatal.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            if line_number < start_line:
+                continue
+            line = line.strip()
+            if not line:
+                yield line_number, None, None
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[BatchRunner] Skipping line {line_number}: {e}", file=sys.stderr)
+                yield line_number, None, None
+                continue
+
+            if isinstance(record, str):
+                yield line_number, None, record
+                continue
+            # A null or empty "prompt" falls back to "text"
+            prompt = record.get("prompt") or record.get("text") if isinstance(record, dict) else None
+            if isinstance(prompt, str):
+                yield line_number, record.get("id"), prompt
+            else:
+                print(f"[BatchRunner] Skipping line {line_number}: no prompt field", file=sys.stderr)
+                yield line_number, None, None
+
+
+# -------------------------------
+# Output writers
+# -------------------------------
+class JsonlResultWriter:
+    """Appends records to one JSONL file; position() is its byte size."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def resume(self, position: int) -> None:
+        # Drop anything written after the last checkpoint (a chunk cut short by a crash)
+        mode = "r+b" if os.path.exists(self.path) else "w+b"
+        with open(self.path, mode) as f:
+            f.truncate(position)
+
+    def write(self, records: list[dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def position(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+
+class ParquetResultWriter:
+    """Writes each chunk as directory/part-NNNNN.parquet; position() is the part count."""
+
+    def __init__(self, directory: str):
+        import pyarrow  # noqa: F401 – fail early when the optional dependency is missing
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._parts = 0
+
+    def _part_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"part-{index:05d}.parquet")
+
+    def resume(self, position: int) -> None:
+        self._parts = position
+        for name in os.listdir(self.directory):
+            if name.startswith("part-") and name.endswith(".parquet"):
+                if int(name[len("part-"):-len(".parquet")]) >= position:
+                    os.remove(os.path.join(self.directory, name))
+
+    def write(self, records: list[dict]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not records:
+            return
+        # metadata has no fixed schema; keep it as a JSON string column
+        rows = [{**r, "metadata": json.dumps(r["metadata"]) if r.get("metadata") is not None else None}
+                for r in records]
+        tmp_path = self._part_path(self._parts) + ".tmp"
+        pq.write_table(pa.Table.from_pylist(rows, schema=self._schema()), tmp_path)
+        os.replace(tmp_path, self._part_path(self._parts))
+        self._parts += 1
+
+    def position(self) -> int:
+        return self._parts
+
+    @staticmethod
+    def _schema():
+        # Fixed so every part has the same column types, even when a chunk is all nulls
+        import pyarrow as pa
+
+        from evaluation.result_store import result_fields
+
+        return pa.schema([("id", pa.string()), ("line", pa.int64()), *result_fields(), ("error", pa.string())])
+
+
+# -------------------------------
+# Job
+# -------------------------------
+class BatchJob:
+    def __init__(
+        self,
+        compressor: PromptCompressor,
+        input_path: str,
+        output_path: str,
+        output_format: str = "jsonl",
+        checkpoint_path: str | None = None,
+        chunk_size: int = 64,
+        workers: int = 8,
+    ):
+        """
+        :param output_path: JSONL file, or a directory of part files for "parquet".
+        :param checkpoint_path: Progress file (defaults to <output_path>.checkpoint.json).
+        :param chunk_size: Prompts per compress_batch call; progress is saved after each.
+        :param workers: Gemini calls in flight per chunk.
+        """
+        if output_format not in ("jsonl", "parquet"):
+            raise ValueError(f"Unknown output format: {output_format}")
+
+        self.compressor = compressor
+        self.input_path = input_path
+        self.output_path = output_path
+        self.output_format = output_format
+        self.checkpoint_path = checkpoint_path or f"{output_path.rstrip(os.sep)}.checkpoint.json"
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+        if output_format == "parquet":
+            self.writer = ParquetResultWriter(output_path)
+        else:
+            self.writer = JsonlResultWriter(output_path)
+
+    def _load_checkpoint(self) -> dict:
+        if not os.path.exists(self.checkpoint_path):
+            return {"next_line": 0, "position": 0, "written": 0, "skipped": 0, "failed": 0}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("input") != os.path.abspath(self.input_path):
+            raise RuntimeError(f"Checkpoint {self.checkpoint_path} belongs to {checkpoint.get('input')}")
+        checkpoint.setdefault("failed", 0)
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict) -> None:
+        checkpoint = {**checkpoint, "input": os.path.abspath(self.input_path), "format": self.output_format}
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    @staticmethod
+    def _record(line_number: int, record_id, result: CompressionResult) -> dict:
+        return {"id": str(record_id) if record_id is not None else str(line_number), "line": line_number,
+                **dataclasses.asdict(result)}
+
+    @staticmethod
+    def _error_record(line_number: int, record_id, error: Exception) -> dict:
+        return {"id": str(record_id) if record_id is not None else str(line_number), "line": line_number,
+                "error": f"{type(error).__name__}: {error}"}
+
+    def _compress_chunk(self, chunk: list) -> list[dict]:
+        try:
+            results = self.compressor.compress_batch([prompt for _, _, prompt in chunk], max_workers=self.workers)
+            return [self._record(n, rid, r) for (n, rid, _), r in zip(chunk, results)]
+        except Exception as e:
+            print(f"[BatchRunner] Chunk failed ({type(e).__name__}: {e}); retrying one prompt at a time",
+                  file=sys.stderr)
+
+        # Isolate the failing prompts so one of them cannot stall the job on every resume
+        records = []
+        for line_number, record_id, prompt in chunk:
+            try:
+                records.append(self._record(line_number, record_id, self.compressor.compress_prompt(prompt)))
+            except Exception as e:
+                print(f"[BatchRunner] Line {line_number} failed: {type(e).__name__}: {e}", file=sys.stderr)
+                records.append(self._error_record(line_number, record_id, e))
+        return records
+
+    def _flush(self, chunk: list, checkpoint: dict, next_line: int) -> None:
+        if chunk:
+            records = self._compress_chunk(chunk)
+            self.writer.write(records)
+            failed = sum("error" in record for record in records)
+            checkpoint["written"] += len(records) - failed
+            checkpoint["failed"] += failed
+        checkpoint["next_line"] = next_line
+        checkpoint["position"] = self.writer.position()
+        self._save_checkpoint(checkpoint)
+        print(f"[BatchRunner] {checkpoint['written']} written, {checkpoint['failed']} failed, next line {next_line}")
+
+    def run(self) -> dict:
+        """Process the input from the last checkpoint to the end; returns the final checkpoint."""
+        checkpoint = self._load_checkpoint()
+        if checkpoint["next_line"]:
+            print(f"[BatchRunner] Resuming at line {checkpoint['next_line']} "
+                  f"({checkpoint['written']} already written)")
+        self.writer.resume(checkpoint["position"])
+
+        chunk = []
+        next_line = checkpoint["next_line"]
+        for line_number, record_id, prompt in read_prompts(self.input_path, checkpoint["next_line"]):
+            if prompt is None:
+                checkpoint["skipped"] += 1
+            else:
+                chunk.append((line_number, record_id, prompt))
+            next_line = line_number + 1
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk, checkpoint, next_line)
+                chunk = []
+
+        self._flush(chunk, checkpoint, next_line)
+        return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="JSONL file of prompts")
+    parser.add_argument("--output", required=True, help="JSONL file, or directory for --format parquet")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--no-llm", action="store_true", help="Skip the Gemini rewrite stage")
+    parser.add_argument("--no-similarity", action="store_true", help="Skip input_similarity scoring")
+    parser.add_argument("--counter", default=None, help="Token counter backend (see utils.token_counters)")
+    parser.add_argument("--cache", default=None, help="SQLite file for the compression cache")
+    parser.add_argument("--metrics", default=None, help="JSONL file receiving per-stage timing/counter events")
+    args = parser.parse_args()
+
+    from utils.token_counters import make_token_counter
+    from utils.compression_cache import CompressionCache
+    from utils.instrumentation import Instrumentation, JsonlSink
+
+    compressor = PromptCompressor(
+        use_llm=not args.no_llm,
+        counter=make_token_counter(args.counter),
+        cache=CompressionCache(db_path=args.cache) if args.cache else None,
+        score_similarity=not args.no_similarity,
+        instrumentation=Instrumentation([JsonlSink(args.metrics)]) if args.metrics else None,
+    )
+    compressor.warmup()
+
+    job = BatchJob(
+        compressor,
+        args.input,
+        args.output,
+        output_format=args.format,
+        checkpoint_path=args.checkpoint,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+    )
+    checkpoint = job.run()
+    print(f"[BatchRunner] Done: {checkpoint['written']} written, {checkpoint['failed']} failed, "
+          f"{checkpoint['skipped']} skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Async pipeline concurrency benchmark.
+
+Runs N prompts through AsyncPromptCompressor with Gemini replaced by a local
+stub of fixed latency and Lingua replaced by a passthrough, then compares
+the wall time against the slowest single call.
+
+    python benchmarks/async_concurrency.py --prompts 100 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+# The stub never reaches the network; satisfy the shared client's config checks
+os.environ.setdefault("GENAI_API_KEY", "stub")
+os.environ.setdefault("MODEL_MAIN", "stub-model")
+
+from benchmarks.gemini_stub import StubGenerativeModel, PassthroughCompressor
+from compressors.llm_compression import LLMCompressor
+from layers.async_prompt_compressing_layer import AsyncPromptCompressor
+from layers.prompt_compressing_layer import PromptCompressor
+from utils.token_counters import ApproxTokenCounter
+
+
+def build(latency: float, jitter: float, concurrency: int) -> AsyncPromptCompressor:
+    compressor = PromptCompressor(use_llm=True, counter=ApproxTokenCounter())
+    compressor.lingua = PassthroughCompressor()
+    compressor.llm = LLMCompressor(model=StubGenerativeModel(latency=latency, jitter=jitter))
+    return AsyncPromptCompressor(compressor, max_concurrency=concurrency, score_similarity=False)
+
+
+async def run(args) -> None:
+    prompts = [f"Prompt {i}: please summarize this reaaally long text!!! " * 20 for i in range(args.prompts)]
+    async_compressor = build(args.latency, args.jitter, args.concurrency)
+
+    start = time.perf_counter()
+    await async_compressor.compress_prompt(prompts[0])
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await async_compressor.compress_many(prompts)
+    total = time.perf_counter() - start
+
+    async_compressor.close()
+    slowest = args.latency + args.jitter
+    print(f"\n== Async concurrency ({len(results)} prompts, concurrency={args.concurrency}) ==")
+    print(f"Single prompt:      {single:.3f}s")
+    print(f"All prompts:        {total:.3f}s")
+    print(f"Slowest stub call:  {slowest:.3f}s")
+    print(f"Overhead vs slowest: {total / slowest:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Local deterministic stand-in for google.generativeai.GenerativeModel.
+
+Implements the subset the pipeline uses (generate_content, count_tokens and
+their async variants) with configurable latency, so benchmarks can exercise
+the full pipeline without network access or API keys.
+"""
+
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from utils.token_counters import TokenCounter
+
+
+class StubGenerativeModel:
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.0,
+        keep_ratio: float = 0.6,
+        seed: int = 0,
+        count_latency: float = 0.0,
+    ):
+        """
+        :param latency: Base seconds per generate_content call.
+        :param jitter: Extra uniform random seconds added per call (0..jitter).
+        :param keep_ratio: Fraction of words the "rewrite" keeps.
+        :param count_latency: Seconds per count_tokens call.
+        """
+        self.latency = latency
+        self.count_latency = count_latency
+        self.jitter = jitter
+        self.keep_ratio = keep_ratio
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self) -> float:
+        return self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    @staticmethod
+    def _text_of(contents) -> str:
+        if isinstance(contents, (list, tuple)):
+            return "\n".join(str(part) for part in contents)
+        return str(contents)
+
+    def _rewrite(self, contents) -> SimpleNamespace:
+        self.calls += 1
+        words = self._text_of(contents).split()
+        kept = words[: max(1, int(len(words) * self.keep_ratio))]
+        return SimpleNamespace(text=" ".join(kept), usage_metadata=None)
+
+    @staticmethod
+    def _count(contents) -> SimpleNamespace:
+        words = StubGenerativeModel._text_of(contents).split()
+        return SimpleNamespace(total_tokens=round(len(words) * 1.3))
+
+    def generate_content(self, contents, **kwargs):
+        time.sleep(self._delay())
+        return self._rewrite(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(self._delay())
+        return self._rewrite(contents)
+
+    def count_tokens(self, contents, **kwargs):
+        if self.count_latency:
+            time.sleep(self.count_latency)
+        return self._count(contents)
+
+    async def count_tokens_async(self, contents, **kwargs):
+        if self.count_latency:
+            await asyncio.sleep(self.count_latency)
+        return self._count(contents)
+
+
+class StubTokenCounter(TokenCounter):
+    """GeminiTokenCounter stand-in that counts through a StubGenerativeModel."""
+
+    def __init__(self, model: StubGenerativeModel | None = None):
+        self.model = model or StubGenerativeModel()
+
+    def count_text(self, text: str, operation: str = "") -> int:
+        return self.model.count_tokens(text).total_tokens
+
+    async def count_text_async(self, text: str, operation: str = "") -> int:
+        return (await self.model.count_tokens_async(text)).total_tokens
+
+
+class PassthroughCompressor:
+    """Stage stand-in that returns its input unchanged (e.g. in place of Lingua)."""
+
+    model_name = "passthrough"
+    ratio = 1.0
+
+    def warmup(self) -> bool:
+        return True
+
+    def compress(self, text: str) -> str:
+        return text
+
+    def compress_batch(self, texts: list[str]) -> list[str]:
+        return list(texts)
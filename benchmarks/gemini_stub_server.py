@@ -0,0 +1,141 @@
+"""
+Local Gemini REST stub server.
+
+Serves POST /v1beta/models/<model>:generateContent and :countTokens with the
+same deterministic behaviour as StubGenerativeModel, plus injected latency
+and errors (429 with Retry-After, 503), so the client layer's retries,
+deadlines, rate limiting and deduplication can be exercised end to end.
+
+    python benchmarks/gemini_stub_server.py --port 8089 --latency 0.2 --error-rate 0.1
+    GEMINI_BASE_URL=http://127.0.0.1:8089 python orchestrator.py
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks.gemini_stub import StubGenerativeModel
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0,
+                 retry_after: float | None = None, keep_ratio: float = 0.6, seed: int = 0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.stub = StubGenerativeModel(latency=0.0, keep_ratio=keep_ratio)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {"generateContent": 0, "countTokens": 0, "errors": 0}
+
+    def handle_error(self, request, client_address):
+        # Clients that hit their deadline hang up mid-response; that is expected here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self) -> tuple[float, int | None]:
+        """Latency for this request and the error status to inject, if any."""
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            error = None
+            if self._rng.random() < self.error_rate:
+                error = self._rng.choice((429, 503))
+                self.requests["errors"] += 1
+            return delay, error
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so client connection pooling is visible
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server: StubServer = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        method = self.path.split("?", 1)[0].rsplit(":", 1)[-1]
+        if method not in server.requests:
+            self._reply(404, {"error": {"code": 404, "message": f"unknown method {method}"}})
+            return
+
+        with server._lock:
+            server.requests[method] += 1
+        text = "\n".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+
+        delay, error = server.draw()
+        time.sleep(delay)
+        if error == 429:
+            headers = {"Retry-After": str(server.retry_after)} if server.retry_after else None
+            self._reply(429, {"error": {"code": 429, "message": "Resource has been exhausted"}}, headers)
+        elif error == 503:
+            self._reply(503, {"error": {"code": 503, "message": "The service is currently unavailable"}})
+        elif method == "countTokens":
+            self._reply(200, {"totalTokens": server.stub.count_tokens(text).total_tokens})
+        else:
+            rewritten = server.stub.generate_content(text).text
+            self._reply(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": rewritten}]}}],
+                "usageMetadata": {"promptTokenCount": server.stub.count_tokens(text).total_tokens},
+            })
+
+
+def start_stub_server(port: int = 0, **options) -> StubServer:
+    """Start a server on a background thread; port=0 picks a free port (see `.url`)."""
+    server = StubServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, name="gemini-stub-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429/503")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", args.port), latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, retry_after=args.retry_after)
+    print(f"Gemini stub serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Startup / import-time benchmark.
+
+Runs `python -X importtime` in a fresh interpreter for each target module
+and reports its cumulative import time plus the slowest imports beneath
+it, then times a cold start of a local-only pipeline
+(use_llm=False, no similarity scoring, approximate token counts).
+
+    python benchmarks/import_time.py --top 10
+    python benchmarks/import_time.py --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+MODULES = [
+    "orchestrator",
+    "layers.prompt_compressing_layer",
+    "layers.async_prompt_compressing_layer",
+    "compressors.lingua_compression_layer",
+    "evaluation.similarity",
+    "utils.llm_client",
+]
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from layers.prompt_compressing_layer import PromptCompressor
+from utils.token_counters import ApproxTokenCounter
+compressor = PromptCompressor(use_llm=False, counter=ApproxTokenCounter(), score_similarity=False)
+compressor.rule.compress("Cold start check.")
+print(time.perf_counter() - start)
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GENAI_API_KEY", "stub")
+    env.setdefault("MODEL_MAIN", "stub-model")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(project_root), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_profile(module: str) -> list[tuple[str, int]]:
+    """[(module, cumulative_us)] for `module` (last) and every import nested under it."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root, env=_env(), capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", children
+        # listed before their parent and indented two spaces per level
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return rows + [(module, int(cumulative))]
+            rows = []   # a sibling top-level import (interpreter startup)
+        else:
+            rows.append((name.strip(), int(cumulative)))
+    return rows
+
+
+def cold_start_seconds() -> float:
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", COLD_START],
+        cwd=project_root, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--top", type=int, default=5, help="Slowest nested imports listed per module")
+    parser.add_argument("--json", action="store_true", help="Print one JSON report instead of text")
+    args = parser.parse_args()
+
+    report = {"modules": {}, "cold_start_s": None}
+    for module in args.modules:
+        try:
+            rows = import_profile(module)
+        except RuntimeError as e:
+            report["modules"][module] = {"error": str(e)}
+            continue
+        total = rows[-1][1] if rows else 0
+        slowest = sorted(rows[:-1], key=lambda r: r[1], reverse=True)[: args.top]
+        report["modules"][module] = {
+            "cumulative_ms": total / 1000,
+            "slowest": [{"module": name, "cumulative_ms": us / 1000} for name, us in slowest],
+        }
+    report["cold_start_s"] = cold_start_seconds()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("\n== Import time (python -X importtime) ==")
+    for module, entry in report["modules"].items():
+        if "error" in entry:
+            print(f"{module:45s} error: {entry['error']}")
+            continue
+        print(f"{module:45s} {entry['cumulative_ms']:9.1f} ms")
+        for row in entry["slowest"]:
+            print(f"    {row['module']:41s} {row['cumulative_ms']:9.1f} ms")
+    print(f"\nCold start (use_llm=False, no similarity): {report['cold_start_s']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Load test for the compression service.
+
+Starts service.py's CompressionService in a child process with a stubbed
+Gemini backend (benchmarks.gemini_stub: fixed rewrite and count_tokens
+latency, no network) on a Unix socket, or targets a running service with
+--url. A closed loop of --concurrency clients then sends requests for
+--duration seconds and the sustained requests per second, latency
+percentiles and error count are reported.
+
+    python benchmarks/load_test.py --concurrency 32 --duration 20
+    python benchmarks/load_test.py --batch-size 16 --llm-latency 0.5
+    python benchmarks/load_test.py --url http://127.0.0.1:8080
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks.suite import synthetic_corpus, _percentile
+
+
+# -------------------------------
+# Server side (child process)
+# -------------------------------
+def serve_stub(args) -> None:
+    from benchmarks.gemini_stub import StubGenerativeModel, StubTokenCounter, PassthroughCompressor
+    from compressors.llm_compression import LLMCompressor
+    from layers.prompt_compressing_layer import PromptCompressor
+    from layers.async_prompt_compressing_layer import AsyncPromptCompressor
+    from utils.instrumentation import Instrumentation, PrometheusSink
+    from service import CompressionService, serve
+
+    stub = StubGenerativeModel(latency=args.llm_latency, jitter=args.llm_jitter, count_latency=args.count_latency)
+    metrics = PrometheusSink()
+    compressor = PromptCompressor(
+        counter=StubTokenCounter(stub),
+        lingua=PassthroughCompressor(),
+        score_similarity=False,
+        instrumentation=Instrumentation([metrics]),
+    )
+    compressor.llm = LLMCompressor(model=stub)
+    service = CompressionService(
+        AsyncPromptCompressor(compressor, max_concurrency=args.max_concurrency, score_similarity=False),
+        metrics=metrics,
+    )
+    serve(service, unix=args.unix)
+
+
+# -------------------------------
+# Client side
+# -------------------------------
+async def wait_ready(session, base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError("Service did not become healthy")
+        await asyncio.sleep(0.2)
+
+
+async def send(session, base_url: str, prompts: list[str]) -> int:
+    """One request; returns the number of results received (raises on failure)."""
+    if len(prompts) == 1:
+        async with session.post(f"{base_url}/compress", json={"prompt": prompts[0]}) as response:
+            response.raise_for_status()
+            await response.read()
+            return 1
+    received = 0
+    async with session.post(f"{base_url}/compress/batch", json={"prompts": prompts}) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            if "result" not in json.loads(line):
+                raise RuntimeError(f"Batch item failed: {line[:200]!r}")
+            received += 1
+    return received
+
+
+async def run_load(args, base_url: str, socket_path: str | None = None) -> dict:
+    import aiohttp
+
+    if socket_path:
+        connector = aiohttp.UnixConnector(path=socket_path, limit=0)
+    else:
+        connector = aiohttp.TCPConnector(limit=0)
+
+    corpus = [synthetic_corpus(args.prompt_bytes, seed=i) for i in range(64)]
+    latencies, errors, prompts_done = [], 0, 0
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        await wait_ready(session, base_url)
+
+        async def client(worker: int) -> None:
+            nonlocal errors, prompts_done
+            i = worker
+            while time.perf_counter() < stop_at:
+                prompts = [corpus[(i + j) % len(corpus)] for j in range(args.batch_size)]
+                i += args.concurrency
+                started = time.perf_counter()
+                try:
+                    received = await send(session, base_url, prompts)
+                except Exception as e:
+                    errors += 1
+                    if errors <= 3:
+                        print(f"[LoadTest] Request failed: {e}", file=sys.stderr)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                prompts_done += received
+
+        # Warm up connections and the server's pools before measuring
+        stop_at = time.perf_counter() + args.warmup
+        await asyncio.gather(*(client(w) for w in range(args.concurrency)))
+        latencies.clear()
+        errors = prompts_done = 0
+
+        started = time.perf_counter()
+        stop_at = started + args.duration
+        await asyncio.gather(*(client(w) for w in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        async with session.get(f"{base_url}/metrics") as response:
+            metrics = await response.text()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "prompts_per_s": round(prompts_done / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p90_ms": round(_percentile(latencies, 0.90) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "metrics_lines": len(metrics.splitlines()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Target a running service instead of starting a stubbed one")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--batch-size", type=int, default=1, help="Prompts per request; >1 uses /compress/batch")
+    parser.add_argument("--prompt-bytes", type=int, default=2048)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--count-latency", type=float, default=0.02)
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Server-side Gemini calls in flight")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--unix", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_stub(args)
+        return
+
+    server, socket_path = None, None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            socket_path = os.path.join(tmp, "service.sock")
+            server = subprocess.Popen(
+                [sys.executable, __file__, "--serve", "--unix", socket_path,
+                 "--llm-latency", str(args.llm_latency), "--llm-jitter", str(args.llm_jitter),
+                 "--count-latency", str(args.count_latency), "--max-concurrency", str(args.max_concurrency)],
+                stdout=subprocess.DEVNULL,
+            )
+            base_url = "http://service"
+
+        try:
+            report = asyncio.run(run_load(args, base_url, socket_path))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    report["config"] = {
+        key: getattr(args, key)
+        for key in ("url", "concurrency", "duration", "batch_size", "prompt_bytes",
+                    "llm_latency", "llm_jitter", "count_latency", "max_concurrency")
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Near-duplicate index benchmark.
+
+Fills a NearDuplicateIndex with N entries (random signatures, which is what
+unrelated prompts look like to the index), then times lookups of
+- near duplicates: stored prompts with a word or two changed (should hit)
+- unrelated prompts (should miss)
+and reports p50/p99 lookup latency, split into signature and probe time,
+plus the hit rate and the index's memory.
+
+    python benchmarks/near_duplicate_index.py --entries 1000000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks.suite import _percentile
+from compressors.rule_based_compression_layer import RuleBasedCompressor
+from utils.near_duplicate_index import NearDuplicateIndex
+
+
+def make_prompt(rng: random.Random, vocabulary: list[str], size_bytes: int) -> str:
+    # synthetic_corpus() repeats a few fragments, so its prompts are all near
+    # duplicates of each other; draw words from a vocabulary instead
+    words, size = [], 0
+    while size < size_bytes:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def mutate(text: str, rng: random.Random, edits: int) -> str:
+    words = text.split(" ")
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = f"{rng.randrange(10 ** 6):06d}"
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--prompt-bytes", type=int, default=2048)
+    parser.add_argument("--edits", type=int, default=2)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rule = RuleBasedCompressor()
+    index = NearDuplicateIndex(threshold=args.threshold, capacity=args.entries)
+
+    print(f"Filling {args.entries} entries...")
+    started = time.perf_counter()
+    vocabulary = [f"w{i}" for i in range(20000)]
+    stored = [rule.compress(make_prompt(rng, vocabulary, args.prompt_bytes)) for _ in range(min(args.queries, args.entries))]
+    for i, text in enumerate(stored):
+        index.add(text, i)
+    noise = np.random.default_rng(0)
+    for i in range(len(stored), args.entries):
+        index.add_signature(noise.integers(0, 2 ** 16, size=index.num_perm, dtype=np.uint16), i)
+    print(f"  {time.perf_counter() - started:.1f}s, {index.stats()['memory_bytes'] / 1e6:.0f} MB")
+
+    queries = [(mutate(text, rng, args.edits), i) for i, text in enumerate(stored)]
+    queries += [(rule.compress(make_prompt(rng, vocabulary, args.prompt_bytes)), None) for _ in range(len(stored))]
+
+    signature_ms, probe_ms, hits, false_hits = [], [], 0, 0
+    for text, expected in queries:
+        t0 = time.perf_counter()
+        signature = index.signature(text)
+        t1 = time.perf_counter()
+        match = index.lookup_signature(signature)
+        t2 = time.perf_counter()
+        signature_ms.append((t1 - t0) * 1000)
+        probe_ms.append((t2 - t1) * 1000)
+        if expected is not None:
+            hits += match is not None and match[0] == expected
+        else:
+            false_hits += match is not None
+
+    total_ms = [a + b for a, b in zip(signature_ms, probe_ms)]
+    n = len(stored)
+    print(f"\n== Lookups at {len(index)} entries ({len(queries)} queries, ~{args.prompt_bytes} B prompts) ==")
+    for label, values in (("signature", signature_ms), ("probe", probe_ms), ("total", total_ms)):
+        values = sorted(values)
+        print(f"{label:10s} p50 {_percentile(values, 0.5):7.3f} ms   p99 {_percentile(values, 0.99):7.3f} ms")
+    print(f"near duplicates found: {hits}/{n} ({hits / n:.1%}), false matches: {false_hits}/{n}")
+
+
+if __name__ == "__main__":
+    main()
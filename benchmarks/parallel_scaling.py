@@ -0,0 +1,91 @@
+"""
+Process-pool scaling benchmark.
+
+Runs a synthetic corpus through ParallelPromptCompressor with 1, 2, 4 … N
+workers and reports throughput, speedup over one worker and parallel
+efficiency. Gemini is never called (use_llm=False, approximate token
+counts); Lingua is a passthrough unless --lingua loads the real model.
+
+    python benchmarks/parallel_scaling.py --prompts 2000 --max-workers 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from layers.parallel_prompt_compressor import ParallelPromptCompressor
+from layers.prompt_compressing_layer import PromptCompressor
+from utils.token_counters import ApproxTokenCounter
+
+WORDS = [
+    "please", "provide", "a", "detailed", "explanation", "of", "transformer",
+    "attention", "ﬁnance", "café", "naïve", "résumé", "Ｆｕｌｌｗｉｄｔｈ", "—", "!!!",
+    "ok", "really", "reaaally", "context", "window", "tokens", "​", "…",
+]
+
+
+def local_pipeline(lingua: bool = False) -> PromptCompressor:
+    """Worker factory: CPU stages only."""
+    from benchmarks.gemini_stub import PassthroughCompressor
+
+    return PromptCompressor(
+        use_llm=False,
+        counter=ApproxTokenCounter(),
+        lingua=None if lingua else PassthroughCompressor(),
+        score_similarity=lingua,
+    )
+
+
+def synthetic_corpus(count: int, words: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def worker_counts(max_workers: int) -> list[int]:
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+def run(corpus: list[str], workers: int, chunk_size: int, lingua: bool) -> float:
+    with ParallelPromptCompressor(workers, chunk_size=chunk_size, factory=local_pipeline, lingua=lingua) as pool:
+        pool.warmup()
+        start = time.perf_counter()
+        results = pool.compress_batch(corpus)
+        elapsed = time.perf_counter() - start
+    assert [r.original_prompt for r in results] == corpus, "results out of order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400, help="Words per synthetic prompt")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--lingua", action="store_true", help="Use the real Lingua model and similarity scoring")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.prompts, args.words)
+    print(f"\n== Parallel scaling ({args.prompts} prompts × {args.words} words, cpus={os.cpu_count()}) ==")
+    print(f"{'workers':>8} {'seconds':>9} {'prompts/s':>10} {'speedup':>8} {'efficiency':>11}")
+
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        elapsed = run(corpus, workers, args.chunk_size, args.lingua)
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {len(corpus) / elapsed:>10.1f} {speedup:>8.2f} {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
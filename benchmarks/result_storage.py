@@ -0,0 +1,150 @@
+"""
+Result storage benchmark.
+
+Compares, for N synthetic CompressionResults:
+- memory per result: dataclass, CompactResult, Arrow table in memory,
+  and an Arrow IPC file opened memory-mapped
+- write / read throughput: JSON lines (dataclasses.asdict) vs the columnar
+  store in Arrow IPC and Parquet
+
+Stage outputs are derived the way the pipeline derives them: rule-based
+cleanup of the prompt, a Lingua-like token drop, and a shortened "rewrite".
+
+    python benchmarks/result_storage.py --results 20000 --prompt-bytes 2048
+"""
+
+import argparse
+import dataclasses
+import datetime
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks.suite import synthetic_corpus
+from compressors.rule_based_compression_layer import RuleBasedCompressor
+from evaluation.compact_result import CompactResult
+from evaluation.result import CompressionResult
+from evaluation.result_store import write_results, open_results, iter_results
+
+
+def make_results(count: int, prompt_bytes: int, seed: int = 0):
+    rule = RuleBasedCompressor()
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for i in range(count):
+        original = synthetic_corpus(prompt_bytes, seed=seed + i)
+        rule_output = rule.compress(original)
+        words = rule_output.split(" ")
+        lingua_output = " ".join(w for j, w in enumerate(words) if j % 3 != 1)
+        kept = lingua_output.split(" ")
+        final_output = " ".join(kept[: len(kept) * 3 // 4])
+        before, after = len(original.split()), len(final_output.split())
+        yield CompressionResult(
+            timestamp=timestamp,
+            original_prompt=original,
+            rule_output=rule_output,
+            lingua_output=lingua_output,
+            final_output=final_output,
+            tokens_before=before,
+            tokens_after_rule=len(rule_output.split()),
+            tokens_after_lingua=len(kept),
+            tokens_after_final=after,
+            used_llm=True,
+            savings_pct=round((before - after) / before * 100, 2) if before else 0.0,
+            input_similarity=0.9,
+            metadata={"policy": {"llm": {"run": True, "reason": "no policy"}}},
+        )
+
+
+def retained_bytes(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def timed(fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - started, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=20000)
+    parser.add_argument("--prompt-bytes", type=int, default=2048)
+    args = parser.parse_args()
+
+    print(f"Generating {args.results} results of ~{args.prompt_bytes} bytes...")
+    results = list(make_results(args.results, args.prompt_bytes))
+    n = len(results)
+
+    # Memory: each representation is built from fresh copies so nothing is shared with `results`
+    def fresh():
+        return make_results(n, args.prompt_bytes)
+
+    import pyarrow as pa
+
+    print("\n== Memory per result ==")
+    dataclass_bytes = retained_bytes(lambda: list(fresh()))
+    compact_bytes = retained_bytes(lambda: [CompactResult(r) for r in fresh()])
+    arrow_before = pa.total_allocated_bytes()
+    from evaluation.result_store import to_record_batch
+    table = pa.Table.from_batches([to_record_batch(results)])
+    arrow_bytes = pa.total_allocated_bytes() - arrow_before
+    del table
+    for label, total in (("dataclass", dataclass_bytes), ("CompactResult", compact_bytes), ("Arrow table", arrow_bytes)):
+        print(f"{label:15s} {total / n:10.0f} B/result  ({total / dataclass_bytes:5.1%} of dataclass)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "results.jsonl")
+        arrow_path = os.path.join(tmp, "results.arrow")
+        parquet_path = os.path.join(tmp, "results.parquet")
+
+        def write_json():
+            with open(json_path, "w", encoding="utf-8") as f:
+                for r in results:
+                    f.write(json.dumps(dataclasses.asdict(r), ensure_ascii=False) + "\n")
+
+        def read_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                return [CompressionResult(**json.loads(line)) for line in f]
+
+        rows = [
+            ("JSON lines", write_json, read_json, json_path),
+            ("Arrow IPC", lambda: write_results(arrow_path, results, "arrow"),
+             lambda: list(iter_results(open_results(arrow_path))), arrow_path),
+            ("Parquet", lambda: write_results(parquet_path, results, "parquet"),
+             lambda: list(iter_results(open_results(parquet_path))), parquet_path),
+        ]
+
+        print(f"\n== Write / read ({n} results) ==")
+        print(f"{'format':12s} {'write/s':>10s} {'read/s':>10s} {'file MB':>8s}")
+        for label, write, read, path in rows:
+            write_s, _ = timed(write)
+            read_s, loaded = timed(read)
+            assert loaded[0] == results[0] and len(loaded) == n, f"{label} round trip failed"
+            print(f"{label:12s} {n / write_s:10.0f} {n / read_s:10.0f} {os.path.getsize(path) / 1e6:8.1f}")
+
+        mapped_before = pa.total_allocated_bytes()
+        open_s, table = timed(lambda: open_results(arrow_path))
+        scan_s, saved = timed(lambda: sum(table.column("tokens_before").to_pylist()) - sum(table.column("tokens_after_final").to_pylist()))
+        print(f"\nArrow memory-mapped open: {open_s * 1000:.1f} ms, "
+              f"{(pa.total_allocated_bytes() - mapped_before) / n:.0f} B/result on the heap; "
+              f"column scan {scan_s * 1000:.1f} ms ({saved} tokens saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Compression pipeline benchmark suite.
+
+Runs every case on synthetic corpora of 1KB, 100KB and 10MB and reports
+throughput, p50/p99 latency and peak RSS. Gemini is replaced by the local
+deterministic stub (benchmarks/gemini_stub.py) with configurable latency.
+Each (case, size) runs in a fresh interpreter so peak RSS belongs to that
+case alone. Results are written as JSON; --compare prints the p50 change
+against an earlier results file.
+
+Cases:
+  normalize_text[llm|light|storage], normalize_text_custom, rule_based,
+  lingua (tiny local model), similarity, prompt_compressor (end to end)
+
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --cases rule_based normalize_text[llm] --sizes 1KB 100KB
+    python benchmarks/suite.py --output new.json --compare bench.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+# The stub never reaches the network; satisfy the shared client's config checks
+os.environ.setdefault("GENAI_API_KEY", "stub")
+os.environ.setdefault("MODEL_MAIN", "stub-model")
+
+SIZES = {"1KB": 1024, "100KB": 100 * 1024, "10MB": 10 * 1024 * 1024}
+
+# Model-backed cases stop at 100KB; at 10MB they measure truncation, not the stage
+CASES = {
+    "normalize_text[llm]": None,
+    "normalize_text[light]": None,
+    "normalize_text[storage]": None,
+    "normalize_text_custom": None,
+    "rule_based": None,
+    "lingua": "100KB",
+    "similarity": "100KB",
+    "prompt_compressor": "100KB",
+}
+
+_FRAGMENTS = [
+    "Please provide a detailed explanation of how the transformer architecture works. ",
+    "Sooooo coooool!!! I looooove this — reaaally 😄😄 ",
+    "Here’s a fancy quote: “can’t”, and decomposed: cańt. ",
+    "Café vs Café, naïve vs naïve. ",
+    "Zero-width: he​llo wo​rld. ",
+    "Full-width: Ｆｕｌｌｗｉｄｔｈ Ｔｅｘｔ １２３. ",
+    "Mixed symbols: !!!!! ?????? ...... --- —— – ",
+    "See https://example.com/docs?id=42 or mail user.name+test@gmail.com. ",
+    "Legit doubles stay: cool, book, coffee, better, happy. ",
+    "\n\n    Indented   text   with   irregular    spacing.\t\t\n",
+]
+
+
+def synthetic_corpus(size_bytes: int, seed: int = 0) -> str:
+    """Deterministic mix of prose and normalization edge cases, about size_bytes of UTF-8."""
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < size_bytes:
+        fragment = rng.choice(_FRAGMENTS)
+        parts.append(fragment)
+        total += len(fragment.encode("utf-8"))
+    return "".join(parts)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+# -------------------------------
+# Case setup (runs in the child)
+# -------------------------------
+def _setup(case: str, args):
+    """Returns fn(text) for the case, or raises ImportError when its backend is missing."""
+    if case.startswith("normalize_text["):
+        from enums.normalization_pipeline import NormalizationPipeline
+        from utils.normalization import normalize_text
+
+        pipeline = NormalizationPipeline(case[len("normalize_text["):-1])
+        return lambda text: normalize_text(text, pipeline)
+
+    if case == "normalize_text_custom":
+        from utils.normalization import normalize_text_custom
+
+        return normalize_text_custom
+
+    if case == "rule_based":
+        from compressors.rule_based_compression_layer import RuleBasedCompressor
+
+        return RuleBasedCompressor().compress
+
+    if case == "lingua":
+        import llmlingua  # noqa: F401 – skip cleanly when not installed
+        from compressors.lingua_compression_layer import LinguaCompressor
+
+        lingua = LinguaCompressor(model_name=args.lingua_model)
+        if not lingua.warmup():
+            raise ImportError(f"could not load {args.lingua_model}")
+        return lingua.compress
+
+    if case == "similarity":
+        import sentence_transformers  # noqa: F401
+        from evaluation.similarity import semantic_similarity
+
+        return lambda text: semantic_similarity(text, text[: len(text) // 2])
+
+    if case == "prompt_compressor":
+        from benchmarks.gemini_stub import StubGenerativeModel, StubTokenCounter, PassthroughCompressor
+        from compressors.llm_compression import LLMCompressor
+        from layers.prompt_compressing_layer import PromptCompressor
+
+        stub = StubGenerativeModel(latency=args.llm_latency, count_latency=args.count_latency)
+        try:
+            import llmlingua  # noqa: F401
+            from compressors.lingua_compression_layer import LinguaCompressor
+            lingua = LinguaCompressor(model_name=args.lingua_model)
+        except ImportError:
+            lingua = PassthroughCompressor()
+        try:
+            import sentence_transformers  # noqa: F401
+            score_similarity = True
+        except ImportError:
+            score_similarity = False
+
+        compressor = PromptCompressor(
+            counter=StubTokenCounter(stub),
+            lingua=lingua,
+            score_similarity=score_similarity,
+        )
+        compressor.llm = LLMCompressor(model=stub)
+        compressor.warmup()
+        return compressor.compress_prompt
+
+    raise ValueError(f"Unknown case: {case}")
+
+
+def _repeats(size_bytes: int, requested: int | None) -> int:
+    if requested:
+        return requested
+    return max(3, min(50, (2 * 1024 * 1024) // size_bytes))
+
+
+def run_case(case: str, size_label: str, args) -> dict:
+    size_bytes = SIZES[size_label]
+    text = synthetic_corpus(size_bytes, seed=args.seed)
+    rss_before = _rss_kb()
+
+    try:
+        fn = _setup(case, args)
+    except ImportError as e:
+        return {"case": case, "size": size_label, "skipped": str(e)}
+
+    fn(text[:1024])   # warm caches and lazy imports outside the timed runs
+
+    latencies = []
+    for _ in range(_repeats(size_bytes, args.repeats)):
+        started = time.perf_counter()
+        fn(text)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    p50 = _percentile(latencies, 0.50)
+    return {
+        "case": case,
+        "size": size_label,
+        "bytes": len(text.encode("utf-8")),
+        "runs": len(latencies),
+        "p50_ms": p50 * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "throughput_mb_s": len(text.encode("utf-8")) / p50 / 1e6 if p50 else None,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "baseline_rss_mb": rss_before / 1024,
+    }
+
+
+# -------------------------------
+# Driver
+# -------------------------------
+def _child_command(case: str, size_label: str, args) -> list[str]:
+    command = [
+        sys.executable, "-W", "ignore", str(Path(__file__).resolve()),
+        "--run-case", case, "--size", size_label,
+        "--seed", str(args.seed),
+        "--llm-latency", str(args.llm_latency),
+        "--count-latency", str(args.count_latency),
+        "--lingua-model", args.lingua_model,
+    ]
+    if args.repeats:
+        command += ["--repeats", str(args.repeats)]
+    return command
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\n== p50 vs {baseline_path} ==")
+    for r in results:
+        old = baseline.get((r["case"], r["size"]))
+        if not old or "p50_ms" not in r or "p50_ms" not in old:
+            continue
+        change = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        print(f"{r['case']:26s} {r['size']:>6s} {old['p50_ms']:10.2f} → {r['p50_ms']:10.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=None, help="Timed runs per case (default scales with size)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub generate_content seconds")
+    parser.add_argument("--count-latency", type=float, default=0.0, help="Stub count_tokens seconds")
+    parser.add_argument("--lingua-model", default="sshleifer/tiny-gpt2")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to diff p50 against")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--size", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Child mode: pipeline logs stay on stderr, the result is the last stdout line
+        print(json.dumps(run_case(args.run_case, args.size, args)))
+        return
+
+    results = []
+    print(f"{'case':26s} {'size':>6s} {'p50 ms':>10s} {'p99 ms':>10s} {'MB/s':>8s} {'peak RSS':>9s}")
+    for case in args.cases:
+        limit = CASES[case]
+        for size_label in args.sizes:
+            if limit and SIZES[size_label] > SIZES[limit]:
+                continue
+            completed = subprocess.run(_child_command(case, size_label, args), cwd=project_root,
+                                       capture_output=True, text=True)
+            if completed.returncode != 0:
+                error = (completed.stderr.strip().splitlines() or ["failed"])[-1]
+                result = {"case": case, "size": size_label, "error": error}
+            else:
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+
+            if "p50_ms" in result:
+                print(f"{case:26s} {size_label:>6s} {result['p50_ms']:10.2f} {result['p99_ms']:10.2f} "
+                      f"{result['throughput_mb_s']:8.2f} {result['peak_rss_mb']:7.0f}MB")
+            else:
+                print(f"{case:26s} {size_label:>6s} {result.get('skipped') or result.get('error')}")
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "seed": args.seed,
+            "llm_latency": args.llm_latency,
+            "count_latency": args.count_latency,
+            "lingua_model": args.lingua_model,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
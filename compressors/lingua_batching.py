@@ -0,0 +1,233 @@
+"""
+Lingua Batch Scheduler
+----------------------
+Micro-batching front end for LLMLingua token-importance scoring.
+
+Concurrent callers submit prompts; a scheduler thread collects them for up
+to `max_wait_ms` (or until `max_batch_size` prompts / `max_batch_tokens`
+padded tokens are waiting), buckets them by length to limit padding, and
+scores each bucket in one forward pass. Each caller gets its own
+TokenScores back through a future.
+
+`stats()` reports batch fill and the queueing latency the scheduler adds.
+"""
+
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from compressors.lingua_compression_layer import LinguaCompressor, TokenScores
+
+
+@dataclass
+class _Request:
+    token_ids: list[int]
+    future: Future
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class LinguaBatchScheduler:
+    def __init__(
+        self,
+        lingua: LinguaCompressor | None = None,
+        *,
+        max_batch_size: int = 8,
+        max_batch_tokens: int = 8192,
+        max_wait_ms: float = 10.0,
+    ):
+        """
+        :param max_batch_size: Most prompts scored in one forward pass.
+        :param max_batch_tokens: Most padded tokens (rows × longest row) per forward pass.
+        :param max_wait_ms: How long the first queued prompt waits for company.
+        """
+        self.lingua = lingua or LinguaCompressor()
+        self.model_name = self.lingua.model_name
+        self.ratio = self.lingua.ratio
+        self.precision = getattr(self.lingua, "precision", "fp32")
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: queue.Queue[_Request | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._real_tokens = 0
+        self._padded_tokens = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._forward_total = 0.0
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.lingua.warmup()
+            self._thread = threading.Thread(target=self._run, name="lingua-batcher", daemon=True)
+            self._thread.start()
+
+    warmup = start
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    # -------------------------------
+    # Requests
+    # -------------------------------
+    def submit(self, text: str) -> Future:
+        """Queue one prompt; the future resolves to its TokenScores."""
+        self.start()
+        future: Future = Future()
+        if not self.lingua.available:
+            future.set_exception(RuntimeError("Lingua model unavailable"))
+            return future
+        self._queue.put(_Request(self.lingua.tokenize(text), future))
+        return future
+
+    def score(self, text: str) -> TokenScores:
+        return self.submit(text).result()
+
+    def compress(self, text: str) -> str:
+        try:
+            return self.lingua.compress_from_scores(self.score(text))
+        except Exception as e:
+            print(f"[LinguaBatch] Error during compression: {e}", file=sys.stderr)
+            return text
+
+    def compress_batch(self, texts: list[str]) -> list[str]:
+        futures = [self.submit(text) for text in texts]
+        compressed = []
+        for text, future in zip(texts, futures):
+            try:
+                compressed.append(self.lingua.compress_from_scores(future.result()))
+            except Exception as e:
+                print(f"[LinguaBatch] Error during compression: {e}", file=sys.stderr)
+                compressed.append(text)
+        return compressed
+
+    # -------------------------------
+    # Scheduling
+    # -------------------------------
+    def _collect(self, pending: list[_Request]) -> bool:
+        """
+        Add requests to `pending` (holding the first one) until the window
+        closes or the batch is full. Returns whether close() was requested.
+        """
+        first = pending[0]
+        tokens = len(first.token_ids)
+        deadline = first.submitted + self.max_wait
+
+        while len(pending) < self.max_batch_size and tokens < self.max_batch_tokens:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Past the deadline, still take whatever is already waiting
+                if remaining <= 0:
+                    request = self._queue.get_nowait()
+                else:
+                    request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                return True
+            if request.future.set_running_or_notify_cancel():
+                pending.append(request)
+                tokens += len(request.token_ids)
+
+        return False
+
+    def _buckets(self, pending: list[_Request]) -> list[list[_Request]]:
+        """Split by length so each forward pass stays under max_batch_tokens padded tokens."""
+        buckets: list[list[_Request]] = []
+        current: list[_Request] = []
+        for request in sorted(pending, key=lambda r: len(r.token_ids)):
+            width = len(request.token_ids)   # sorted, so this is the widest so far
+            if current and (width * (len(current) + 1) > self.max_batch_tokens
+                            or len(current) >= self.max_batch_size):
+                buckets.append(current)
+                current = []
+            current.append(request)
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            # Once running, a caller can no longer cancel the future, so only
+            # this thread completes it; cancelled requests are dropped here
+            if not first.future.set_running_or_notify_cancel():
+                continue
+            pending = [first]
+            try:
+                stopping = self._collect(pending)
+                for bucket in self._buckets(pending):
+                    self._score(bucket)
+            except Exception as e:
+                print(f"[LinguaBatch] Scheduler error: {e}", file=sys.stderr)
+                error = e
+            else:
+                error = RuntimeError("Lingua scorer returned no result for this prompt")
+            # Nothing may be left waiting: fail whatever did not get a result
+            for request in pending:
+                if not request.future.done():
+                    request.future.set_exception(error)
+
+    def _score(self, bucket: list[_Request]) -> None:
+        started = time.perf_counter()
+        try:
+            results = self.lingua.score_token_ids_batch([r.token_ids for r in bucket])
+        except Exception as e:
+            for request in bucket:
+                request.future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        for request, result in zip(bucket, results):
+            request.future.set_result(result)
+        self._record(bucket, started, finished)
+
+    def _record(self, bucket: list[_Request], started: float, finished: float) -> None:
+        width = max(len(r.token_ids) for r in bucket)
+        waits = [started - r.submitted for r in bucket]
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(bucket)
+            self._real_tokens += sum(len(r.token_ids) for r in bucket)
+            self._padded_tokens += width * len(bucket)
+            self._queue_wait_total += sum(waits)
+            self._queue_wait_max = max(self._queue_wait_max, max(waits))
+            self._forward_total += finished - started
+
+    def stats(self) -> dict:
+        """
+        batch_fill: mean prompts per forward pass / max_batch_size
+        token_fill: real tokens / padded tokens scored
+        queue_wait_ms: time from submit to the start of its forward pass
+        """
+        with self._stats_lock:
+            batches, requests = self._batches, self._requests
+            return {
+                "batches": batches,
+                "requests": requests,
+                "mean_batch_size": requests / batches if batches else 0.0,
+                "batch_fill": requests / (batches * self.max_batch_size) if batches else 0.0,
+                "token_fill": self._real_tokens / self._padded_tokens if self._padded_tokens else 0.0,
+                "mean_queue_wait_ms": 1000 * self._queue_wait_total / requests if requests else 0.0,
+                "max_queue_wait_ms": 1000 * self._queue_wait_max,
+                "mean_forward_ms": 1000 * self._forward_total / batches if batches else 0.0,
+            }
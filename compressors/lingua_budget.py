@@ -0,0 +1,267 @@
+"""
+Budgeted Lingua
+---------------
+Fits prompts into a token budget from cached LLMLingua importance scores.
+
+LinguaCompressor.compress() asks LLMLingua for one ratio per call and
+re-runs the scoring model each time, so trying several ratios means
+several forward passes. Here each prompt is scored once (one forward pass,
+or a slot in a LinguaBatchScheduler batch) and its TokenScores are kept,
+with their descending order, in an LRU. Every later target is a selection
+over the cached scores:
+- ratio: the top `ratio` share of model tokens
+- threshold: every token scoring at least `threshold`
+- target_tokens: the largest top-k whose decoded text a local token counter
+  puts at or under the budget (a couple of guesses scaled from the measured
+  count, then bisection); at least the top-scored token is kept, so a budget
+  too small for any text returns that token with fits=False
+
+Special tokens (the BOS that the tokenizer prepends and the scorer rates
+inf) are left out of the order: decode() drops them, so they would fill
+slots without adding text.
+
+A new budget on an already-scored prompt costs a few decodes and local
+counts, not a forward pass.
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from compressors.lingua_compression_layer import LinguaCompressor, TokenScores
+from utils.token_counters import TokenCounter, ApproxTokenCounter
+
+# Guesses scaled from the last count before falling back to bisection
+_SCALED_GUESSES = 2
+
+
+@dataclass
+class BudgetFit:
+    text: str
+    kept: int                 # model tokens kept
+    total: int                # model tokens in the prompt
+    tokens: int               # counter tokens in `text`
+    target: int | None = None
+
+    @property
+    def fits(self) -> bool:
+        return self.target is None or self.tokens <= self.target
+
+
+@dataclass
+class _Scored:
+    scores: TokenScores
+    values: np.ndarray        # scores as an array
+    order: np.ndarray         # content (non-special) positions by descending score
+
+
+class BudgetedLingua:
+    def __init__(
+        self,
+        lingua: LinguaCompressor | None = None,
+        *,
+        counter: TokenCounter | None = None,
+        scheduler=None,
+        max_entries: int = 256,
+    ):
+        """
+        :param lingua: Loaded or lazy LinguaCompressor supplying the model,
+                       tokenizer and default `ratio`.
+        :param counter: Local counter that checks a selection fits its budget
+                        (defaults to ApproxTokenCounter; budgets are in its units).
+        :param scheduler: Optional LinguaBatchScheduler to score through, so
+                          concurrent callers share forward passes.
+        :param max_entries: Prompts whose scores are kept; least recently used go first.
+        """
+        self.lingua = lingua or (scheduler.lingua if scheduler is not None else LinguaCompressor())
+        self.scheduler = scheduler
+        self.counter = counter or ApproxTokenCounter()
+        self.max_entries = max_entries
+        self.model_name = self.lingua.model_name
+        self.ratio = self.lingua.ratio
+        self.precision = getattr(self.lingua, "precision", "fp32")
+
+        self._special: frozenset[int] | None = None
+        self._cache: OrderedDict[bytes, _Scored] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._fits = 0
+        self._probes = 0
+        self._fit_total = 0.0
+
+    def warmup(self) -> bool:
+        if self.scheduler is not None:
+            self.scheduler.start()
+            return self.lingua.available
+        return self.lingua.warmup()
+
+    # -------------------------------
+    # Scores
+    # -------------------------------
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _cached(self, key: bytes) -> _Scored | None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _special_ids(self) -> frozenset[int]:
+        if self._special is None:
+            self._special = self.lingua.special_token_ids()
+        return self._special
+
+    def _store(self, key: bytes, scores: TokenScores) -> _Scored:
+        values = np.asarray(scores.scores, dtype=np.float64)
+        special = self._special_ids()
+        content = np.array([i for i, token in enumerate(scores.token_ids) if token not in special], dtype=np.int64)
+        order = content[np.argsort(-values[content], kind="stable")]
+        entry = _Scored(scores=scores, values=values, order=order)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = entry
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return entry
+
+    def _scored(self, text: str) -> _Scored:
+        key = self._key(text)
+        entry = self._cached(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        if self.scheduler is not None:
+            return self._store(key, self.scheduler.score(text))
+        return self._store(key, self.lingua.score_batch([text])[0])
+
+    def score(self, text: str) -> TokenScores:
+        """Importance scores of `text`, from the cache when it was scored before."""
+        return self._scored(text).scores
+
+    # -------------------------------
+    # Selection
+    # -------------------------------
+    def _decode(self, entry: _Scored, positions: np.ndarray) -> str:
+        token_ids = entry.scores.token_ids
+        return self.lingua.decode([token_ids[i] for i in positions])
+
+    def _top_k(self, entry: _Scored, k: int) -> str:
+        return self._decode(entry, np.sort(entry.order[:k]))
+
+    def _fit_budget(self, text: str, entry: _Scored, target_tokens: int) -> BudgetFit:
+        n = len(entry.order)
+        full = self.counter.count_text(text)
+        if full <= target_tokens:
+            return BudgetFit(text=text, kept=n, total=n, tokens=full, target=target_tokens)
+
+        # Largest k in [0, n] whose text fits; counts grow with k, so the
+        # fitting ks form a prefix. Invariant: lo fits, everything above hi does not.
+        lo, hi = 0, n - 1
+        best_text, best_tokens = "", 0
+        guess, measured_k, measured = None, n, full
+        for probe in range(n + 1):
+            if lo >= hi:
+                break
+            if probe < _SCALED_GUESSES:
+                guess = int(measured_k * target_tokens / max(1, measured))
+            mid = guess if probe < _SCALED_GUESSES and lo < guess <= hi else (lo + hi + 1) // 2
+            candidate = self._top_k(entry, mid)
+            tokens = self.counter.count_text(candidate)
+            self._probes += 1
+            measured_k, measured = mid, tokens
+            if tokens <= target_tokens:
+                lo, best_text, best_tokens = mid, candidate, tokens
+            else:
+                hi = mid - 1
+        if lo == 0 and n:
+            # Not even one token fits: keep the top-scored content token
+            # rather than emptying the prompt; the result reports fits=False
+            best_text = self._top_k(entry, 1)
+            best_tokens = self.counter.count_text(best_text)
+            lo = 1
+        return BudgetFit(text=best_text, kept=lo, total=n, tokens=best_tokens, target=target_tokens)
+
+    def fit(
+        self,
+        text: str,
+        target_tokens: int | None = None,
+        ratio: float | None = None,
+        threshold: float | None = None,
+    ) -> BudgetFit:
+        """
+        Select tokens of `text` by one of: an absolute `target_tokens` budget
+        (in the counter's units), a `ratio` of model tokens, or a score
+        `threshold`. With none given, the Lingua compressor's ratio is used.
+        """
+        if sum(option is not None for option in (target_tokens, ratio, threshold)) > 1:
+            raise ValueError("Pass at most one of target_tokens, ratio, threshold")
+
+        started = time.perf_counter()
+        entry = self._scored(text)
+        n = len(entry.order)
+        if target_tokens is not None:
+            result = self._fit_budget(text, entry, target_tokens)
+        else:
+            if threshold is not None:
+                positions = np.sort(entry.order[entry.values[entry.order] >= threshold])
+            else:
+                ratio = self.ratio if ratio is None else ratio
+                k = min(n, max(1, round(n * ratio))) if n else 0
+                positions = np.sort(entry.order[:k])
+            selected = self._decode(entry, positions)
+            result = BudgetFit(text=selected, kept=len(positions), total=n, tokens=self.counter.count_text(selected))
+
+        self._fits += 1
+        self._fit_total += time.perf_counter() - started
+        return result
+
+    # -------------------------------
+    # Compressor interface
+    # -------------------------------
+    def compress(self, text: str, target_tokens: int | None = None) -> str:
+        """
+        :param target_tokens: Token budget for this call instead of `ratio`
+                              (set by SegmentedCompressor's shared budget).
+        """
+        if not self.lingua.available and not self.warmup():
+            return text
+        try:
+            return self.fit(text, target_tokens=target_tokens).text
+        except Exception as e:
+            print(f"[LinguaBudget] Error during compression: {e}", file=sys.stderr)
+            return text
+
+    def compress_batch(self, texts: list[str]) -> list[str]:
+        if self.scheduler is not None and (self.lingua.available or self.warmup()):
+            # Queue every uncached prompt at once so they share forward passes
+            pending = {}
+            for text in texts:
+                key = self._key(text)
+                if key not in pending and self._cached(key) is None:
+                    pending[key] = self.scheduler.submit(text)
+            for key, future in pending.items():
+                try:
+                    self._store(key, future.result())
+                except Exception as e:
+                    print(f"[LinguaBudget] Error during scoring: {e}", file=sys.stderr)
+        return [self.compress(text) for text in texts]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "fits": self._fits,
+                "mean_fit_ms": 1000 * self._fit_total / self._fits if self._fits else 0.0,
+                "mean_probes": self._probes / self._fits if self._fits else 0.0,
+            }
@@ -6,56 +6,310 @@ This is extractive (not generative) pruning — keeps the most important parts
 of the prompt based on model scoring.
 """
 
+import logging
+import math
+import os
 import sys
-from llmlingua import PromptCompressor
-from utils.GeminiTokenCounter import GeminiTokenCounter
+import time
+from dataclasses import dataclass
+
+from utils.token_counters import TokenCounter, ApproxTokenCounter
 print(">>> lingua_compression_layer.py file loaded")
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TokenScores:
+    """
+    Per-token importance for one prompt: the model's surprisal (cross-entropy)
+    at each token. Higher means more informative and more worth keeping;
+    the first token has no context and is scored inf (always kept).
+    """
+    token_ids: list[int]
+    scores: list[float]
+
+
+def _current_rss_bytes() -> int | None:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in value)
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.element_size() * value.numel()
+    return 0
+
+
 class LinguaCompressor:
-    def __init__(self, model_name: str = "TinyLlama/TinyLlama-1.1B-Chat-v1.0", ratio: float = 0.5):
+    # fp32: reference; bf16: half the weight memory; int8: dynamic quantization
+    # of the Linear layers; onnx: ONNX Runtime export (needs optimum[onnxruntime])
+    PRECISIONS = ("fp32", "bf16", "int8", "onnx")
+
+    def __init__(
+        self,
+        model_name: str = "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+        ratio: float = 0.5,
+        counter: TokenCounter | None = None,
+        precision: str = "fp32",
+    ):
+        """
+        :param counter: Token counter used for the before/after log line.
+                        Defaults to a local ApproxTokenCounter (no network).
+        :param precision: Inference mode, one of PRECISIONS.
+        """
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown Lingua precision: {precision} (expected one of {self.PRECISIONS})")
+
         self.model_name = model_name
         self.ratio = ratio
+        self.precision = precision
         self.available = False
         self.compressor = None
-        self.counter = GeminiTokenCounter()
+        self.counter = counter or ApproxTokenCounter()
+
+        self.footprint: dict = {}
+        self._calls = 0
+        self._latency_total = 0.0
 
     def _load(self):
         if self.compressor:
             return
         try:
-            print(f"[Lingua] Loading {self.model_name} on CPU...")
+            print(f"[Lingua] Loading {self.model_name} on CPU ({self.precision})...")
+            started = time.perf_counter()
+            rss_before = _current_rss_bytes()
+
+            # Imported here: llmlingua pulls in torch and transformers
+            from llmlingua import PromptCompressor
+
             self.compressor = PromptCompressor(
                 model_name=self.model_name,
                 device_map="cpu",
                 model_config={
-                                "torch_dtype": "float32",
+                                "torch_dtype": "bfloat16" if self.precision == "bf16" else "float32",
                                 "low_cpu_mem_usage": True
             }
             )
+            if self.precision == "int8":
+                self._quantize_int8()
+            elif self.precision == "onnx":
+                self._export_onnx()
+
+            rss_after = _current_rss_bytes()
+            self.footprint = {
+                "precision": self.precision,
+                "weight_bytes": self._weight_bytes(),
+                "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                "load_seconds": round(time.perf_counter() - started, 3),
+            }
             self.available = True
-            print(f"[Lingua] Ready (target ratio={self.ratio})")
+            print(f"[Lingua] Ready (target ratio={self.ratio}, footprint={self.footprint})")
         except Exception as e:
             print(f"[Lingua] Error loading model: {e}", file=sys.stderr)
+            self.compressor = None
             self.available = False
 
-    def compress(self, text: str) -> str:
+    def _quantize_int8(self):
+        import torch
+
+        self.compressor.model = torch.ao.quantization.quantize_dynamic(
+            self.compressor.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+
+    def _export_onnx(self):
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError as e:
+            raise RuntimeError("precision='onnx' requires optimum[onnxruntime]") from e
+
+        # The tokenizer and LLMLingua wrapper stay; only the scoring model is swapped
+        self.compressor.model = ORTModelForCausalLM.from_pretrained(self.model_name, export=True, use_cache=True)
+
+        # compress_prompt drives the model with its own past_key_values handling;
+        # fail the load now rather than pass every prompt through unchanged later
+        try:
+            self._compress_one("Check that the exported model runs under LLMLingua compress_prompt.")
+        except Exception as e:
+            raise RuntimeError(f"ONNX model does not run under llmlingua compress_prompt: {e}") from e
+
+    def _weight_bytes(self) -> int | None:
+        model = getattr(self.compressor, "model", None)
+        if model is None:
+            return None
+        if self.precision == "onnx":
+            model_path = getattr(model, "model_path", None)
+            if model_path is None:
+                return None
+            directory = os.path.dirname(str(model_path))
+            return sum(
+                os.path.getsize(os.path.join(directory, name))
+                for name in os.listdir(directory)
+                if os.path.isfile(os.path.join(directory, name))
+            )
+        return sum(_tensor_bytes(value) for value in model.state_dict().values())
+
+    def stats(self) -> dict:
+        """Load footprint plus the mean latency of compress calls so far."""
+        return {
+            **self.footprint,
+            "precision": self.precision,
+            "calls": self._calls,
+            "mean_latency_ms": 1000 * self._latency_total / self._calls if self._calls else 0.0,
+        }
+
+    def warmup(self, sample: str = "Warm up the Lingua model with a short prompt.") -> bool:
+        """
+        Load the model and run one compression so the first real request
+        does not pay the load. Returns whether the model is available.
+        """
+        self._load()
+        if self.available:
+            try:
+                self._compress_one(sample)
+            except Exception as e:
+                print(f"[Lingua] Warmup compression failed: {e}", file=sys.stderr)
+        return self.available
+
+    def _compress_one(self, text: str, target_tokens: int | None = None) -> str:
+        if target_tokens is None:
+            compressed_result = self.compressor.compress_prompt(text)
+        else:
+            compressed_result = self.compressor.compress_prompt(text, target_token=target_tokens)
+        # New API returns a dict
+        if isinstance(compressed_result, dict):
+            return compressed_result.get("compressed_prompt", text)
+        return compressed_result
+
+    def compress(self, text: str, target_tokens: int | None = None) -> str:
+        """
+        :param target_tokens: Token target for this call instead of `ratio`
+                              (set by SegmentedCompressor's shared budget).
+        """
         if not self.available:
             self._load()
         if not self.available:
             return text
         try:
-            compressed_result = self.compressor.compress_prompt(text)
-            # New API returns a dict
-            if isinstance(compressed_result, dict):
-                compressed = compressed_result.get("compressed_prompt", text)
-            else:
-                compressed = compressed_result
-
-            before = self.counter.count_text(text, ("before Lingua compression"))
-            after = self.counter.count_text(compressed, ("after Lingua compression"))
-            print(f"[Lingua] Compressed {before} → {after} tokens ({round((before - after) / before * 100, 2)}% saved)")
+            started = time.perf_counter()
+            compressed = self._compress_one(text, target_tokens)
+            self._calls += 1
+            self._latency_total += time.perf_counter() - started
+
+            # Counting can be a network round-trip; only do it when it is logged
+            if logger.isEnabledFor(logging.DEBUG):
+                before = self.counter.count_text(text, ("before Lingua compression"))
+                after = self.counter.count_text(compressed, ("after Lingua compression"))
+                saved = round((before - after) / before * 100, 2) if before else 0.0
+                logger.debug("Compressed %d → %d tokens (%s%% saved)", before, after, saved)
             return compressed
         except Exception as e:
             print(f"[Lingua] Error during compression: {e}", file=sys.stderr)
             return text
 
+
+    def compress_batch(self, texts: list[str]) -> list[str]:
+        """
+        Compress a batch of prompts against a single loaded model.
+        Token counting is left to the caller, which already counts every stage.
+        """
+        if not self.available:
+            self._load()
+        if not self.available:
+            return list(texts)
+
+        compressed = []
+        for text in texts:
+            try:
+                compressed.append(self._compress_one(text))
+            except Exception as e:
+                print(f"[Lingua] Error during compression: {e}", file=sys.stderr)
+                compressed.append(text)
+
+        logger.debug("Compressed batch of %d prompts", len(texts))
+        return compressed
+
+    # -------------------------------
+    # Token-level scoring
+    # -------------------------------
+    def tokenize(self, text: str) -> list[int]:
+        if not self.available:
+            self._load()
+        return self.compressor.tokenizer(text)["input_ids"]
+
+    def decode(self, token_ids) -> str:
+        return self.compressor.tokenizer.decode(token_ids, skip_special_tokens=True)
+
+    def special_token_ids(self) -> frozenset[int]:
+        """Ids such as BOS that tokenize() adds and decode() drops."""
+        if not self.available:
+            self._load()
+        return frozenset(self.compressor.tokenizer.all_special_ids)
+
+    def score_token_ids_batch(self, batch: list[list[int]]) -> list[TokenScores]:
+        """
+        Score several tokenized prompts in one right-padded forward pass.
+        Right padding keeps positions intact: a causal model never attends
+        to the pads that follow the real tokens.
+        """
+        import torch
+
+        if not batch:
+            return []
+
+        tokenizer = self.compressor.tokenizer
+        model = self.compressor.model
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+        lengths = [len(ids) for ids in batch]
+        width = max(lengths)
+        input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, ids in enumerate(batch):
+            input_ids[row, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, : len(ids)] = 1
+
+        with torch.no_grad():
+            logits = model(
+                input_ids=input_ids.to(model.device),
+                attention_mask=attention_mask.to(model.device),
+            ).logits
+            losses = torch.nn.functional.cross_entropy(
+                logits[:, :-1].transpose(1, 2).float(),
+                input_ids[:, 1:].to(model.device),
+                reduction="none",
+            ).cpu()
+
+        return [
+            TokenScores(token_ids=list(ids), scores=[math.inf] + losses[row, : n - 1].tolist())
+            for row, (ids, n) in enumerate(zip(batch, lengths))
+        ]
+
+    def score_batch(self, texts: list[str]) -> list[TokenScores]:
+        return self.score_token_ids_batch([self.tokenize(text) for text in texts])
+
+    def compress_from_scores(self, scores: TokenScores, ratio: float | None = None) -> str:
+        """
+        Keep the highest-scoring `ratio` share of tokens, in their original
+        order. This is the token-level pass of LLMLingua without its
+        iterative recomputation.
+        """
+        keep = self.kept_indices(scores, ratio)
+        return self.decode([scores.token_ids[i] for i in keep])
+
+    def kept_indices(self, scores: TokenScores, ratio: float | None = None):
+        """Sorted positions of the tokens compress_from_scores keeps."""
+        import numpy as np
+
+        ratio = self.ratio if ratio is None else ratio
+        n = len(scores.token_ids)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        k = min(n, max(1, round(n * ratio)))
+        return np.sort(np.argsort(-np.asarray(scores.scores), kind="stable")[:k])
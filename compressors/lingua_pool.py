@@ -0,0 +1,340 @@
+"""
+Lingua Worker Pool
+------------------
+Serves LinguaCompressor requests from long-lived worker processes.
+
+The model is loaded once in the parent and its weights are moved into
+shared memory before the workers start, so N workers map the same pages
+instead of holding N copies. With the default "fork" start method the
+workers inherit the loaded model directly; with "spawn" it is sent through
+torch.multiprocessing, which passes shared tensors as handles rather than
+copies. Requests and results travel over local IPC queues.
+
+`warmup()` does the load and starts the workers, moving the cold start out
+of the request path. The pool exposes compress/compress_batch, so it can be
+passed to PromptCompressor in place of a LinguaCompressor.
+
+Workers record which request they are running. A worker that dies has its
+request resubmitted once (a second crash passes the text through), and
+every result wait is bounded by `request_timeout`.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from compressors.lingua_compression_layer import LinguaCompressor
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for dead workers
+_WATCH_INTERVAL = 1.0
+
+
+def _worker_main(lingua: LinguaCompressor, threads: int, requests, responses, running, slot: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+    pid = os.getpid()
+    if not lingua.warmup():
+        responses.put(("ready", pid, False))
+        return
+    responses.put(("ready", pid, True))
+
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        request_id, text = item
+        # Shared memory rather than a queue message, so it survives a hard crash
+        running[slot] = request_id
+        try:
+            responses.put(("done", pid, request_id, True, lingua._compress_one(text)))
+        except Exception as e:
+            responses.put(("done", pid, request_id, False, f"{type(e).__name__}: {e}"))
+
+
+class LinguaWorkerPool:
+    def __init__(
+        self,
+        num_workers: int = 2,
+        model_name: str = "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+        ratio: float = 0.5,
+        threads_per_worker: int | None = None,
+        start_method: str = "fork",
+        lingua: LinguaCompressor | None = None,
+        request_timeout: float | None = 300.0,
+    ):
+        """
+        :param num_workers: Worker processes serving requests.
+        :param threads_per_worker: torch intra-op threads per worker
+                                   (default: cores divided evenly between workers).
+        :param start_method: "fork" (Linux, inherits the loaded model) or "spawn".
+        :param lingua: Pre-built LinguaCompressor to serve (model_name/ratio are then ignored).
+        :param request_timeout: Seconds compress/compress_batch wait for results
+                                before passing the text through (None: no limit).
+        """
+        self.lingua = lingua or LinguaCompressor(model_name=model_name, ratio=ratio)
+        self.model_name = self.lingua.model_name
+        self.ratio = self.lingua.ratio
+        self.precision = getattr(self.lingua, "precision", "fp32")
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        self.start_method = start_method
+        self.request_timeout = request_timeout
+
+        self._workers = []
+        self._requests = None
+        self._responses = None
+        self._collector = None
+        self._pending: dict[int, tuple[Future, str]] = {}
+        self._running = None                    # per worker slot: last request taken
+        self._slots: dict[int, int] = {}        # worker pid -> slot
+        self._retried: set[int] = set()
+        self._warm: dict[int, bool] = {}        # worker pid -> loaded the model
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._warmup_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closing = False
+        self._failed = False                    # workers started but none loaded the model
+        self.available = False
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    def warmup(self, timeout: float | None = 600.0) -> bool:
+        """
+        Load the model once, share its weights and start the workers.
+        Blocks until every worker has run a warm-up compression.
+        Returns whether the pool can serve requests. After every worker has
+        died, the next call starts a fresh set.
+        """
+        with self._warmup_lock:
+            if self._workers or self._failed:
+                return self.available
+            return self._start(timeout)
+
+    def _start(self, timeout: float | None) -> bool:
+        import torch.multiprocessing as mp
+
+        # The collector of a pool whose workers all died still reads the old queue
+        self._stop_collector()
+
+        print(f"[LinguaPool] Loading {self.model_name} once for {self.num_workers} workers...")
+        self.lingua._load()
+        if not self.lingua.available:
+            print("[LinguaPool] Model unavailable; requests pass text through", file=sys.stderr)
+            return False
+
+        self.lingua.compressor.model.share_memory()
+
+        self._warm.clear()
+        self._slots.clear()
+        self._ready.clear()
+        self._closing = False
+
+        ctx = mp.get_context(self.start_method)
+        self._requests = ctx.Queue()
+        self._responses = ctx.Queue()
+        self._running = ctx.Array("q", [-1] * self.num_workers, lock=False)
+
+        for slot in range(self.num_workers):
+            worker = ctx.Process(
+                target=_worker_main,
+                args=(self.lingua, self.threads_per_worker, self._requests, self._responses, self._running, slot),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+            self._slots[worker.pid] = slot
+
+        self._collector = threading.Thread(target=self._collect, name="lingua-pool-collector", daemon=True)
+        self._collector.start()
+
+        if not self._ready.wait(timeout):
+            print("[LinguaPool] Timed out waiting for workers to warm up", file=sys.stderr)
+            self._failed = True
+            self.close()
+            return False
+
+        warm = sum(self._warm.values())
+        if not warm:
+            print("[LinguaPool] No worker loaded the model; requests pass text through", file=sys.stderr)
+            self._failed = True
+            self.close()
+            return False
+        if warm < self.num_workers:
+            print(f"[LinguaPool] Only {warm} of {self.num_workers} workers loaded the model", file=sys.stderr)
+
+        self.available = True
+        print(f"[LinguaPool] Ready ({warm} workers × {self.threads_per_worker} threads)")
+        return True
+
+    def _stop_collector(self) -> None:
+        if self._collector is None:
+            return
+        self._responses.put(None)
+        self._collector.join(timeout=10)
+        if self._collector.is_alive():
+            print("[LinguaPool] Collector thread did not stop", file=sys.stderr)
+        self._collector = None
+
+    def close(self) -> None:
+        if not self._workers and self._collector is None:
+            return
+        self._closing = True
+        self.available = False
+        with self._lock:
+            workers = list(self._workers)
+        for _ in workers:
+            self._requests.put(None)
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._stop_collector()
+        self._workers = []
+        with self._lock:
+            pending = list(self._pending)
+        for request_id in pending:
+            self._fail(request_id, "pool closed")
+
+    def __enter__(self):
+        self.warmup()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -------------------------------
+    # Requests
+    # -------------------------------
+    def _collect(self) -> None:
+        checked = time.monotonic()
+        while True:
+            try:
+                message = self._responses.get(timeout=_WATCH_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+            if time.monotonic() - checked >= _WATCH_INTERVAL:
+                self._check_workers()
+                checked = time.monotonic()
+            if not message:
+                continue
+
+            kind, pid = message[0], message[1]
+            if kind == "ready":
+                # A worker already found dead stays counted as not warm
+                self._warm.setdefault(pid, message[2])
+                if not message[2]:
+                    print(f"[LinguaPool] Worker {pid} could not load the model", file=sys.stderr)
+                self._check_ready()
+            else:
+                _, _, request_id, ok, payload = message
+                with self._lock:
+                    entry = self._pending.pop(request_id, None)
+                    self._retried.discard(request_id)
+                if entry is None:
+                    continue
+                future, text = entry
+                if ok:
+                    future.set_result(payload)
+                else:
+                    print(f"[LinguaPool] Error during compression: {payload}", file=sys.stderr)
+                    future.set_result(text)
+
+    def _check_ready(self) -> None:
+        if len(self._warm) >= self.num_workers:
+            self._ready.set()
+
+    def _check_workers(self) -> None:
+        """Drop dead workers; resubmit the request each was running, once."""
+        if self._closing:
+            return
+        with self._lock:
+            dead = [worker for worker in self._workers if worker.exitcode is not None]
+            for worker in dead:
+                self._workers.remove(worker)
+            alive = sum(self._warm.get(worker.pid, True) for worker in self._workers)
+        if not dead:
+            return
+
+        for worker in dead:
+            if self._warm.setdefault(worker.pid, False):
+                print(f"[LinguaPool] Worker {worker.pid} exited with code {worker.exitcode}", file=sys.stderr)
+            # Its last request is still pending if it died running it
+            request_id = self._running[self._slots[worker.pid]]
+            if request_id >= 0:
+                self._lost(request_id, worker.exitcode)
+        self._check_ready()
+
+        if not alive and self.available:
+            print("[LinguaPool] No workers left; requests pass text through", file=sys.stderr)
+            self.available = False
+            with self._lock:
+                pending = list(self._pending)
+            for request_id in pending:
+                self._fail(request_id, "no workers left")
+
+    def _lost(self, request_id: int, exitcode: int) -> None:
+        """A worker died with `request_id` unanswered: resubmit it once, then give up on it."""
+        with self._lock:
+            retry = request_id in self._pending and request_id not in self._retried and bool(self._workers)
+            if retry:
+                self._retried.add(request_id)
+                text = self._pending[request_id][1]
+        if retry:
+            self._requests.put((request_id, text))
+        else:
+            self._fail(request_id, f"worker exited with code {exitcode} while compressing")
+
+    def _fail(self, request_id: int, reason: str) -> None:
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            self._retried.discard(request_id)
+        if entry is not None:
+            future, text = entry
+            print(f"[LinguaPool] Error during compression: {reason}", file=sys.stderr)
+            future.set_result(text)
+
+    def submit(self, text: str) -> Future:
+        """Queue one prompt; the future resolves to the compressed text."""
+        future: Future = Future()
+        if not self.available and not self.warmup():
+            future.set_result(text)
+            return future
+
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (future, text)
+        self._requests.put((request_id, text))
+        return future
+
+    def _result(self, future: Future, text: str, deadline: float | None) -> str:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            print(f"[LinguaPool] No result within {self.request_timeout}s; passing text through", file=sys.stderr)
+            return text
+
+    def _deadline(self) -> float | None:
+        return None if self.request_timeout is None else time.monotonic() + self.request_timeout
+
+    def compress(self, text: str) -> str:
+        return self._result(self.submit(text), text, self._deadline())
+
+    def compress_batch(self, texts: list[str]) -> list[str]:
+        futures = [self.submit(text) for text in texts]
+        deadline = self._deadline()
+        compressed = [self._result(future, text, deadline) for future, text in zip(futures, texts)]
+        logger.debug("Compressed batch of %d prompts", len(texts))
+        return compressed
@@ -3,10 +3,51 @@ LLMCompressor
 Handles prompt compression using a smaller Gemini model.
 """
 
-from utils.llm_compression_client import call_compression_llm
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.llm_compression_client import (
+    call_compression_llm,
+    call_compression_llm_async,
+    MODEL_COMPRESSOR,
+)
+
+logger = logging.getLogger(__name__)
 
 class LLMCompressor:
-    def compress(self, text: str) -> str:
-        compressed = call_compression_llm(text)
-        print(f"[LLMCompressor] Compressed from {len(text.split())} → {len(compressed.split())} words")
+    model_name = MODEL_COMPRESSOR
+
+    def __init__(self, model=None):
+        """
+        :param model: Optional GenerativeModel-compatible object used instead of
+                      the client's module-level model (e.g. a local stub).
+        """
+        self.model = model
+
+    def compress(self, text: str, target_tokens: int | None = None) -> str:
+        compressed = call_compression_llm(text, model=self.model, target_tokens=target_tokens)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Compressed from %d → %d words", len(text.split()), len(compressed.split()))
+        return compressed
+
+    async def compress_async(self, text: str, timeout: float | None = None, target_tokens: int | None = None) -> str:
+        compressed = await call_compression_llm_async(text, timeout=timeout, model=self.model, target_tokens=target_tokens)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Compressed from %d → %d words", len(text.split()), len(compressed.split()))
+        return compressed
+
+    def compress_batch(self, texts: list[str], max_workers: int = 8) -> list[str]:
+        """
+        Rewrite a batch of prompts with at most `max_workers` Gemini calls in flight.
+        Results are returned in input order.
+        """
+        if not texts:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(texts)))) as pool:
+            compressed = list(pool.map(lambda text: call_compression_llm(text, model=self.model), texts))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            before = sum(len(text.split()) for text in texts)
+            after = sum(len(text.split()) for text in compressed)
+            logger.debug("Compressed batch of %d from %d → %d words", len(texts), before, after)
         return compressed
@@ -3,11 +3,29 @@ RuleBasedCompressor
 Performs deterministic, semantics-preserving normalization only.
 """
 
-from utils.normalization import normalize_text_custom
+import logging
+from typing import Iterable, Iterator
+
+from utils.normalization import compile_normalization_plan
 from enums.unicode_mode import UnicodeMode
 
+logger = logging.getLogger(__name__)
 
 class RuleBasedCompressor:
+    DEFAULT_CONFIG = {
+        "unicode_mode": UnicodeMode.COMPATIBILITY,
+        "remove_zero_width_flag": True,
+        "strip_marks": True,
+        "normalize_elongation_flag": True,
+        "collapse_emoji_flag": True,
+        "normalize_punct_flag": True,
+        "normalize_whitespace_flag": True,
+        "alias_urls": False,
+        "alias_emails": False,
+        "alias_numbers": False,
+        "lowercase": False,
+    }
+
     def __init__(
         self,
         *,
@@ -17,27 +35,39 @@ class RuleBasedCompressor:
         :param normalization_config: Optional overrides passed to normalize_text_custom.
         """
         self.normalization_config = normalization_config or {}
+        self.effective_config = {**self.DEFAULT_CONFIG, **self.normalization_config}
+        self._normalize = compile_normalization_plan(**self.effective_config)
 
     def compress(self, text: str) -> str:
-        original_len = len(text.split())
-
-        normalized = normalize_text_custom(
-            text,
-            unicode_mode=UnicodeMode.COMPATIBILITY,
-            remove_zero_width_flag=True,
-            strip_marks=True,
-            normalize_elongation_flag=True,
-            collapse_emoji_flag=True,
-            normalize_punct_flag=True,
-            normalize_whitespace_flag=True,
-            alias_urls=False,
-            alias_emails=False,
-            alias_numbers=False,
-            lowercase=False,
-            **self.normalization_config,
-        )
-
-        new_len = len(normalized.split())
-        print(f"[RuleBasedCompressor] Words {original_len} → {new_len}")
+        normalized = self._normalize(text)
+
+        # Word counts split the whole text; only pay for them when they are logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Words %d → %d", len(text.split()), len(normalized.split()))
 
         return normalized
+
+    def compress_batch(self, texts: list[str]) -> list[str]:
+        """
+        Normalize a batch of prompts in one sweep, reporting a single summary line.
+        """
+        normalized = [self._normalize(text) for text in texts]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            original_len = sum(len(text.split()) for text in texts)
+            new_len = sum(len(text.split()) for text in normalized)
+            logger.debug("Batch of %d: words %d → %d", len(texts), original_len, new_len)
+
+        return normalized
+
+    def compress_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Normalize a chunked input (e.g. a large RAG context or log dump) without
+        holding it in memory; the joined output equals compress("".join(chunks)).
+        """
+        return self._normalize.stream(chunks)
+
+    def compress_file(self, path: str, chunk_chars: int = 1 << 20, encoding: str = "utf-8") -> Iterator[str]:
+        """Stream-normalize a text file, `chunk_chars` characters at a time."""
+        with open(path, "r", encoding=encoding, newline="") as f:
+            yield from self.compress_stream(iter(lambda: f.read(chunk_chars), ""))
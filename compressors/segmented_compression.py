@@ -0,0 +1,277 @@
+"""
+Segmented Compression
+---------------------
+Runs a compression stage over prompts longer than its window.
+
+The prompt is split on paragraph boundaries, then sentence boundaries, then
+(as a last resort) word boundaries into segments of at most
+`max_segment_tokens`. Segments are compressed in parallel and reassembled in
+order with their original separators, so latency grows with
+segments / max_workers rather than with total length.
+
+With a `token_budget`, the budget is shared across the whole prompt: each
+segment gets a share proportional to its size and the stage is asked for at
+most that many tokens (`compress(text, target_tokens=...)`).
+
+SegmentedCompressor exposes compress/compress_async/compress_batch, so it
+can wrap a LinguaCompressor or an LLMCompressor inside PromptCompressor.
+"""
+
+import asyncio
+import inspect
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.token_counters import TokenCounter, ApproxTokenCounter
+
+logger = logging.getLogger(__name__)
+
+# TinyLlama has a 2048-token context; leave room for LLMLingua's own framing
+LINGUA_SEGMENT_TOKENS = 1024
+# Gemini's window is far larger; segments exist to spread latency over parallel calls
+LLM_SEGMENT_TOKENS = 4096
+
+_PARAGRAPH_RE = re.compile(r"\S.*?(?:\n\s*\n\s*|\Z)", re.DOTALL)
+_SENTENCE_RE = re.compile(r"\S.*?(?:[.!?。！？…]+[\"'”’)\]]*(?:\s+|\Z)|\Z)", re.DOTALL)
+_WORD_RE = re.compile(r"\S+\s*")
+_TRAILING_SPACE_RE = re.compile(r"\s*\Z")
+
+
+def _pieces(text: str, pattern: re.Pattern) -> list[str]:
+    """Split text into consecutive pieces that each carry their trailing whitespace."""
+    pieces = pattern.findall(text)
+    leading = text[: len(text) - len(text.lstrip())]
+    if pieces and leading:
+        pieces[0] = leading + pieces[0]
+    return pieces or ([text] if text else [])
+
+
+def split_segments(text: str, max_tokens: int, counter: TokenCounter | None = None) -> list[str]:
+    """
+    Split `text` into segments of at most `max_tokens` tokens, preferring
+    paragraph, then sentence, then word boundaries. "".join(segments) == text.
+    A single word longer than the window becomes its own segment.
+    """
+    counter = counter or ApproxTokenCounter()
+
+    units: list[tuple[str, int]] = []
+    for paragraph in _pieces(text, _PARAGRAPH_RE):
+        tokens = counter.count_text(paragraph, "segmentation")
+        if tokens <= max_tokens:
+            units.append((paragraph, tokens))
+            continue
+        for sentence in _pieces(paragraph, _SENTENCE_RE):
+            tokens = counter.count_text(sentence, "segmentation")
+            if tokens <= max_tokens:
+                units.append((sentence, tokens))
+                continue
+            units.extend((word, counter.count_text(word, "segmentation")) for word in _pieces(sentence, _WORD_RE))
+
+    # Greedily pack units into windows
+    segments, current, current_tokens = [], [], 0
+    for unit, tokens in units:
+        if current and current_tokens + tokens > max_tokens:
+            segments.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        segments.append("".join(current))
+    return segments
+
+
+def allocate_budget(sizes: list[int], budget: int) -> list[int]:
+    """
+    Split `budget` across segments in proportion to their sizes (largest
+    remainder, at least 1 token each). The shares sum to max(budget, len(sizes)).
+    """
+    if not sizes:
+        return []
+    total = sum(sizes) or len(sizes)
+    exact = [budget * (size or 1) / total for size in sizes]
+    shares = [max(1, int(x)) for x in exact]
+    leftover = budget - sum(shares)
+    for i in sorted(range(len(sizes)), key=lambda i: exact[i] - int(exact[i]), reverse=True)[: max(0, leftover)]:
+        shares[i] += 1
+    return shares
+
+
+class SegmentedCompressor:
+    def __init__(
+        self,
+        stage,
+        max_segment_tokens: int = LINGUA_SEGMENT_TOKENS,
+        counter: TokenCounter | None = None,
+        max_workers: int = 4,
+        token_budget: int | None = None,
+        prefix_marker: str | None = None,
+    ):
+        """
+        :param stage: Compressor with compress(text) (e.g. LinguaCompressor, LLMCompressor).
+        :param max_segment_tokens: Window size per stage call.
+        :param counter: Sizes segments; defaults to a local ApproxTokenCounter
+                        so splitting never costs network round-trips.
+        :param max_workers: Segments compressed concurrently.
+        :param token_budget: Target tokens for the whole compressed prompt; the
+                             stage must accept compress(text, target_tokens=...).
+        :param prefix_marker: Text up to and including this marker is kept once,
+                              verbatim, and only the rest is segmented
+                              (e.g. SPLIT_MARKER for the LLM stage).
+        """
+        if token_budget is not None and "target_tokens" not in inspect.signature(stage.compress).parameters:
+            raise ValueError(f"{type(stage).__name__}.compress does not accept target_tokens; cannot apply a token budget")
+
+        self.stage = stage
+        self.max_segment_tokens = max_segment_tokens
+        self.counter = counter or ApproxTokenCounter()
+        self.max_workers = max(1, max_workers)
+        self.token_budget = token_budget
+        self.prefix_marker = prefix_marker
+
+        # PromptCompressor reads these for its config fingerprint
+        self.model_name = getattr(stage, "model_name", None)
+        self.ratio = getattr(stage, "ratio", None)
+        self.precision = getattr(stage, "precision", "fp32")
+
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._segmented_calls = 0
+        self._segments = 0
+
+    def config(self) -> dict:
+        return {
+            "max_segment_tokens": self.max_segment_tokens,
+            "token_budget": self.token_budget,
+            "prefix_marker": self.prefix_marker,
+        }
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "calls": self._calls,
+                "segmented_calls": self._segmented_calls,
+                "segments": self._segments,
+                "mean_segments": self._segments / self._calls if self._calls else 0.0,
+            }
+
+    def warmup(self, *args, **kwargs):
+        warmup = getattr(self.stage, "warmup", None)
+        ready = warmup(*args, **kwargs) if warmup else True
+        self._ready = True
+        return ready
+
+    def _ensure_ready(self) -> None:
+        # Load the stage once before segments fan out, not once per thread
+        if self._ready:
+            return
+        with self._ready_lock:
+            if not self._ready:
+                self.warmup()
+
+    # -------------------------------
+    # Planning
+    # -------------------------------
+    def _plan(self, text: str, target_tokens: int | None) -> tuple[str, list[str], list[int | None]]:
+        """Returns (kept prefix, segments, per-segment target tokens)."""
+        prefix, body = "", text
+        if self.prefix_marker and self.prefix_marker in text:
+            head, body = text.split(self.prefix_marker, 1)
+            prefix = f"{head.strip()}\n\n{self.prefix_marker}\n" if head.strip() else f"{self.prefix_marker}\n"
+
+        segments = split_segments(body, self.max_segment_tokens, self.counter)
+        budget = self.token_budget if target_tokens is None else target_tokens
+        sizes = [self.counter.count_text(segment, "segmentation") for segment in segments]
+        if budget is None or sum(sizes) <= budget:
+            targets = [None] * len(segments)
+        else:
+            targets = allocate_budget(sizes, budget)
+
+        with self._stats_lock:
+            self._calls += 1
+            self._segments += len(segments)
+            self._segmented_calls += len(segments) > 1
+        return prefix, segments, targets
+
+    @staticmethod
+    def _reassemble(prefix: str, segments: list[str], compressed: list[str]) -> str:
+        parts = []
+        for original, text in zip(segments, compressed):
+            separator = _TRAILING_SPACE_RE.search(original).group()
+            parts.append(text.strip() + (separator or " "))
+        return (prefix + "".join(parts)).strip()
+
+    def _compress_segment(self, segment: str, target: int | None) -> str:
+        if target is None:
+            return self.stage.compress(segment)
+        return self.stage.compress(segment, target_tokens=target)
+
+    # -------------------------------
+    # Public API
+    # -------------------------------
+    def compress(self, text: str, target_tokens: int | None = None) -> str:
+        """
+        :param target_tokens: Overrides the configured token_budget for this call.
+        """
+        prefix, segments, targets = self._plan(text, target_tokens)
+        if len(segments) <= 1:
+            return self._compress_segment(text, targets[0] if targets else None)
+
+        self._ensure_ready()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(segments))) as pool:
+            compressed = list(pool.map(self._compress_segment, segments, targets))
+        logger.debug("Compressed %d segments", len(segments))
+        return self._reassemble(prefix, segments, compressed)
+
+    async def compress_async(self, text: str, timeout: float | None = None, target_tokens: int | None = None) -> str:
+        """Segments are rewritten with at most max_workers stage calls in flight; `timeout` applies per call."""
+        prefix, segments, targets = self._plan(text, target_tokens)
+        if len(segments) <= 1:
+            segments, targets = [text], targets or [None]
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run(segment: str, target: int | None) -> str:
+            async with semaphore:
+                if target is None:
+                    return await self.stage.compress_async(segment, timeout=timeout)
+                return await self.stage.compress_async(segment, timeout=timeout, target_tokens=target)
+
+        compressed = await asyncio.gather(*(run(s, t) for s, t in zip(segments, targets)))
+        if len(compressed) == 1:
+            return compressed[0]
+        return self._reassemble(prefix, segments, list(compressed))
+
+    def compress_batch(self, texts: list[str], max_workers: int | None = None) -> list[str]:
+        """
+        Segments of every prompt share one pool of `max_workers` (default:
+        the instance's) concurrent stage calls. Results are in input order.
+        """
+        if not texts:
+            return []
+        plans = []
+        for text in texts:
+            prefix, segments, targets = self._plan(text, None)
+            # Prompts that fit one window go to the stage whole
+            plans.append((prefix, segments, targets) if len(segments) > 1 else ("", [text], targets or [None]))
+        jobs = [(i, segment, target) for i, (_, segments, targets) in enumerate(plans)
+                for segment, target in zip(segments, targets)]
+
+        self._ensure_ready()
+        workers = max(1, min(max_workers or self.max_workers, len(jobs) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(lambda job: self._compress_segment(job[1], job[2]), jobs))
+
+        grouped: list[list[str]] = [[] for _ in texts]
+        for (i, _, _), output in zip(jobs, outputs):
+            grouped[i].append(output)
+
+        results = []
+        for text, (prefix, segments, _), compressed in zip(texts, plans, grouped):
+            if len(segments) == 1:
+                results.append(compressed[0])
+            else:
+                results.append(self._reassemble(prefix, segments, compressed))
+        return results
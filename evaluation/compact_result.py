@@ -0,0 +1,157 @@
+"""
+CompactResult
+Memory-lean form of CompressionResult for keeping results at corpus scale.
+
+Each stage output is stored as a delta against the stage before it
+(original → rule → lingua → final). The stages mostly delete and lightly
+rewrite, so a delta is a packed int32 array of copy ranges over the previous
+stage's pieces plus one string holding the literal pieces that changed. Outputs identical
+to their base are stored as None. A delta that would not be smaller than
+the text itself is stored as the plain string instead.
+
+Objects are slotted; stage texts are decoded on access, not kept.
+"""
+
+import json
+import re
+import sys
+from array import array
+
+from evaluation.result import CompressionResult
+
+# Words with their trailing whitespace (plus any leading whitespace run)
+_PIECE_RE = re.compile(r"\S+\s*|\s+")
+_TUPLE_BYTES = sys.getsizeof((None, None))
+# Base pieces searched ahead of the last match before a piece counts as new
+_SEARCH_WINDOW = 64
+
+
+def _pieces(text: str) -> list[str]:
+    return _PIECE_RE.findall(text)
+
+
+def encode_delta(base: str, text: str) -> tuple[array, str] | str | None:
+    """
+    None if text == base; otherwise (ops, literals). `ops` is a flat int32
+    array of pairs: (start, end) copies base pieces [start:end]; (-1, n)
+    takes the next n characters of `literals`. Falls back to `text` itself
+    when the delta would not be smaller.
+    """
+    if text == base:
+        return None
+    base_pieces, pieces = _pieces(base), _pieces(text)
+    ops, literals = array("i"), []
+    position, copy_start, pending = 0, None, []
+
+    def flush_copy():
+        if copy_start is not None:
+            ops.extend((copy_start, position))
+
+    # Greedy forward alignment: every stage keeps the order of what survives,
+    # so each piece is looked for a short window ahead of the last match
+    for piece in pieces:
+        try:
+            match = base_pieces.index(piece, position, position + _SEARCH_WINDOW)
+        except ValueError:
+            flush_copy()
+            copy_start = None
+            pending.append(piece)
+            continue
+        if pending:
+            literal = "".join(pending)
+            ops.extend((-1, len(literal)))
+            literals.append(literal)
+            pending = []
+        if copy_start is None or match != position:
+            flush_copy()
+            copy_start = match
+        position = match + 1
+    flush_copy()
+    if pending:
+        literal = "".join(pending)
+        ops.extend((-1, len(literal)))
+        literals.append(literal)
+    delta = (ops, "".join(literals))
+    if sys.getsizeof(ops) + sys.getsizeof(delta[1]) + _TUPLE_BYTES >= sys.getsizeof(text):
+        return text
+    return delta
+
+
+def apply_delta(base: str, delta: tuple[array, str] | str | None) -> str:
+    if delta is None:
+        return base
+    if isinstance(delta, str):
+        return delta
+    ops, literals = delta
+    base_pieces = _pieces(base)
+    out = []
+    offset = 0
+    for i in range(0, len(ops), 2):
+        start, end = ops[i], ops[i + 1]
+        if start < 0:
+            out.append(literals[offset:offset + end])
+            offset += end
+        else:
+            out.extend(base_pieces[start:end])
+    return "".join(out)
+
+
+class CompactResult:
+    __slots__ = (
+        "timestamp", "original_prompt", "_rule", "_lingua", "_final",
+        "tokens_before", "tokens_after_rule", "tokens_after_lingua", "tokens_after_final",
+        "used_llm", "savings_pct", "input_similarity", "output_similarity", "_metadata",
+    )
+
+    def __init__(self, result: CompressionResult):
+        self.timestamp = result.timestamp
+        self.original_prompt = result.original_prompt
+        self._rule = encode_delta(result.original_prompt, result.rule_output)
+        self._lingua = encode_delta(result.rule_output, result.lingua_output)
+        self._final = encode_delta(result.lingua_output, result.final_output)
+        self.tokens_before = result.tokens_before
+        self.tokens_after_rule = result.tokens_after_rule
+        self.tokens_after_lingua = result.tokens_after_lingua
+        self.tokens_after_final = result.tokens_after_final
+        self.used_llm = result.used_llm
+        self.savings_pct = result.savings_pct
+        self.input_similarity = result.input_similarity
+        self.output_similarity = result.output_similarity
+        # One string instead of a dict tree
+        self._metadata = json.dumps(result.metadata, separators=(",", ":")) if result.metadata else None
+
+    @property
+    def rule_output(self) -> str:
+        return apply_delta(self.original_prompt, self._rule)
+
+    @property
+    def lingua_output(self) -> str:
+        return apply_delta(self.rule_output, self._lingua)
+
+    @property
+    def final_output(self) -> str:
+        return apply_delta(self.lingua_output, self._final)
+
+    @property
+    def metadata(self) -> dict | None:
+        return json.loads(self._metadata) if self._metadata else None
+
+    def to_result(self) -> CompressionResult:
+        rule_output = self.rule_output
+        lingua_output = apply_delta(rule_output, self._lingua)
+        return CompressionResult(
+            timestamp=self.timestamp,
+            original_prompt=self.original_prompt,
+            rule_output=rule_output,
+            lingua_output=lingua_output,
+            final_output=apply_delta(lingua_output, self._final),
+            tokens_before=self.tokens_before,
+            tokens_after_rule=self.tokens_after_rule,
+            tokens_after_lingua=self.tokens_after_lingua,
+            tokens_after_final=self.tokens_after_final,
+            used_llm=self.used_llm,
+            savings_pct=self.savings_pct,
+            input_similarity=self.input_similarity,
+            output_similarity=self.output_similarity,
+            metadata=self.metadata,
+        )
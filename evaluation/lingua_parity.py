@@ -0,0 +1,124 @@
+"""
+Lingua precision parity
+-----------------------
+Compares each reduced-precision LinguaCompressor mode against the float32
+baseline on a reference corpus, alongside each mode's load footprint:
+- mean/min_jaccard: token-level (whitespace token multiset) Jaccard of the
+  compress() output, i.e. what production gets from LLMLingua's
+  compress_prompt, with its latency
+- scoring_mean/min_jaccard: Jaccard of kept positions on the single-pass
+  scoring path (score_batch + kept_indices) used by LinguaBatchScheduler
+
+compress() is called without its error fallback, so a mode that cannot
+run under compress_prompt (e.g. an incompatible ONNX export) is reported
+as an error instead of silently passing prompts through. The fp32 run is
+the reference for every other mode, so run_parity raises if it fails.
+
+Usage:
+    python -m evaluation.lingua_parity --modes bf16 int8 --corpus test_prompts.json
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+
+from compressors.lingua_compression_layer import LinguaCompressor
+
+
+def load_corpus(path: str) -> list[str]:
+    """Reads a prompts file: a {name: prompt} object or a list of prompts."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return list(data.values()) if isinstance(data, dict) else list(data)
+
+
+def _jaccard(a, b) -> float:
+    a, b = set(int(i) for i in a), set(int(i) for i in b)
+    union = a | b
+    return len(a & b) / len(union) if union else 1.0
+
+
+def _token_jaccard(a: str, b: str) -> float:
+    a, b = Counter(a.split()), Counter(b.split())
+    union = sum((a | b).values())
+    return sum((a & b).values()) / union if union else 1.0
+
+
+def _outputs(lingua: LinguaCompressor, corpus: list[str]) -> tuple[list[str], float]:
+    started = time.perf_counter()
+    outputs = [lingua._compress_one(text) for text in corpus]
+    return outputs, time.perf_counter() - started
+
+
+def _overlap(pairs, similarity) -> tuple[float, float]:
+    values = [similarity(a, b) for a, b in pairs]
+    return (sum(values) / len(values), min(values)) if values else (1.0, 1.0)
+
+
+def _kept_sets(lingua: LinguaCompressor, corpus: list[str]) -> tuple[list, float]:
+    started = time.perf_counter()
+    scores = [lingua.score_batch([text])[0] for text in corpus]
+    elapsed = time.perf_counter() - started
+    return [lingua.kept_indices(s) for s in scores], elapsed
+
+
+def run_parity(
+    corpus: list[str],
+    modes: list[str],
+    model_name: str = "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+    ratio: float = 0.5,
+) -> dict:
+    """
+    Compress and score the corpus with fp32 and every requested mode, one
+    model loaded at a time.
+    :return: {mode: {footprint..., mean_compress_ms, mean_jaccard, min_jaccard,
+                     mean_score_ms, scoring_mean_jaccard, scoring_min_jaccard}}
+    :raises RuntimeError: if the fp32 baseline cannot be loaded or run
+    """
+    report = {}
+    baseline = None
+
+    for mode in ["fp32"] + [m for m in modes if m != "fp32"]:
+        lingua = LinguaCompressor(model_name=model_name, ratio=ratio, precision=mode)
+        if not lingua.warmup():
+            if baseline is None:
+                raise RuntimeError("fp32 baseline unavailable: model failed to load")
+            report[mode] = {"error": "model unavailable"}
+            continue
+
+        try:
+            outputs, compress_elapsed = _outputs(lingua, corpus)
+        except Exception as e:
+            if baseline is None:
+                raise RuntimeError(f"fp32 baseline failed: compress() failed: {e}") from e
+            report[mode] = {**lingua.footprint, "error": f"compress() failed: {e}"}
+            continue
+        kept, score_elapsed = _kept_sets(lingua, corpus)
+        entry = {
+            **lingua.footprint,
+            "mean_compress_ms": 1000 * compress_elapsed / len(corpus) if corpus else 0.0,
+            "mean_score_ms": 1000 * score_elapsed / len(corpus) if corpus else 0.0,
+        }
+        if baseline is None:
+            baseline = (outputs, kept)
+        else:
+            entry["mean_jaccard"], entry["min_jaccard"] = _overlap(zip(baseline[0], outputs), _token_jaccard)
+            entry["scoring_mean_jaccard"], entry["scoring_min_jaccard"] = _overlap(zip(baseline[1], kept), _jaccard)
+        report[mode] = entry
+
+        # Release the weights before loading the next mode
+        del lingua
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compress() and scoring parity of Lingua precision modes vs float32")
+    parser.add_argument("--corpus", default="test_prompts.json")
+    parser.add_argument("--modes", nargs="+", default=["bf16", "int8"], choices=LinguaCompressor.PRECISIONS)
+    parser.add_argument("--model", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--ratio", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(json.dumps(run_parity(load_corpus(args.corpus), args.modes, args.model, args.ratio), indent=2))
@@ -0,0 +1,142 @@
+"""
+Columnar result store
+Batch outputs as Arrow tables instead of lists of CompressionResult objects.
+
+- ResultStoreWriter appends record batches to an Arrow IPC file ("arrow",
+  read back memory-mapped with zero copies) or a Parquet file ("parquet",
+  zstd-compressed, smallest on disk).
+- open_results() returns a pyarrow.Table; for Arrow files its buffers point
+  into the mapped file, so opening a million results costs no heap.
+- iter_results() materializes CompressionResults (or CompactResults) lazily,
+  one record batch at a time.
+
+pyarrow is optional and imported on use.
+"""
+
+import json
+from typing import Iterable, Iterator
+
+from evaluation.result import CompressionResult
+
+FORMATS = ("arrow", "parquet")
+
+
+def result_fields() -> list:
+    """Arrow fields of a CompressionResult; metadata is a JSON string column."""
+    import pyarrow as pa
+
+    return [
+        ("timestamp", pa.string()),
+        ("original_prompt", pa.string()),
+        ("rule_output", pa.string()),
+        ("lingua_output", pa.string()),
+        ("final_output", pa.string()),
+        ("tokens_before", pa.int64()),
+        ("tokens_after_rule", pa.int64()),
+        ("tokens_after_lingua", pa.int64()),
+        ("tokens_after_final", pa.int64()),
+        ("used_llm", pa.bool_()),
+        ("savings_pct", pa.float64()),
+        ("input_similarity", pa.float64()),
+        ("output_similarity", pa.float64()),
+        ("metadata", pa.string()),
+    ]
+
+
+def to_record_batch(results: Iterable[CompressionResult]):
+    import pyarrow as pa
+
+    schema = pa.schema(result_fields())
+    columns = {name: [] for name in schema.names}
+    for result in results:
+        for name in schema.names:
+            value = getattr(result, name)
+            if name == "metadata":
+                value = json.dumps(value) if value is not None else None
+            columns[name].append(value)
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class ResultStoreWriter:
+    def __init__(self, path: str, format: str = "arrow"):
+        """
+        :param format: "arrow" (IPC file, zero-copy memory-mapped reads) or "parquet".
+        """
+        import pyarrow as pa
+
+        if format not in FORMATS:
+            raise ValueError(f"Unknown result store format: {format} (expected one of {FORMATS})")
+        self.path = path
+        self.format = format
+        self.rows = 0
+
+        schema = pa.schema(result_fields())
+        if format == "arrow":
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        else:
+            import pyarrow.parquet as pq
+
+            self._sink = None
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+
+    def write(self, results: list[CompressionResult]) -> None:
+        if not results:
+            return
+        batch = to_record_batch(results)
+        self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self) -> None:
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_results(path: str, results: Iterable[CompressionResult], format: str = "arrow",
+                  batch_size: int = 4096) -> int:
+    """Write `results` in batches; returns the row count."""
+    with ResultStoreWriter(path, format) as writer:
+        batch = []
+        for result in results:
+            batch.append(result)
+            if len(batch) >= batch_size:
+                writer.write(batch)
+                batch = []
+        writer.write(batch)
+        return writer.rows
+
+
+def open_results(path: str, columns: list[str] | None = None):
+    """
+    pyarrow.Table of stored results. Arrow IPC files are memory-mapped and
+    read without copying; Parquet files are decoded (only `columns`, if given).
+    """
+    import pyarrow as pa
+
+    with open(path, "rb") as f:
+        is_parquet = f.read(4) == b"PAR1"
+    if is_parquet:
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, columns=columns, memory_map=True)
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.select(columns) if columns else table
+
+
+def iter_results(table, compact: bool = False) -> Iterator[CompressionResult]:
+    """Rows of an open_results() table as CompressionResults (or CompactResults)."""
+    if compact:
+        from evaluation.compact_result import CompactResult
+
+    for batch in table.to_batches():
+        for row in batch.to_pylist():
+            row["metadata"] = json.loads(row["metadata"]) if row["metadata"] is not None else None
+            result = CompressionResult(**row)
+            yield CompactResult(result) if compact else result
@@ -1,12 +1,234 @@
-from sentence_transformers import SentenceTransformer
+"""
+Semantic similarity
+Sentence embeddings (all-MiniLM-L6-v2) behind a small service that:
+- loads the model on first use, not at import
+- caches embeddings by text hash (memory LRU, optional SQLite file), so
+  re-scoring unchanged texts never re-encodes them
+- encodes every uncached text of a call in one batch and scores with a
+  single matmul (`similarity_matrix`)
+- can run the encoder through ONNX Runtime or dynamic int8 quantization
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
-_model = SentenceTransformer("all-MiniLM-L6-v2")
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
 
 def cosine_sim(a, b):
     return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
 
+
+class SimilarityService:
+    # torch: reference; onnx: ONNX Runtime via sentence-transformers' onnx
+    # backend (needs optimum[onnxruntime]); int8: dynamic quantization of Linear layers
+    BACKENDS = ("torch", "onnx", "int8")
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        backend: str = "torch",
+        max_entries: int = 4096,
+        db_path: str | None = None,
+    ):
+        """
+        :param max_entries: Embeddings kept in the memory LRU.
+        :param db_path: SQLite file for a persistent embedding cache (None = memory only).
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown similarity backend: {backend} (expected one of {self.BACKENDS})")
+
+        self.model_name = model_name
+        self.backend = backend
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.encoded = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    # -------------------------------
+    # Model
+    # -------------------------------
+    def _load(self):
+        with self._load_lock:
+            if self._model is not None:
+                return self._model
+            from sentence_transformers import SentenceTransformer
+
+            if self.backend == "onnx":
+                model = SentenceTransformer(self.model_name, backend="onnx")
+            else:
+                model = SentenceTransformer(self.model_name)
+                if self.backend == "int8":
+                    import torch
+
+                    model = torch.ao.quantization.quantize_dynamic(
+                        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                    )
+            self._model = model
+            return model
+
+    def warmup(self) -> None:
+        self._load()
+
+    # -------------------------------
+    # Embedding cache
+    # -------------------------------
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}\0{self.backend}\0".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            return vector
+        if self._db is not None:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vector)
+                return vector
+        return None
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Unit-norm embeddings, one row per text; only uncached texts are encoded."""
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        vectors: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in vectors:
+                    continue
+                vector = self._lookup(key)
+                if vector is not None:
+                    vectors[key] = vector
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if missing:
+            encoded = np.asarray(
+                self._load().encode(list(missing.values()), normalize_embeddings=True),
+                dtype=np.float32,
+            )
+            with self._lock:
+                self.encoded += len(missing)
+                for key, vector in zip(missing, encoded):
+                    vectors[key] = vector
+                    self._remember(key, vector)
+                if self._db is not None:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, vector.tobytes()) for key, vector in zip(missing, encoded)],
+                    )
+                    self._db.commit()
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    # -------------------------------
+    # Scoring
+    # -------------------------------
+    def similarity_matrix(self, list_a: list[str], list_b: list[str]) -> np.ndarray:
+        """Cosine similarity of every list_a[i] against every list_b[j]."""
+        list_a, list_b = list(list_a), list(list_b)
+        if not list_a or not list_b:
+            return np.zeros((len(list_a), len(list_b)), dtype=np.float32)
+        vectors = self.embed(list_a + list_b)
+        return vectors[: len(list_a)] @ vectors[len(list_a):].T
+
+    def pairwise(self, list_a: list[str], list_b: list[str]) -> list[float]:
+        """Similarity of list_a[i] and list_b[i]."""
+        if len(list_a) != len(list_b):
+            raise ValueError("pairwise similarity expects lists of equal length")
+        if not list_a:
+            return []
+        vectors = self.embed(list(list_a) + list(list_b))
+        va, vb = vectors[: len(list_a)], vectors[len(list_a):]
+        return [float(s) for s in np.einsum("ij,ij->i", va, vb)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "encoded": self.encoded,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_service: SimilarityService | None = None
+_service_lock = threading.Lock()
+
+
+def get_similarity_service() -> SimilarityService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = SimilarityService()
+        return _service
+
+
+def configure_similarity(**kwargs) -> SimilarityService:
+    """Replace the module-level service, e.g. to add a db_path or pick a backend."""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+        _service = SimilarityService(**kwargs)
+        return _service
+
+
 def semantic_similarity(a: str, b: str) -> float:
-    va = _model.encode(a, normalize_embeddings=True)
-    vb = _model.encode(b, normalize_embeddings=True)
-    return cosine_sim(va, vb)
+    return get_similarity_service().pairwise([a], [b])[0]
+
+def semantic_similarity_batch(list_a: list[str], list_b: list[str]) -> list[float]:
+    """
+    Pairwise similarity of list_a[i] and list_b[i], encoding both lists in one call.
+    """
+    if len(list_a) != len(list_b):
+        raise ValueError("semantic_similarity_batch expects lists of equal length")
+    return get_similarity_service().pairwise(list_a, list_b)
+
+def similarity_matrix(list_a: list[str], list_b: list[str]) -> np.ndarray:
+    return get_similarity_service().similarity_matrix(list_a, list_b)
@@ -0,0 +1,209 @@
+"""
+AsyncPromptCompressor
+asyncio front end for PromptCompressor.
+
+Gemini calls (rewrite and token counts) are awaited under a shared
+concurrency semaphore with per-call timeouts, so many prompts can be in
+flight at once. CPU-bound stages (normalization, Lingua, embeddings) run
+in a thread pool executor to keep the event loop responsive.
+"""
+
+import asyncio
+import datetime
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from layers.prompt_compressing_layer import PromptCompressor
+from evaluation.result import CompressionResult
+from evaluation.similarity import semantic_similarity
+
+
+class AsyncPromptCompressor:
+    def __init__(
+        self,
+        compressor: PromptCompressor | None = None,
+        *,
+        max_concurrency: int = 16,
+        llm_timeout: float | None = 60.0,
+        count_timeout: float | None = 10.0,
+        executor: Executor | None = None,
+        score_similarity: bool = True,
+    ):
+        """
+        :param compressor: Configured PromptCompressor whose stages, counter and cache are reused.
+        :param max_concurrency: Maximum Gemini calls in flight across all prompts.
+        :param llm_timeout: Seconds before a rewrite is abandoned; the Lingua output is kept instead.
+        :param count_timeout: Seconds before a token count call fails.
+        :param executor: Executor for CPU-bound stages (defaults to a small thread pool).
+        :param score_similarity: Compute input_similarity for each result.
+        """
+        self.compressor = compressor or PromptCompressor()
+        self.max_concurrency = max_concurrency
+        self.llm_timeout = llm_timeout
+        self.count_timeout = count_timeout
+        self.score_similarity = score_similarity
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 1),
+            thread_name_prefix="compress-cpu",
+        )
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _limit(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run_cpu(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def _count_tokens(self, text: str, label: str) -> int:
+        if not self.compressor.show_tokens:
+            return 0
+        async with self._limit():
+            return await asyncio.wait_for(
+                self.compressor.counter.count_text_async(text, label), self.count_timeout
+            )
+
+    async def compress_prompt(self, prompt_text: str) -> CompressionResult:
+        cache = self.compressor.cache
+        if cache is not None:
+            key = self.compressor._cache_key(prompt_text)
+            cached = cache.get(key)
+            if cached is not None:
+                self.compressor.instrumentation.count("cache_hits")
+                return cached
+            self.compressor.instrumentation.count("cache_misses")
+
+        result = await self._compress_one(prompt_text)
+
+        if cache is not None and self.compressor._cacheable(result):
+            cache.put(key, result)
+        return result
+
+    async def _compress_one(self, prompt_text: str) -> CompressionResult:
+        """Same template handling as PromptCompressor, so both share cache entries."""
+        c = self.compressor
+        if c.templates is None:
+            return await self._compress_prompt(prompt_text)
+        # A new template's cleanup and token counts run once, off the event loop
+        split = await self._run_cpu(c._split_template, prompt_text)
+        if split is None:
+            return await self._compress_prompt(prompt_text)
+        template, content = split
+        return c._compose(template, prompt_text, await self._compress_prompt(content))
+
+    async def _compress_prompt(self, prompt_text: str) -> CompressionResult:
+        # Work runs in the executor or on the network, so spans record wall time only
+        timings = {}
+        with self.compressor.instrumentation.span("pipeline", timings, cpu=False):
+            return await self._run_stages(prompt_text, timings)
+
+    async def _run_stages(self, prompt_text: str, timings: dict) -> CompressionResult:
+        c = self.compressor
+        span = c.instrumentation.span
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        metadata = {}
+
+        # Token counts run as background tasks; they must not outlive this call
+        counts: list[asyncio.Task] = []
+
+        def count(text: str, label: str) -> asyncio.Task:
+            task = asyncio.create_task(self._count_tokens(text, label))
+            counts.append(task)
+            return task
+
+        try:
+            # Stage 1 – Original (counted while the rule pass runs)
+            before_task = count(prompt_text, "before compression")
+
+            # Stage 2 – Rule-based cleanup
+            with span("rule", timings, cpu=False):
+                rule_output = await self._run_cpu(c.rule.compress, prompt_text)
+            rule_task = count(rule_output, "after rule-based compression")
+
+            signature, reuse = (None, None)
+            if c.near_duplicates is not None:
+                signature, reuse = await self._run_cpu(c._find_near_duplicate, rule_output)
+
+            # Stage 3 – Lingua compression
+            lingua_decision = c._decide_lingua(rule_output) if reuse is None else c._NEAR_DUPLICATE
+            if lingua_decision["run"]:
+                with span("lingua", timings, cpu=False):
+                    lingua_output = await self._run_cpu(c.lingua.compress, rule_output)
+                lingua_task = count(lingua_output, "after lingua compression")
+            elif reuse is not None:
+                lingua_output = reuse[0]
+                lingua_task = count(lingua_output, "after lingua compression")
+            else:
+                lingua_output = rule_output
+                lingua_task = rule_task
+
+            # Stage 4 – Optional LLM rewrite
+            llm_decision = c._decide_llm(rule_output, lingua_output) if reuse is None else c._NEAR_DUPLICATE
+            used_llm = llm_decision["run"]
+            final_output = lingua_output if reuse is None else reuse[1]
+            if used_llm:
+                try:
+                    async with self._limit():
+                        started = time.perf_counter()
+                        with span("llm", timings, cpu=False):
+                            final_output = await c.llm.compress_async(lingua_output, timeout=self.llm_timeout)
+                        c.instrumentation.count("llm_calls")
+                        if c.policy is not None:
+                            c.policy.record_llm_latency(time.perf_counter() - started)
+                except asyncio.TimeoutError:
+                    used_llm = False
+                    metadata["llm_error"] = f"timeout after {self.llm_timeout}s"
+                    if c.policy is not None and self.llm_timeout is not None:
+                        c.policy.record_llm_latency(self.llm_timeout)
+
+            tokens_after_final, tokens_before, tokens_after_rule, tokens_after_lingua = await asyncio.gather(
+                count(final_output, "after compression"),
+                before_task,
+                rule_task,
+                lingua_task,
+            )
+        finally:
+            # On an error or cancellation, stop the counts still running and
+            # wait for them, so none is left pending or with an unread exception
+            for task in counts:
+                task.cancel()
+            await asyncio.gather(*counts, return_exceptions=True)
+
+        # A timed-out rewrite is not the output later near duplicates should reuse
+        if reuse is None and "llm_error" not in metadata:
+            c._remember(signature, rule_output, lingua_output, final_output)
+
+        input_sim = None
+        if self.score_similarity:
+            with span("similarity", timings, cpu=False):
+                input_sim = await self._run_cpu(semantic_similarity, prompt_text, final_output)
+
+        c._record_tokens(tokens_before, tokens_after_rule, tokens_after_lingua, tokens_after_final)
+        metadata.update(c._result_metadata(lingua_decision, llm_decision, timings, reuse and reuse[2]) or {})
+
+        return CompressionResult(
+            timestamp=timestamp,
+            original_prompt=prompt_text,
+            rule_output=rule_output,
+            lingua_output=lingua_output,
+            final_output=final_output,
+            tokens_before=tokens_before,
+            tokens_after_rule=tokens_after_rule,
+            tokens_after_lingua=tokens_after_lingua,
+            tokens_after_final=tokens_after_final,
+            used_llm=used_llm,
+            savings_pct=c._savings(tokens_before, tokens_after_final),
+            input_similarity=input_sim,
+            metadata=metadata or None,
+        )
+
+    async def compress_many(self, prompts: list[str]) -> list[CompressionResult]:
+        """Compress prompts concurrently; results are returned in input order."""
+        return list(await asyncio.gather(*(self.compress_prompt(p) for p in prompts)))
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,257 @@
+"""
+ConversationCompressor
+Incremental compression of multi-turn chat histories.
+
+Chat clients resend the whole history every turn. This layer keeps per-
+session state: one turn per history position (its compressed text and
+demotion level) plus the compressed form of every message seen, keyed by a
+hash of its role and text. Each call compresses only the messages that are
+new, so per-turn cost is O(new content), not O(history). Identical messages
+share the compressed text but are budgeted as separate turns.
+
+When the compressed history goes over `max_history_tokens`, turns are
+demoted oldest first (the latest `keep_recent` messages are never touched):
+level 1 squeezes a turn to `squeeze_ratio` of its tokens with a stage that
+accepts target_tokens (Lingua by default), level 2 drops it. Demotions are
+remembered, so a later turn does not redo them.
+
+History messages use Gemini's format ({"role", "parts"}) or {"role", "content"}.
+"""
+
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+from layers.prompt_compressing_layer import PromptCompressor
+from utils.token_counters import TokenCounter
+
+# Demotion levels of a stored turn
+KEPT, SQUEEZED, DROPPED = 0, 1, 2
+
+
+@dataclass
+class _Compressed:
+    original_tokens: int
+    text: str
+    tokens: int
+
+
+@dataclass
+class _Turn:
+    key: str
+    original_tokens: int
+    text: str
+    tokens: int
+    level: int = KEPT
+
+    @classmethod
+    def from_compressed(cls, key: str, compressed: _Compressed) -> "_Turn":
+        return cls(key=key, original_tokens=compressed.original_tokens, text=compressed.text,
+                   tokens=compressed.tokens)
+
+
+@dataclass
+class _Session:
+    turns: list[_Turn] = field(default_factory=list)               # by history position
+    compressed: dict[str, _Compressed] = field(default_factory=dict)   # by message key
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@dataclass
+class ConversationResult:
+    history: list[dict]
+    tokens_before: int
+    tokens_after: int
+    new_messages: int
+    reused_messages: int
+    squeezed_messages: int
+    dropped_messages: int
+
+
+def _message_text(message: dict) -> str:
+    if "parts" in message:
+        return "\n".join(_part_text(part) for part in message["parts"] if _part_text(part) is not None)
+    return message.get("content") or ""
+
+
+def _part_text(part) -> str | None:
+    if isinstance(part, str):
+        return part
+    if isinstance(part, dict) and "text" in part:
+        return part["text"]
+    return None   # images, files and other non-text parts are passed through
+
+
+def _with_text(message: dict, text: str) -> dict:
+    rebuilt = dict(message)
+    if "parts" in message:
+        rebuilt["parts"] = [text] + [part for part in message["parts"] if _part_text(part) is None]
+    else:
+        rebuilt["content"] = text
+    return rebuilt
+
+
+class ConversationCompressor:
+    def __init__(
+        self,
+        compressor: PromptCompressor | None = None,
+        *,
+        max_history_tokens: int | None = None,
+        keep_recent: int = 2,
+        squeeze_ratio: float = 0.5,
+        squeeze: Callable[[str, int], str] | None = None,
+        counter: TokenCounter | None = None,
+        max_sessions: int = 1024,
+    ):
+        """
+        :param compressor: Pipeline applied once to each new message.
+        :param max_history_tokens: Token limit for the compressed history (None = no limit).
+        :param keep_recent: Latest messages that are never demoted.
+        :param squeeze_ratio: Share of its tokens a squeezed turn keeps.
+        :param squeeze: fn(text, target_tokens) used for level-1 demotion; defaults
+                        to the compressor's Lingua stage when it accepts target_tokens,
+                        otherwise over-limit turns are dropped directly.
+        :param counter: Counts compressed turns; defaults to the compressor's counter.
+        :param max_sessions: Sessions kept in memory; the least recently used is evicted.
+        """
+        self.compressor = compressor or PromptCompressor()
+        self.max_history_tokens = max_history_tokens
+        self.keep_recent = keep_recent
+        self.squeeze_ratio = squeeze_ratio
+        self.counter = counter or self.compressor.counter
+        self.max_sessions = max_sessions
+
+        if squeeze is None:
+            lingua = self.compressor.lingua
+            if "target_tokens" in inspect.signature(lingua.compress).parameters:
+                squeeze = lambda text, target: lingua.compress(text, target_tokens=target)
+        self.squeeze = squeeze
+
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -------------------------------
+    # Sessions
+    # -------------------------------
+    def _session(self, session_id: str) -> _Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def reset(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    @staticmethod
+    def _turn_key(message: dict, text: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(str(message.get("role", "")).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    # -------------------------------
+    # Compression
+    # -------------------------------
+    def _compress_new(self, texts: list[str]) -> list[_Compressed]:
+        results = self.compressor.compress_batch(texts)
+        turns = []
+        for text, result in zip(texts, results):
+            if self.compressor.show_tokens:
+                before, after = result.tokens_before, result.tokens_after_final
+            else:
+                before = self.counter.count_text(text, "conversation turn")
+                after = self.counter.count_text(result.final_output, "conversation turn")
+            turns.append(_Compressed(original_tokens=before, text=result.final_output, tokens=after))
+        return turns
+
+    def _demote(self, turn: _Turn) -> None:
+        if turn.level == KEPT and self.squeeze is not None:
+            target = max(1, int(turn.tokens * self.squeeze_ratio))
+            turn.text = self.squeeze(turn.text, target)
+            turn.tokens = self.counter.count_text(turn.text, "conversation squeeze")
+            turn.level = SQUEEZED
+        else:
+            turn.tokens = 0
+            turn.level = DROPPED
+
+    def _rebudget(self, ordered: list[_Turn]) -> None:
+        """Demote the oldest turns, one level per pass, until the history fits."""
+        total = sum(turn.tokens for turn in ordered)
+        candidates = ordered[: max(0, len(ordered) - self.keep_recent)]
+        for level in (KEPT, SQUEEZED):
+            for turn in candidates:
+                if total <= self.max_history_tokens:
+                    return
+                if turn.level == level:
+                    before = turn.tokens
+                    self._demote(turn)
+                    total -= before - turn.tokens
+
+    def compress_history(self, session_id: str, history: list[dict]) -> ConversationResult:
+        """
+        Compress `history` (the full message list resent by the client) for
+        `session_id`. Messages seen before in this session are reused as is.
+        """
+        session = self._session(session_id)
+        texts = [_message_text(message) for message in history]
+        keys = [self._turn_key(message, text) for message, text in zip(history, texts)]
+
+        with session.lock:
+            missing: dict[str, str] = {}
+            for key, text in zip(keys, texts):
+                if key not in session.compressed and key not in missing:
+                    missing[key] = text
+            if missing:
+                for key, compressed in zip(missing, self._compress_new(list(missing.values()))):
+                    session.compressed[key] = compressed
+
+            # Turns at unchanged positions keep their demotion; from the first
+            # edited position on they restart from the compressed text
+            same = 0
+            while same < min(len(keys), len(session.turns)) and session.turns[same].key == keys[same]:
+                same += 1
+            ordered = session.turns[:same] + [
+                _Turn.from_compressed(key, session.compressed[key]) for key in keys[same:]
+            ]
+            session.turns = ordered
+
+            # Messages no longer in the history are forgotten
+            present = set(keys)
+            for key in [key for key in session.compressed if key not in present]:
+                del session.compressed[key]
+
+            if self.max_history_tokens is not None:
+                self._rebudget(ordered)
+
+            compressed = [
+                _with_text(message, turn.text)
+                for message, turn in zip(history, ordered)
+                if turn.level != DROPPED
+            ]
+            return ConversationResult(
+                history=compressed,
+                tokens_before=sum(turn.original_tokens for turn in ordered),
+                tokens_after=sum(turn.tokens for turn in ordered),
+                new_messages=sum(key in missing for key in keys),
+                reused_messages=sum(key not in missing for key in keys),
+                squeezed_messages=sum(turn.level == SQUEEZED for turn in ordered),
+                dropped_messages=sum(turn.level == DROPPED for turn in ordered),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(session.turns) for session in self._sessions.values()),
+                "messages": sum(len(session.compressed) for session in self._sessions.values()),
+            }
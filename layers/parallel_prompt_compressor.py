@@ -0,0 +1,130 @@
+"""
+ParallelPromptCompressor
+Shards prompts across a process pool so the CPU-bound stages
+(normalization, Lingua, embeddings) use every core instead of one GIL.
+
+Each worker builds its own PromptCompressor once, in the pool initializer,
+and keeps it for the life of the pool. Torch intra-op threads are pinned to
+cpu_count // num_workers per worker so N workers do not each start a full
+set of BLAS/OpenMP threads. Results come back in input order.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Iterable, Iterator
+
+from layers.prompt_compressing_layer import PromptCompressor
+from evaluation.result import CompressionResult
+
+# Per-process pipeline, set by _init_worker
+_worker_compressor = None
+
+
+def _pin_threads(threads: int) -> None:
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass   # already fixed once torch has run parallel work in this process
+
+
+def _init_worker(factory: Callable[..., PromptCompressor], kwargs: dict, threads: int) -> None:
+    global _worker_compressor
+    _pin_threads(threads)
+    _worker_compressor = factory(**kwargs)
+    _worker_compressor.warmup()
+
+
+def _worker_ready(delay: float) -> int:
+    # Holding each task briefly makes the pool hand the next one to another worker
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _compress_chunk(prompts: list[str]) -> list[CompressionResult]:
+    return _worker_compressor.compress_batch(prompts)
+
+
+class ParallelPromptCompressor:
+    def __init__(
+        self,
+        num_workers: int | None = None,
+        *,
+        threads_per_worker: int | None = None,
+        chunk_size: int = 8,
+        start_method: str = "spawn",
+        factory: Callable[..., PromptCompressor] = PromptCompressor,
+        **compressor_kwargs,
+    ):
+        """
+        :param num_workers: Worker processes (defaults to os.cpu_count()).
+        :param threads_per_worker: Torch/OpenMP threads per worker (defaults to cpu_count // num_workers).
+        :param chunk_size: Prompts sent to a worker per task; each chunk runs through compress_batch.
+        :param start_method: "spawn" starts workers without the parent's torch thread pools.
+        :param factory: Picklable callable building each worker's pipeline (module-level function or class).
+        :param compressor_kwargs: Passed to `factory` in every worker.
+        """
+        cpus = os.cpu_count() or 1
+        self.num_workers = num_workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.num_workers)
+        self.chunk_size = max(1, chunk_size)
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=get_context(start_method),
+            initializer=_init_worker,
+            initargs=(factory, compressor_kwargs, self.threads_per_worker),
+        )
+
+    def warmup(self) -> set[int]:
+        """Start every worker and let it load its models; returns the worker pids."""
+        futures = [self._executor.submit(_worker_ready, 0.05) for _ in range(self.num_workers)]
+        return {future.result() for future in futures}
+
+    def _chunks(self, prompts: Iterable[str]) -> Iterator[list[str]]:
+        chunk = []
+        for prompt in prompts:
+            chunk.append(prompt)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def imap(self, prompts: Iterable[str]) -> Iterator[CompressionResult]:
+        """
+        Results in input order, yielded as soon as each chunk and all before it
+        are done. At most 2 chunks per worker are in flight, so `prompts` can
+        be a stream longer than memory.
+        """
+        pending = deque()
+        for chunk in self._chunks(prompts):
+            pending.append(self._executor.submit(_compress_chunk, chunk))
+            if len(pending) >= 2 * self.num_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def compress_batch(self, prompts: list[str]) -> list[CompressionResult]:
+        return list(self.imap(prompts))
+
+    def compress_prompt(self, prompt_text: str) -> CompressionResult:
+        return self._executor.submit(_compress_chunk, [prompt_text]).result()[0]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,332 @@
+"""
+PipelinedPromptCompressor
+Stage-parallel execution of the PromptCompressor pipeline.
+
+Each stage (rule → lingua → llm → eval) is a set of worker threads joined
+to the next stage by a bounded queue, so while Gemini rewrites prompt i,
+Lingua can already run on prompt i+1 and the embedding model can score
+prompt i-1. Full queues block the stage before them (backpressure), and
+at most `max_in_flight` prompts are admitted but not yet yielded, so one
+slow prompt cannot make the reorder buffer grow: memory stays bounded
+however long the input stream is. Results are reordered and yielded in
+input order.
+
+count_tokens calls go over the network, so all of them run on the LLM
+stage's workers; the single-worker rule and Lingua stages only compute.
+
+`stats()` reports, per stage, how busy its workers were (occupancy) and how
+deep its input queue ran; the stage with the highest occupancy and a full
+input queue is the bottleneck.
+"""
+
+import datetime
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from layers.prompt_compressing_layer import PromptCompressor
+from evaluation.result import CompressionResult
+from evaluation.similarity import semantic_similarity
+
+STAGES = ("rule", "lingua", "llm", "eval")
+
+# The LLM stage waits on the network, so it gets the most workers
+DEFAULT_CONCURRENCY = {"rule": 1, "lingua": 1, "llm": 8, "eval": 1}
+
+
+@dataclass
+class _Job:
+    index: int
+    prompt: str
+    timestamp: str
+    key: str | None = None
+    fields: dict = field(default_factory=dict)
+    result: CompressionResult | None = None
+    error: BaseException | None = None
+
+
+class _StageStats:
+    def __init__(self):
+        self.items = 0
+        self.busy = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+
+
+class PipelinedPromptCompressor:
+    def __init__(
+        self,
+        compressor: PromptCompressor | None = None,
+        *,
+        queue_size: int = 16,
+        concurrency: dict | None = None,
+        max_in_flight: int | None = None,
+    ):
+        """
+        :param compressor: Configured PromptCompressor whose stages, counter, policy and cache are reused.
+        :param queue_size: Capacity of each inter-stage queue (and of the output queue).
+        :param concurrency: Worker threads per stage, merged over DEFAULT_CONCURRENCY.
+        :param max_in_flight: Prompts admitted but not yet yielded, including those
+                              waiting to be reordered (default: 4 × queue_size).
+        """
+        self.compressor = compressor or PromptCompressor()
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight or 4 * queue_size
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+
+        self._stats_lock = threading.Lock()
+        self._stats = {stage: _StageStats() for stage in STAGES}
+        self._wall = 0.0
+
+    # -------------------------------
+    # Stages
+    # -------------------------------
+    def _rule(self, job: _Job) -> None:
+        c, f = self.compressor, job.fields
+        # A recurring instruction prefix is split off as PromptCompressor does;
+        # its one-time cleanup and counts run on the LLM stage
+        split = c.templates.split(job.prompt) if c.templates is not None else None
+        f["template"], f["content"] = split or (None, job.prompt)
+        f["rule_output"] = c.rule.compress(f["content"])
+
+    def _lingua(self, job: _Job) -> None:
+        c, f = self.compressor, job.fields
+        f["signature"], f["reuse"] = c._find_near_duplicate(f["rule_output"])
+        if f["reuse"] is not None:
+            f["lingua_decision"] = c._NEAR_DUPLICATE
+            f["lingua_output"] = f["reuse"][0]
+            return
+        f["lingua_decision"] = c._decide_lingua(f["rule_output"])
+        if f["lingua_decision"]["run"]:
+            f["lingua_output"] = c.lingua.compress(f["rule_output"])
+        else:
+            f["lingua_output"] = f["rule_output"]
+
+    def _llm(self, job: _Job) -> None:
+        c, f = self.compressor, job.fields
+        # Counts for the earlier stages run here, on the network-bound workers
+        if f["template"] is not None:
+            c.templates.prepare(f["template"], c._fill_template)
+        f["tokens_before"] = c._count_tokens(f["content"], "before compression")
+        f["tokens_after_rule"] = c._count_tokens(f["rule_output"], "after rule-based compression")
+        if f["lingua_decision"]["run"] or f["reuse"] is not None:
+            f["tokens_after_lingua"] = c._count_tokens(f["lingua_output"], "after lingua compression")
+        else:
+            f["tokens_after_lingua"] = f["tokens_after_rule"]
+
+        if f["reuse"] is not None:
+            f["llm_decision"] = c._NEAR_DUPLICATE
+            f["final_output"] = f["reuse"][1]
+        else:
+            f["llm_decision"] = c._decide_llm(f["rule_output"], f["lingua_output"])
+        if f["llm_decision"]["run"]:
+            started = time.perf_counter()
+            f["final_output"] = c.llm.compress(f["lingua_output"])
+            c.instrumentation.count("llm_calls")
+            if c.policy is not None:
+                c.policy.record_llm_latency(time.perf_counter() - started)
+        elif f["reuse"] is None:
+            f["final_output"] = f["lingua_output"]
+        f["tokens_after_final"] = c._count_tokens(f["final_output"], "after compression")
+        if f["reuse"] is None:
+            c._remember(f["signature"], f["rule_output"], f["lingua_output"], f["final_output"])
+
+    def _eval(self, job: _Job) -> None:
+        c, f = self.compressor, job.fields
+        input_sim = semantic_similarity(f["content"], f["final_output"]) if c.score_similarity else None
+        job.result = CompressionResult(
+            timestamp=job.timestamp,
+            original_prompt=f["content"],
+            rule_output=f["rule_output"],
+            lingua_output=f["lingua_output"],
+            final_output=f["final_output"],
+            tokens_before=f["tokens_before"],
+            tokens_after_rule=f["tokens_after_rule"],
+            tokens_after_lingua=f["tokens_after_lingua"],
+            tokens_after_final=f["tokens_after_final"],
+            used_llm=f["llm_decision"]["run"],
+            savings_pct=c._savings(f["tokens_before"], f["tokens_after_final"]),
+            input_similarity=input_sim,
+            metadata=c._result_metadata(f["lingua_decision"], f["llm_decision"], f["timings"],
+                                        f["reuse"] and f["reuse"][2]),
+        )
+        c._record_tokens(f["tokens_before"], f["tokens_after_rule"], f["tokens_after_lingua"], f["tokens_after_final"])
+        if f["template"] is not None:
+            job.result = c._compose(f["template"], job.prompt, job.result)
+        if c.cache is not None and c._cacheable(job.result):
+            c.cache.put(job.key, job.result)
+
+    # -------------------------------
+    # Execution
+    # -------------------------------
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the run is stopped."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _stage_worker(self, stage: str, inbox: queue.Queue, outbox: queue.Queue,
+                      downstream_workers: int, remaining: list, lock: threading.Lock,
+                      stop: threading.Event) -> None:
+        handler = getattr(self, f"_{stage}")
+        stats = self._stats[stage]
+        while not stop.is_set():
+            depth = inbox.qsize()
+            try:
+                job = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if job is None:
+                break
+
+            started = time.perf_counter()
+            if job.error is None:
+                try:
+                    with self.compressor.instrumentation.span(stage, job.fields.setdefault("timings", {})):
+                        handler(job)
+                except Exception as e:
+                    job.error = e
+            elapsed = time.perf_counter() - started
+
+            with self._stats_lock:
+                stats.items += 1
+                stats.busy += elapsed
+                stats.depth_total += depth
+                stats.depth_max = max(stats.depth_max, depth)
+
+            if not self._put(outbox, job, stop):
+                return
+
+        # The last worker of a stage to finish closes the next stage
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(downstream_workers):
+                self._put(outbox, None, stop)
+
+    @staticmethod
+    def _acquire(slots: threading.Semaphore, stop: threading.Event) -> bool:
+        """Wait for an in-flight slot; gives up once the run is stopped."""
+        while not stop.is_set():
+            if slots.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _feed(self, prompts: Iterable[str], inbox: queue.Queue, out: queue.Queue,
+              stage_workers: int, slots: threading.Semaphore, stop: threading.Event, errors: list) -> None:
+        cache = self.compressor.cache
+        try:
+            for index, prompt in enumerate(prompts):
+                if not self._acquire(slots, stop):
+                    return
+                job = _Job(index, prompt, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                if cache is not None:
+                    job.key = self.compressor._cache_key(prompt)
+                    job.result = cache.get(job.key)
+                    if job.result is not None:
+                        self.compressor.instrumentation.count("cache_hits")
+                        if not self._put(out, job, stop):
+                            return
+                        continue
+                    self.compressor.instrumentation.count("cache_misses")
+                if not self._put(inbox, job, stop):
+                    return
+        except Exception as e:
+            errors.append(e)   # the input iterable failed; raised once earlier results are out
+        finally:
+            for _ in range(stage_workers):
+                self._put(inbox, None, stop)
+
+    def run(self, prompts: Iterable[str]) -> Iterator[CompressionResult]:
+        """
+        Stream prompts through the stage pipeline; results are yielded in
+        input order. A failed prompt raises its exception at its position.
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in STAGES]
+        out: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        # Released as each result is yielded; bounds the stages plus the reorder buffer
+        slots = threading.Semaphore(self.max_in_flight)
+        feed_errors: list = []
+        threads = []
+
+        for position, stage in enumerate(STAGES):
+            workers = max(1, self.concurrency[stage])
+            last_stage = position == len(STAGES) - 1
+            outbox = out if last_stage else queues[position + 1]
+            downstream = 1 if last_stage else max(1, self.concurrency[STAGES[position + 1]])
+            remaining, lock = [workers], threading.Lock()
+            for n in range(workers):
+                threads.append(threading.Thread(
+                    target=self._stage_worker,
+                    args=(stage, queues[position], outbox, downstream, remaining, lock, stop),
+                    name=f"pipeline-{stage}-{n}",
+                    daemon=True,
+                ))
+        threads.append(threading.Thread(
+            target=self._feed,
+            args=(prompts, queues[0], out, max(1, self.concurrency[STAGES[0]]), slots, stop, feed_errors),
+            name="pipeline-feed",
+            daemon=True,
+        ))
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        pending: dict[int, _Job] = {}
+        next_index = 0
+        try:
+            while True:
+                job = out.get()
+                if job is None:
+                    break
+                pending[job.index] = job
+                while next_index in pending:
+                    ready = pending.pop(next_index)
+                    next_index += 1
+                    slots.release()
+                    if ready.error is not None:
+                        raise ready.error
+                    yield ready.result
+            if feed_errors:
+                raise feed_errors[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=1.0)
+            with self._stats_lock:
+                self._wall += time.perf_counter() - started
+
+    def compress_batch(self, prompts: list[str]) -> list[CompressionResult]:
+        return list(self.run(prompts))
+
+    def stats(self) -> dict:
+        """
+        occupancy: busy time / (workers × wall time) for each stage
+        queue depth: items waiting in the stage's input queue when a worker took one
+        bottleneck: the stage with the highest occupancy
+        """
+        with self._stats_lock:
+            report = {}
+            for stage in STAGES:
+                s = self._stats[stage]
+                workers = max(1, self.concurrency[stage])
+                report[stage] = {
+                    "workers": workers,
+                    "items": s.items,
+                    "occupancy": s.busy / (workers * self._wall) if self._wall else 0.0,
+                    "mean_service_ms": 1000 * s.busy / s.items if s.items else 0.0,
+                    "mean_queue_depth": s.depth_total / s.items if s.items else 0.0,
+                    "max_queue_depth": s.depth_max,
+                }
+            report["bottleneck"] = max(STAGES, key=lambda stage: report[stage]["occupancy"])
+            return report
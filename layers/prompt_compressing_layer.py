@@ -4,21 +4,85 @@ Combines rule-based, Lingua, and LLM-based compression with token counting.
 """
 
 import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from compressors.rule_based_compression_layer import RuleBasedCompressor
 from compressors.llm_compression import LLMCompressor
 from compressors.lingua_compression_layer import LinguaCompressor
-from utils.GeminiTokenCounter import GeminiTokenCounter
+from compressors.segmented_compression import SegmentedCompressor, LINGUA_SEGMENT_TOKENS, LLM_SEGMENT_TOKENS
+from utils.token_counters import TokenCounter
+from utils.compression_cache import CompressionCache
+from utils.llm_compression_client import SPLIT_MARKER
+from utils.stage_policy import StagePolicy
+from utils.template_cache import TemplateCache, Template
+from utils.instrumentation import Instrumentation, NULL_INSTRUMENTATION
 from evaluation.result import CompressionResult
-from evaluation.similarity import semantic_similarity
+from evaluation.similarity import semantic_similarity, semantic_similarity_batch
 
 print(">>> prompt_compressing_layer.py file loaded")
 
+logger = logging.getLogger(__name__)
+
 class PromptCompressor:
-    def __init__(self, use_llm: bool = True, show_tokens: bool = True):
+    def __init__(
+        self,
+        use_llm: bool = True,
+        show_tokens: bool = True,
+        counter: TokenCounter | None = None,
+        cache: CompressionCache | None = None,
+        lingua=None,
+        policy: StagePolicy | None = None,
+        score_similarity: bool = True,
+        instrumentation: Instrumentation | None = None,
+        segmented: bool = False,
+        token_budget: int | None = None,
+        templates: TemplateCache | None = None,
+        near_duplicates=None,
+    ):
+        """
+        :param counter: Token counter shared by every stage. Defaults to
+                        GeminiTokenCounter; pass a local counter (see
+                        utils.token_counters) to avoid count_tokens round-trips.
+        :param cache: Optional result cache; identical prompts under the same
+                      pipeline config skip every stage.
+        :param lingua: Optional Lingua stage (e.g. a LinguaWorkerPool); defaults
+                       to an in-process LinguaCompressor.
+        :param policy: Optional StagePolicy deciding per prompt whether Lingua
+                       and the LLM rewrite run; without one every enabled stage runs.
+        :param score_similarity: Compute input_similarity (loads the embedding model).
+        :param instrumentation: Receives per-stage spans and counters and adds
+                                metadata["timings"] to results; disabled by default.
+        :param segmented: Split long prompts into windows sized for each stage
+                          (see compressors.segmented_compression) and compress
+                          the segments in parallel.
+        :param token_budget: Target tokens for the final output, shared across
+                             the segments of the last enabled stage. Implies segmented.
+        :param templates: Detects recurring instruction prefixes; each is cleaned
+                          and counted once and only the content after it runs
+                          through the pipeline.
+        :param near_duplicates: utils.near_duplicate_index.NearDuplicateIndex of
+                                earlier rule-based outputs; a prompt close to
+                                one that differs only by word substitutions
+                                reuses its Lingua and LLM outputs (with the
+                                words swapped) instead of running those stages.
+        """
         print("[PromptCompressor] Initializing...")
 
         self.use_llm = use_llm
         self.show_tokens = show_tokens
+        self.cache = cache
+        self.policy = policy
+        self.score_similarity = score_similarity
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.templates = templates
+        self.near_duplicates = near_duplicates
+
+        if counter is None:
+            print("[PromptCompressor] Initializing GeminiTokenCounter...")
+            from utils.GeminiTokenCounter import GeminiTokenCounter
+            counter = GeminiTokenCounter()
+        self.counter = counter
 
         print("[PromptCompressor] Initializing RuleBasedCompressor...")
         self.rule = RuleBasedCompressor()
@@ -27,48 +91,284 @@ class PromptCompressor:
         self.llm = LLMCompressor()
 
         print("[PromptCompressor] Initializing LinguaCompressor...")
-        self.lingua = LinguaCompressor()   # loads model lazily inside class
+        self.lingua = lingua or LinguaCompressor(counter=self.counter)   # loads model lazily inside class
 
-        print("[PromptCompressor] Initializing GeminiTokenCounter...")
-        self.counter = GeminiTokenCounter()
+        if segmented or token_budget is not None:
+            print("[PromptCompressor] Enabling segmented compression...")
+            self.lingua = SegmentedCompressor(
+                self.lingua,
+                max_segment_tokens=LINGUA_SEGMENT_TOKENS,
+                token_budget=None if use_llm else token_budget,
+            )
+            self.llm = SegmentedCompressor(
+                self.llm,
+                max_segment_tokens=LLM_SEGMENT_TOKENS,
+                max_workers=8,
+                token_budget=token_budget if use_llm else None,
+                prefix_marker=SPLIT_MARKER,
+            )
 
         print("[PromptCompressor] Initialization complete.")
 
 
+    def warmup(self) -> None:
+        """Load the Lingua model ahead of the first request."""
+        self.lingua.warmup()
+
+    def config_fingerprint(self) -> dict:
+        """Everything that affects a CompressionResult besides the input text."""
+        normalization = {
+            key: getattr(value, "value", value)
+            for key, value in self.rule.effective_config.items()
+        }
+        fingerprint = {
+            "normalization": normalization,
+            "lingua_model": self.lingua.model_name,
+            "lingua_ratio": self.lingua.ratio,
+            "lingua_precision": getattr(self.lingua, "precision", "fp32"),
+            "compressor_model": self.llm.model_name,
+            "use_llm": self.use_llm,
+            "show_tokens": self.show_tokens,
+            "score_similarity": self.score_similarity,
+            "counter": type(self.counter).__name__,
+            "policy": self.policy.config() if self.policy is not None else None,
+        }
+        # Only added when in use, so unsegmented cache keys stay as they were
+        segmentation = {
+            stage: getattr(self, stage).config()
+            for stage in ("lingua", "llm")
+            if isinstance(getattr(self, stage), SegmentedCompressor)
+        }
+        if segmentation:
+            fingerprint["segmentation"] = segmentation
+        if self.templates is not None:
+            fingerprint["templates"] = self.templates.config()
+        if self.near_duplicates is not None:
+            fingerprint["near_duplicates"] = self.near_duplicates.config()
+        return fingerprint
+
+    def _cache_key(self, prompt_text: str) -> str:
+        return CompressionCache.make_key(prompt_text, self.config_fingerprint())
+
     def _count_tokens(self, text: str, label: str):
         """Wrapper to conditionally show token counts."""
-        return self.counter.count_text(text, operation=label) if self.show_tokens else 0
+        if not self.show_tokens:
+            return 0
+        with self.instrumentation.span("count_tokens", cpu=False):
+            return self.counter.count_text(text, operation=label)
+
+    def _count_tokens_batch(self, pool: ThreadPoolExecutor, texts: list[str], label: str) -> list[int]:
+        """Count a whole stage concurrently; count_tokens is a network round-trip."""
+        if not self.show_tokens:
+            return [0] * len(texts)
+        return list(pool.map(lambda text: self._count_tokens(text, label), texts))
 
+    @staticmethod
+    def _savings(tokens_before: int, tokens_after: int) -> float:
+        if not tokens_before:
+            return 0.0
+        return round(((tokens_before - tokens_after) / tokens_before) * 100, 2)
+
+
+    def _decide_lingua(self, rule_output: str) -> dict:
+        if self.policy is None:
+            return {"run": True, "reason": "no policy"}
+        return self.policy.decide_lingua(rule_output)
+
+    def _decide_llm(self, rule_output: str, lingua_output: str) -> dict:
+        if not self.use_llm:
+            return {"run": False, "reason": "use_llm disabled"}
+        if self.policy is None:
+            return {"run": True, "reason": "no policy"}
+        return self.policy.decide_llm(rule_output, lingua_output)
+
+    def _record_tokens(self, before: int, rule: int, lingua: int, final: int) -> None:
+        if not self.show_tokens:
+            return
+        count = self.instrumentation.count
+        count("tokens", before, stage="original")
+        count("tokens", rule, stage="rule")
+        count("tokens", lingua, stage="lingua")
+        count("tokens", final, stage="final")
 
     def compress_prompt(self, prompt_text: str) -> CompressionResult:
+        if self.cache is not None:
+            key = self._cache_key(prompt_text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.instrumentation.count("cache_hits")
+                return cached
+            self.instrumentation.count("cache_misses")
+            result = self._compress_one(prompt_text)
+            if self._cacheable(result):
+                self.cache.put(key, result)
+            return result
+        return self._compress_one(prompt_text)
+
+    @staticmethod
+    def _cacheable(result: CompressionResult) -> bool:
+        """
+        False when a stage was skipped for a transient reason (a policy budget
+        ran out); caching that result would serve the skip to later processes.
+        """
+        policy = (result.metadata or {}).get("policy") or {}
+        return not any(decision.get("transient") for decision in policy.values())
+
+    # -------------------------------
+    # Templates
+    # -------------------------------
+    def _fill_template(self, template: Template) -> None:
+        template.rule_output = self.rule.compress(template.prefix).strip()
+        template.tokens_before = self._count_tokens(template.prefix, "template before compression")
+        template.tokens_after_rule = self._count_tokens(template.rule_output, "template after rule-based compression")
+
+    def _split_template(self, prompt_text: str) -> tuple[Template, str] | None:
+        if self.templates is None:
+            return None
+        split = self.templates.split(prompt_text)
+        if split is not None:
+            self.templates.prepare(split[0], self._fill_template)
+        return split
+
+    def _compose(self, template: Template, prompt_text: str, content: CompressionResult) -> CompressionResult:
+        """
+        Full-prompt result from the cached template and the content's result.
+        Token counts are the template's plus the content's; input_similarity
+        is the content's (the instruction is kept verbatim after cleanup).
+        """
+        head = template.rule_output + "\n"
+        kept = template.tokens_after_rule
+        tokens_before = template.tokens_before + content.tokens_before
+        tokens_after_final = kept + content.tokens_after_final
+        metadata = dict(content.metadata or {})
+        metadata["template"] = {"source": template.source, "prefix_tokens": template.tokens_before}
+        return CompressionResult(
+            timestamp=content.timestamp,
+            original_prompt=prompt_text,
+            rule_output=head + content.rule_output,
+            lingua_output=head + content.lingua_output,
+            final_output=head + content.final_output,
+            tokens_before=tokens_before,
+            tokens_after_rule=kept + content.tokens_after_rule,
+            tokens_after_lingua=kept + content.tokens_after_lingua,
+            tokens_after_final=tokens_after_final,
+            used_llm=content.used_llm,
+            savings_pct=self._savings(tokens_before, tokens_after_final),
+            input_similarity=content.input_similarity,
+            metadata=metadata,
+        )
+
+    def _compress_one(self, prompt_text: str) -> CompressionResult:
+        split = self._split_template(prompt_text)
+        if split is None:
+            return self._compress_prompt(prompt_text)
+        template, content = split
+        return self._compose(template, prompt_text, self._compress_prompt(content))
+
+    def _compress_many(self, prompts: list[str], max_workers: int) -> list[CompressionResult]:
+        splits = [self._split_template(prompt_text) for prompt_text in prompts]
+        inputs = [split[1] if split else prompt_text for prompt_text, split in zip(prompts, splits)]
+        results = self._compress_batch(inputs, max_workers)
+        return [
+            self._compose(split[0], prompt_text, result) if split else result
+            for prompt_text, split, result in zip(prompts, splits, results)
+        ]
+
+    # -------------------------------
+    # Near duplicates
+    # -------------------------------
+    _NEAR_DUPLICATE = {"run": False, "reason": "near duplicate"}
+
+    def _find_near_duplicate(self, rule_output: str):
+        """
+        (signature, reuse): reuse is (lingua_output, final_output, info) taken
+        from the closest stored prompt, patched to this one, or None.
+        """
+        if self.near_duplicates is None:
+            return None, None
+        # Imported here so numpy stays off the cold-start path when the index is unused
+        from utils.near_duplicate_index import word_swaps, swaps_preserved, apply_swaps
+
+        with self.instrumentation.span("near_duplicate"):
+            signature = self.near_duplicates.signature(rule_output)
+            match = self.near_duplicates.lookup_signature(signature)
+            if match is None:
+                self.instrumentation.count("near_duplicate_misses")
+                return signature, None
+            (stored_rule, stored_lingua, stored_final), similarity = match
+            swaps = word_swaps(stored_rule, rule_output)
+            # Words were added or removed (e.g. a "not"), or a later stage
+            # dropped or reworded a swapped word: the stored output can't be patched
+            if swaps is None or not all(swaps_preserved(swaps, stored_rule, stored)
+                                        for stored in (stored_lingua, stored_final)):
+                self.instrumentation.count("near_duplicate_rejected")
+                return signature, None
+            lingua_output = apply_swaps(swaps, stored_lingua)
+            final_output = apply_swaps(swaps, stored_final)
+        self.instrumentation.count("near_duplicate_hits")
+        return signature, (lingua_output, final_output, {"similarity": round(similarity, 4), "swaps": len(swaps)})
+
+    def _remember(self, signature, rule_output: str, lingua_output: str, final_output: str) -> None:
+        # Prompts no stage changed give nothing worth reusing
+        if signature is not None and final_output != rule_output:
+            self.near_duplicates.add_signature(signature, (rule_output, lingua_output, final_output))
+
+    def _compress_prompt(self, prompt_text: str) -> CompressionResult:
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        span = self.instrumentation.span
+        timings = {}
+
+        logger.debug("Starting compression pipeline (%d chars)", len(prompt_text))
 
-        print("\n🔹 Starting Compression Pipeline 🔹")
+        with span("pipeline", timings):
+            # Stage 1 – Original
+            tokens_before = self._count_tokens(prompt_text, "before compression")
 
-        # Stage 1 – Original
-        tokens_before = self._count_tokens(prompt_text, "before compression")
+            # Stage 2 – Rule-based cleanup
+            with span("rule", timings):
+                rule_output = self.rule.compress(prompt_text)
+            tokens_after_rule = self._count_tokens(rule_output, "after rule-based compression")
 
-        # Stage 2 – Rule-based cleanup
-        rule_output = self.rule.compress(prompt_text)
-        tokens_after_rule = self._count_tokens(rule_output, "after rule-based compression")
+            signature, reuse = self._find_near_duplicate(rule_output)
 
-        # Stage 3 – Lingua compression
-        lingua_output = self.lingua.compress(rule_output)
-        tokens_after_lingua = self._count_tokens(lingua_output, "after lingua compression")
+            # Stage 3 – Lingua compression
+            lingua_decision = self._decide_lingua(rule_output) if reuse is None else self._NEAR_DUPLICATE
+            if lingua_decision["run"]:
+                with span("lingua", timings):
+                    lingua_output = self.lingua.compress(rule_output)
+                tokens_after_lingua = self._count_tokens(lingua_output, "after lingua compression")
+            elif reuse is not None:
+                lingua_output = reuse[0]
+                tokens_after_lingua = self._count_tokens(lingua_output, "after lingua compression")
+            else:
+                lingua_output = rule_output
+                tokens_after_lingua = tokens_after_rule
 
-        # Stage 4 – Optional LLM rewrite
-        if self.use_llm:
-            final_output = self.llm.compress(lingua_output)
-        else:
-            final_output = lingua_output
+            # Stage 4 – Optional LLM rewrite
+            llm_decision = self._decide_llm(rule_output, lingua_output) if reuse is None else self._NEAR_DUPLICATE
+            if llm_decision["run"]:
+                started = time.perf_counter()
+                with span("llm", timings):
+                    final_output = self.llm.compress(lingua_output)
+                self.instrumentation.count("llm_calls")
+                if self.policy is not None:
+                    self.policy.record_llm_latency(time.perf_counter() - started)
+            elif reuse is not None:
+                final_output = reuse[1]
+            else:
+                final_output = lingua_output
 
-        tokens_after_final = self._count_tokens(final_output, "after compression")
+            tokens_after_final = self._count_tokens(final_output, "after compression")
+            if reuse is None:
+                self._remember(signature, rule_output, lingua_output, final_output)
 
-        savings = round(((tokens_before - tokens_after_final) / tokens_before) * 100, 2)
+            savings = self._savings(tokens_before, tokens_after_final)
 
-        input_sim = semantic_similarity(prompt_text, final_output)
+            with span("similarity", timings):
+                input_sim = semantic_similarity(prompt_text, final_output) if self.score_similarity else None
 
-        print(f"\n [PromptCompressor] Token reduction: {tokens_before} → {tokens_after_final} ({savings}% saved)\n")
+        self._record_tokens(tokens_before, tokens_after_rule, tokens_after_lingua, tokens_after_final)
+        logger.info("Token reduction: %s → %s (%s%% saved)", tokens_before, tokens_after_final, savings)
 
         return CompressionResult(
             timestamp=timestamp,
@@ -80,7 +380,161 @@ class PromptCompressor:
             tokens_after_rule=tokens_after_rule,
             tokens_after_lingua=tokens_after_lingua,
             tokens_after_final=tokens_after_final,
-            used_llm=self.use_llm,
+            used_llm=llm_decision["run"],
             savings_pct=savings,
             input_similarity=input_sim,
+            metadata=self._result_metadata(lingua_decision, llm_decision, timings, reuse and reuse[2]),
         )
+
+    def _result_metadata(self, lingua_decision: dict, llm_decision: dict, timings: dict | None = None,
+                         near_duplicate: dict | None = None) -> dict | None:
+        metadata = {}
+        if near_duplicate:
+            metadata["near_duplicate"] = near_duplicate
+        if self.policy is not None:
+            metadata["policy"] = {"lingua": lingua_decision, "llm": llm_decision}
+        if timings:
+            metadata["timings"] = timings
+        return metadata or None
+
+    def compress_batch(self, prompts: list[str], max_workers: int = 8) -> list[CompressionResult]:
+        """
+        Run the pipeline stage by stage over a whole batch of prompts.
+
+        Each stage sees every prompt before the next stage starts, so the models
+        are loaded once, embeddings are computed in a single encode call, and
+        Gemini calls (rewrites and token counts) run with at most `max_workers`
+        requests in flight. Results are returned in input order.
+        """
+        prompts = list(prompts)
+        if not prompts:
+            return []
+
+        if self.cache is None:
+            return self._compress_many(prompts, max_workers)
+
+        keys = [self._cache_key(prompt_text) for prompt_text in prompts]
+        results = [self.cache.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self.instrumentation.count("cache_hits", hits)
+        self.instrumentation.count("cache_misses", len(results) - hits)
+
+        # Repeats inside the batch are compressed once
+        missing: dict[str, list[int]] = {}
+        for i, result in enumerate(results):
+            if result is None:
+                missing.setdefault(keys[i], []).append(i)
+
+        if missing:
+            firsts = [indices[0] for indices in missing.values()]
+            fresh = self._compress_many([prompts[i] for i in firsts], max_workers)
+            for (key, indices), result in zip(missing.items(), fresh):
+                if self._cacheable(result):
+                    self.cache.put(key, result)
+                for i in indices:
+                    results[i] = result
+
+        return results
+
+    def _compress_batch(self, prompts: list[str], max_workers: int) -> list[CompressionResult]:
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        span = self.instrumentation.span
+        # Stage timings cover the whole batch; every result carries the same copy
+        timings = {}
+
+        logger.debug("Starting batch compression pipeline (%d prompts)", len(prompts))
+
+        with span("batch", timings, size=len(prompts)), ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            # Stage 1 – Original
+            tokens_before = self._count_tokens_batch(pool, prompts, "before compression")
+
+            # Stage 2 – Rule-based cleanup
+            with span("rule", timings):
+                rule_outputs = self.rule.compress_batch(prompts)
+            tokens_after_rule = self._count_tokens_batch(pool, rule_outputs, "after rule-based compression")
+
+            signatures, reuses = zip(*(self._find_near_duplicate(text) for text in rule_outputs))
+
+            # Stage 3 – Lingua compression (only the prompts the policy selects)
+            lingua_decisions = [
+                self._decide_lingua(text) if reuse is None else self._NEAR_DUPLICATE
+                for text, reuse in zip(rule_outputs, reuses)
+            ]
+            selected = [i for i, d in enumerate(lingua_decisions) if d["run"]]
+            lingua_outputs = list(rule_outputs)
+            tokens_after_lingua = list(tokens_after_rule)
+            reused = [i for i, reuse in enumerate(reuses) if reuse is not None]
+            if reused:
+                patched = [reuses[i][0] for i in reused]
+                counted = self._count_tokens_batch(pool, patched, "after lingua compression")
+                for i, text, tokens in zip(reused, patched, counted):
+                    lingua_outputs[i] = text
+                    tokens_after_lingua[i] = tokens
+            if selected:
+                with span("lingua", timings):
+                    compressed = self.lingua.compress_batch([rule_outputs[i] for i in selected])
+                counted = self._count_tokens_batch(pool, compressed, "after lingua compression")
+                for i, text, tokens in zip(selected, compressed, counted):
+                    lingua_outputs[i] = text
+                    tokens_after_lingua[i] = tokens
+
+            # Stage 4 – Optional LLM rewrite
+            llm_decisions = [
+                self._decide_llm(r, l) if reuse is None else self._NEAR_DUPLICATE
+                for r, l, reuse in zip(rule_outputs, lingua_outputs, reuses)
+            ]
+            selected = [i for i, d in enumerate(llm_decisions) if d["run"]]
+            final_outputs = list(lingua_outputs)
+            for i in reused:
+                final_outputs[i] = reuses[i][1]
+            if selected:
+                started = time.perf_counter()
+                with span("llm", timings, cpu=False):
+                    rewritten = self.llm.compress_batch([lingua_outputs[i] for i in selected], max_workers=max_workers)
+                self.instrumentation.count("llm_calls", len(selected))
+                if self.policy is not None:
+                    # Up to max_workers calls overlapped; spread the wall time over them
+                    in_flight = min(max(1, max_workers), len(selected))
+                    per_call = (time.perf_counter() - started) * in_flight / len(selected)
+                    for _ in selected:
+                        self.policy.record_llm_latency(per_call)
+                for i, text in zip(selected, rewritten):
+                    final_outputs[i] = text
+
+            tokens_after_final = self._count_tokens_batch(pool, final_outputs, "after compression")
+            for i, signature in enumerate(signatures):
+                if reuses[i] is None:
+                    self._remember(signature, rule_outputs[i], lingua_outputs[i], final_outputs[i])
+
+            with span("similarity", timings):
+                if self.score_similarity:
+                    input_sims = semantic_similarity_batch(prompts, final_outputs)
+                else:
+                    input_sims = [None] * len(prompts)
+
+        results = []
+        for i, prompt_text in enumerate(prompts):
+            results.append(CompressionResult(
+                timestamp=timestamp,
+                original_prompt=prompt_text,
+                rule_output=rule_outputs[i],
+                lingua_output=lingua_outputs[i],
+                final_output=final_outputs[i],
+                tokens_before=tokens_before[i],
+                tokens_after_rule=tokens_after_rule[i],
+                tokens_after_lingua=tokens_after_lingua[i],
+                tokens_after_final=tokens_after_final[i],
+                used_llm=llm_decisions[i]["run"],
+                savings_pct=self._savings(tokens_before[i], tokens_after_final[i]),
+                input_similarity=input_sims[i],
+                metadata=self._result_metadata(lingua_decisions[i], llm_decisions[i], timings,
+                                               reuses[i] and reuses[i][2]),
+            ))
+            self._record_tokens(tokens_before[i], tokens_after_rule[i], tokens_after_lingua[i], tokens_after_final[i])
+
+        total_before = sum(tokens_before)
+        total_after = sum(tokens_after_final)
+        logger.info("Batch token reduction: %s → %s (%s%% saved)",
+                    total_before, total_after, self._savings(total_before, total_after))
+
+        return results
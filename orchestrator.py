@@ -3,8 +3,10 @@ Orchestrator module to coordinate input, compression, LLM call, and output.
 Loads prompts from test_prompts.json and allows interactive selection.
 """
 
+import os
 import sys
 import json
+import logging
 from pathlib import Path
 
 # Ensure project root is on sys.path
@@ -13,11 +15,17 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from layers.prompt_compressing_layer import PromptCompressor
+from utils.token_counters import make_token_counter
+from utils.compression_cache import CompressionCache
+from evaluation.similarity import configure_similarity
+from utils.instrumentation import Instrumentation, HistogramSink
 from utils.llm_client import call_main_llm
 from output_handler import print_model_output
 
 
 PROMPT_FILE = project_root / "test_prompts.json"
+CACHE_FILE = project_root / ".compression_cache.sqlite"
+EMBEDDING_CACHE_FILE = project_root / ".embedding_cache.sqlite"
 
 
 def load_prompts(path: Path) -> dict:
@@ -55,8 +63,19 @@ def choose_prompt(prompts: dict) -> list[str]:
 
 
 def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(name)s] %(message)s")
     print("==> orchestrator.py started")
-    compressor = PromptCompressor(use_llm=True)
+    metrics = HistogramSink()
+    similarity = configure_similarity(db_path=str(EMBEDDING_CACHE_FILE))
+    compressor = PromptCompressor(
+        use_llm=True,
+        counter=make_token_counter(),
+        cache=CompressionCache(db_path=str(CACHE_FILE)),
+        instrumentation=Instrumentation([metrics]),
+    )
+
+    # Pay the model load now rather than on the first prompt
+    compressor.warmup()
 
     prompts = load_prompts(PROMPT_FILE)
     print(f"Loaded {len(prompts)} prompts.")
@@ -67,13 +86,15 @@ def main():
         print(f"Error: {e}")
         return
 
-    for key in selected_keys:
-        prompt = prompts[key]
+    # Several prompts go through the batch path so each stage runs once for all of them
+    if len(selected_keys) > 1:
+        results = compressor.compress_batch([prompts[key] for key in selected_keys])
+    else:
+        results = [compressor.compress_prompt(prompts[selected_keys[0]])]
 
+    for key, result in zip(selected_keys, results):
         print(f"\n========== Processing {key} ==========")
 
-        result = compressor.compress_prompt(prompt)
-
         print("\n== Compression Summary ==")
         print(f"Tokens before: {result.tokens_before}")
         print(f"Tokens after:  {result.tokens_after_final}")
@@ -87,6 +108,10 @@ def main():
 
         print(f"\n========== Done {key} ==========\n")
 
+    print(f"Cache: {compressor.cache.stats()}")
+    print(f"Embedding cache: {similarity.stats()}")
+    print(f"Stage latency: {metrics.summary()}")
+
 
 if __name__ == "__main__":
     main()
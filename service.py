@@ -0,0 +1,235 @@
+"""
+Long-running compression service.
+
+Keeps one warm PromptCompressor (models loaded, Gemini client configured)
+behind a local aiohttp server, so callers stop paying the start-up cost
+orchestrator.py pays on every run. Listens on TCP or a Unix socket.
+
+Endpoints:
+- POST /compress        {"prompt": "..."} → one CompressionResult as JSON
+- POST /compress/batch  {"prompts": ["...", ...]} → NDJSON stream, one line
+                        {"index": i, "result": {...}} (or {"index": i,
+                        "error": "..."}) per prompt as soon as it finishes
+- GET  /health          {"status": "ok", ...} once the compressor is warm
+- GET  /metrics         Prometheus text: pipeline spans and counters plus
+                        request counts, in-flight requests and uptime
+
+    python service.py --port 8080
+    python service.py --unix /tmp/compression.sock --no-llm
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+# Ensure project root is on sys.path
+project_root = Path(__file__).resolve().parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from layers.prompt_compressing_layer import PromptCompressor
+from layers.async_prompt_compressing_layer import AsyncPromptCompressor
+from utils.instrumentation import Instrumentation, PrometheusSink
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "application/x-ndjson"
+
+
+class CompressionService:
+    def __init__(
+        self,
+        compressor: AsyncPromptCompressor,
+        metrics: PrometheusSink | None = None,
+        max_batch: int = 256,
+        max_prompt_chars: int = 2_000_000,
+    ):
+        """
+        :param compressor: Warm async front end; its PromptCompressor should
+                           report to `metrics` for pipeline spans to show up.
+        :param metrics: Sink rendered by /metrics.
+        :param max_batch: Largest accepted /compress/batch request.
+        :param max_prompt_chars: Longest accepted prompt.
+        """
+        self.compressor = compressor
+        self.metrics = metrics or PrometheusSink()
+        self.max_batch = max_batch
+        self.max_prompt_chars = max_prompt_chars
+        self.started = time.time()
+        self.in_flight = 0
+
+    @property
+    def instrumentation(self) -> Instrumentation:
+        return self.compressor.compressor.instrumentation
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=self.max_prompt_chars * 4 + 1024)
+        app.add_routes([
+            web.post("/compress", self.handle_compress),
+            web.post("/compress/batch", self.handle_batch),
+            web.get("/health", self.handle_health),
+            web.get("/metrics", self.handle_metrics),
+        ])
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def _close(self, app: web.Application) -> None:
+        self.compressor.close()
+
+    # -------------------------------
+    # Requests
+    # -------------------------------
+    async def _read_json(self, request: web.Request) -> dict:
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise self._bad_request(f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise self._bad_request("Request body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _bad_request(message: str) -> web.HTTPBadRequest:
+        return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+    def _check_prompt(self, prompt) -> str:
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise self._bad_request("'prompt' must be a non-empty string")
+        if len(prompt) > self.max_prompt_chars:
+            raise self._bad_request(f"Prompt longer than {self.max_prompt_chars} characters")
+        return prompt
+
+    async def handle_compress(self, request: web.Request) -> web.Response:
+        body = await self._read_json(request)
+        prompt = self._check_prompt(body.get("prompt"))
+
+        self.in_flight += 1
+        try:
+            with self.instrumentation.span("service_compress", cpu=False):
+                result = await self.compressor.compress_prompt(prompt)
+        except Exception as e:
+            logger.exception("Compression failed")
+            self.instrumentation.count("service_errors", endpoint="compress")
+            return web.json_response({"error": str(e)}, status=500)
+        finally:
+            self.in_flight -= 1
+        self.instrumentation.count("service_requests", endpoint="compress")
+        return web.json_response(dataclasses.asdict(result))
+
+    async def handle_batch(self, request: web.Request) -> web.StreamResponse:
+        body = await self._read_json(request)
+        prompts = body.get("prompts")
+        if not isinstance(prompts, list) or not prompts:
+            raise self._bad_request("'prompts' must be a non-empty list")
+        if len(prompts) > self.max_batch:
+            raise self._bad_request(f"At most {self.max_batch} prompts per batch")
+        prompts = [self._check_prompt(prompt) for prompt in prompts]
+
+        response = web.StreamResponse(headers={"Content-Type": NDJSON})
+        await response.prepare(request)
+
+        async def run(index: int, prompt: str) -> dict:
+            try:
+                result = await self.compressor.compress_prompt(prompt)
+                return {"index": index, "result": dataclasses.asdict(result)}
+            except Exception as e:
+                logger.exception("Compression failed for batch item %d", index)
+                self.instrumentation.count("service_errors", endpoint="batch")
+                return {"index": index, "error": str(e)}
+
+        self.in_flight += 1
+        tasks = [asyncio.create_task(run(i, prompt)) for i, prompt in enumerate(prompts)]
+        try:
+            with self.instrumentation.span("service_batch", cpu=False):
+                # Lines go out in completion order; "index" ties them to the request
+                for next_done in asyncio.as_completed(tasks):
+                    line = await next_done
+                    await response.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+        finally:
+            # Client went away: stop work nobody will read
+            for task in tasks:
+                task.cancel()
+            self.in_flight -= 1
+        self.instrumentation.count("service_requests", endpoint="batch")
+        self.instrumentation.count("service_batch_prompts", len(prompts))
+        await response.write_eof()
+        return response
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        c = self.compressor.compressor
+        return web.json_response({
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "in_flight": self.in_flight,
+            "use_llm": c.use_llm,
+            "lingua_model": c.lingua.model_name,
+            "cache": c.cache.stats() if c.cache is not None else None,
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        prefix = self.metrics.prefix
+        text = self.metrics.render()
+        text += f"{prefix}_service_in_flight {self.in_flight}\n"
+        text += f"{prefix}_service_uptime_seconds {time.time() - self.started:.0f}\n"
+        return web.Response(text=text, content_type="text/plain")
+
+
+def serve(service: CompressionService, host: str = "127.0.0.1", port: int = 8080, unix: str | None = None) -> None:
+    if unix:
+        print(f"[CompressionService] Listening on unix:{unix}")
+        web.run_app(service.app(), path=unix, print=None)
+    else:
+        print(f"[CompressionService] Listening on http://{host}:{port}")
+        web.run_app(service.app(), host=host, port=port, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", default=None, help="Unix socket path (instead of TCP)")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Gemini calls in flight")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--no-llm", action="store_true", help="Skip the Gemini rewrite stage")
+    parser.add_argument("--no-similarity", action="store_true", help="Skip input_similarity scoring")
+    parser.add_argument("--counter", default=None, help="Token counter backend (see utils.token_counters)")
+    parser.add_argument("--cache", default=None, help="SQLite file for the compression cache")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(name)s] %(message)s")
+
+    from utils.token_counters import make_token_counter
+    from utils.compression_cache import CompressionCache
+
+    metrics = PrometheusSink()
+    compressor = PromptCompressor(
+        use_llm=not args.no_llm,
+        counter=make_token_counter(args.counter),
+        cache=CompressionCache(db_path=args.cache) if args.cache else None,
+        score_similarity=not args.no_similarity,
+        instrumentation=Instrumentation([metrics]),
+    )
+    compressor.warmup()
+
+    service = CompressionService(
+        AsyncPromptCompressor(
+            compressor,
+            max_concurrency=args.max_concurrency,
+            score_similarity=not args.no_similarity,
+        ),
+        metrics=metrics,
+        max_batch=args.max_batch,
+    )
+    serve(service, host=args.host, port=args.port, unix=args.unix)
+
+
+if __name__ == "__main__":
+    main()
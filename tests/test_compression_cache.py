@@ -0,0 +1,62 @@
+"""CompressionCache disk tier bounds."""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from evaluation.result import CompressionResult
+from utils.compression_cache import CompressionCache
+
+
+def make_result(text: str) -> CompressionResult:
+    return CompressionResult(
+        timestamp="2026-01-01T00:00:00",
+        original_prompt=text,
+        rule_output=text,
+        lingua_output=text,
+        final_output=text,
+        tokens_before=1,
+        tokens_after_rule=1,
+        tokens_after_lingua=1,
+        tokens_after_final=1,
+        used_llm=False,
+        savings_pct=0.0,
+    )
+
+
+def disk_keys(path: Path) -> set[str]:
+    with sqlite3.connect(path) as db:
+        return {key for (key,) in db.execute("SELECT key FROM results")}
+
+
+def test_disk_tier_keeps_newest_entries(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = CompressionCache(max_entries=1, db_path=str(path), max_disk_entries=5, purge_interval=4)
+    for i in range(12):
+        cache.put(f"k{i}", make_result(f"prompt {i}"))
+
+    # Purged after writes 4, 8 and 12
+    assert disk_keys(path) == {f"k{i}" for i in range(7, 12)}
+    assert cache.stats()["disk_evictions"] == 7
+    assert cache.get("k0") is None
+    assert cache.get("k8").final_output == "prompt 8"
+    cache.close()
+
+
+def test_expired_rows_are_purged_without_being_read(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = CompressionCache(db_path=str(path), max_disk_entries=None)
+    for i in range(3):
+        cache.put(f"k{i}", make_result(f"prompt {i}"))
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE results SET created = created - 3600 WHERE key != 'k2'")
+    cache.close()
+
+    # Reopening purges rows older than the TTL
+    cache = CompressionCache(ttl_seconds=60, db_path=str(path), max_disk_entries=None)
+    assert disk_keys(path) == {"k2"}
+    cache.close()
@@ -0,0 +1,61 @@
+"""ConversationCompressor budgeting over repeated messages."""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks.gemini_stub import PassthroughCompressor
+from layers.conversation_compressor import ConversationCompressor
+from layers.prompt_compressing_layer import PromptCompressor
+from utils.token_counters import ApproxTokenCounter
+
+
+def make_conversation(**kwargs) -> ConversationCompressor:
+    compressor = PromptCompressor(
+        use_llm=False,
+        counter=ApproxTokenCounter(),
+        lingua=PassthroughCompressor(),
+        score_similarity=False,
+    )
+    return ConversationCompressor(compressor, **kwargs)
+
+
+def test_repeated_message_keeps_recent_copy():
+    conversation = make_conversation(max_history_tokens=30, keep_recent=1)
+    reply = " ".join(f"word{i}" for i in range(40))
+    history = [
+        {"role": "user", "content": "yes please continue"},
+        {"role": "model", "content": reply},
+        {"role": "user", "content": "yes please continue"},
+    ]
+
+    result = conversation.compress_history("s", history)
+
+    # The old copy and the long reply are dropped; the latest message is protected
+    assert result.history == [{"role": "user", "content": "yes please continue"}]
+    assert result.dropped_messages == 2
+    counter = ApproxTokenCounter()
+    short, long = counter.count_text("yes please continue"), counter.count_text(reply)
+    assert result.tokens_before == 2 * short + long
+    assert result.tokens_after == short
+
+
+def test_demotion_is_remembered_per_position():
+    conversation = make_conversation(max_history_tokens=30, keep_recent=1)
+    reply = " ".join(f"word{i}" for i in range(40))
+    history = [
+        {"role": "user", "content": "yes please continue"},
+        {"role": "model", "content": reply},
+        {"role": "user", "content": "yes please continue"},
+    ]
+    conversation.compress_history("s", history)
+
+    history.append({"role": "model", "content": "ok"})
+    result = conversation.compress_history("s", history)
+
+    assert [m["content"] for m in result.history] == ["yes please continue", "ok"]
+    assert result.new_messages == 1
+    assert result.reused_messages == 3
@@ -0,0 +1,102 @@
+"""BudgetedLingua selection over cached scores, with a stub scorer."""
+
+import math
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from compressors.lingua_budget import BudgetedLingua
+from compressors.lingua_compression_layer import TokenScores
+from utils.token_counters import TokenCounter
+
+BOS = 0
+
+
+class WordCounter(TokenCounter):
+    def count_text(self, text: str, operation: str = "") -> int:
+        return len(text.split())
+
+
+class StubLingua:
+    """One token per word after a BOS; a word scores its length, BOS scores inf."""
+
+    model_name = "stub"
+    ratio = 0.5
+    available = True
+
+    def __init__(self):
+        self.vocabulary: list[str] = ["<s>"]
+
+    def warmup(self) -> bool:
+        return True
+
+    def special_token_ids(self) -> frozenset[int]:
+        return frozenset({BOS})
+
+    def tokenize(self, text: str) -> list[int]:
+        ids = [BOS]
+        for word in text.split():
+            self.vocabulary.append(word)
+            ids.append(len(self.vocabulary) - 1)
+        return ids
+
+    def decode(self, token_ids) -> str:
+        return " ".join(self.vocabulary[i] for i in token_ids if i != BOS)
+
+    def score_batch(self, texts: list[str]) -> list[TokenScores]:
+        scores = []
+        for text in texts:
+            ids = self.tokenize(text)
+            scores.append(TokenScores(token_ids=ids, scores=[math.inf] + [len(self.vocabulary[i]) for i in ids[1:]]))
+        return scores
+
+
+def make_budget() -> BudgetedLingua:
+    return BudgetedLingua(StubLingua(), counter=WordCounter())
+
+
+TEXT = "a quick extraordinarily brown fox jumps over the lazy dog"
+
+
+def test_budget_keeps_highest_scored_words_in_order():
+    fit = make_budget().fit(TEXT, target_tokens=3)
+    assert fit.text == "quick extraordinarily brown"
+    assert fit.kept == 3 and fit.total == 10 and fit.fits
+
+
+def test_budget_every_target_fits_and_is_largest():
+    budget = make_budget()
+    for target in range(1, 10):
+        fit = budget.fit(TEXT, target_tokens=target)
+        assert fit.fits and fit.tokens == target == fit.kept
+
+
+def test_budget_too_small_keeps_top_content_token():
+    fit = make_budget().fit(TEXT, target_tokens=0)
+    # BOS scores inf but decodes to nothing; the kept token must be real text
+    assert fit.text == "extraordinarily"
+    assert fit.kept == 1 and fit.tokens == 1
+    assert not fit.fits
+
+
+def test_ratio_does_not_spend_a_slot_on_bos():
+    fit = make_budget().fit(TEXT, ratio=1 / 3)
+    assert fit.text == "quick extraordinarily brown"
+    assert fit.kept == 3
+
+
+def test_threshold_excludes_special_tokens():
+    fit = make_budget().fit(TEXT, threshold=5)
+    assert fit.text == "quick extraordinarily brown jumps"
+    assert fit.kept == 4
+
+
+def test_scores_are_reused():
+    budget = make_budget()
+    budget.fit(TEXT, target_tokens=2)
+    budget.fit(TEXT, target_tokens=5)
+    assert budget.stats()["misses"] == 1
+    assert budget.hits == 1
@@ -0,0 +1,154 @@
+"""Near-duplicate reuse: word swaps, their verification and the pipeline paths."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from layers.async_prompt_compressing_layer import AsyncPromptCompressor
+from layers.pipelined_prompt_compressor import PipelinedPromptCompressor
+from layers.prompt_compressing_layer import PromptCompressor
+from utils.instrumentation import Instrumentation, Sink
+from utils.near_duplicate_index import NearDuplicateIndex, apply_swaps, swaps_preserved, word_swaps
+from utils.token_counters import ApproxTokenCounter
+
+
+# -------------------------------
+# Swaps
+# -------------------------------
+def test_word_swaps_pure_substitution():
+    assert word_swaps("ask Alice at 10:00 today", "ask Bob at 11:30 today") == {"Alice": "Bob", "10:00": "11:30"}
+
+
+def test_word_swaps_rejects_inserts_and_deletes():
+    assert word_swaps("please approve the budget", "please do not approve the budget") is None
+    assert word_swaps("please approve the budget", "approve the budget") is None
+
+
+def test_word_swaps_rejects_inconsistent_or_partial_swaps():
+    # "Alice" becomes two different words
+    assert word_swaps("Alice met Alice", "Bob met Carol") is None
+    # "Alice" is swapped in one place and kept in another
+    assert word_swaps("Alice met Alice", "Bob met Alice") is None
+
+
+def test_apply_swaps_is_single_pass_and_whole_word():
+    swaps = {"Alice": "Bob", "Bob": "Alice"}
+    assert apply_swaps(swaps, "Alice thanked Bob and Alicea stayed") == "Bob thanked Alice and Alicea stayed"
+
+
+def test_swaps_preserved_counts_occurrences():
+    swaps = {"approve": "reject"}
+    assert swaps_preserved(swaps, "please approve it, approve now", "approve it approve now")
+    # A stage reworded or dropped one occurrence
+    assert not swaps_preserved(swaps, "please approve it, approve now", "approval of it approve now")
+    assert not swaps_preserved(swaps, "please approve it", "please it")
+
+
+# -------------------------------
+# Pipeline reuse
+# -------------------------------
+class ListSink(Sink):
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event: dict) -> None:
+        self.events.append(event)
+
+
+class DroppingLingua:
+    """Drops the words in `drop`; counts its calls."""
+
+    model_name = "stub"
+    ratio = 0.5
+    available = True
+
+    def __init__(self, drop=("please",)):
+        self.drop = set(drop)
+        self.calls = 0
+
+    def warmup(self) -> bool:
+        return True
+
+    def compress(self, text: str) -> str:
+        self.calls += 1
+        return " ".join(word for word in text.split() if word not in self.drop)
+
+
+def make_compressor(lingua: DroppingLingua) -> tuple[PromptCompressor, ListSink]:
+    sink = ListSink()
+    compressor = PromptCompressor(
+        use_llm=False,
+        counter=ApproxTokenCounter(),
+        lingua=lingua,
+        score_similarity=False,
+        near_duplicates=NearDuplicateIndex(capacity=64),
+        instrumentation=Instrumentation([sink]),
+    )
+    return compressor, sink
+
+
+def prompt(name: str, lead: str = "please") -> str:
+    body = " ".join(f"item{i}" for i in range(60))
+    return f"{lead} send {name} the report with {body}"
+
+
+def counter_total(sink: ListSink, name: str) -> float:
+    return sum(event.get("value", 0) for event in sink.events if event.get("name") == name)
+
+
+def test_near_duplicate_reuses_and_patches_output():
+    lingua = DroppingLingua()
+    compressor, sink = make_compressor(lingua)
+    compressor.compress_prompt(prompt("Alice"))
+    result = compressor.compress_prompt(prompt("Bob"))
+
+    assert lingua.calls == 1
+    assert result.final_output == prompt("Bob").replace("please ", "")
+    assert result.metadata["near_duplicate"]["swaps"] == 1
+    assert counter_total(sink, "near_duplicate_hits") == 1
+
+
+def test_near_duplicate_rejected_when_stage_dropped_swapped_word():
+    # The stored output lost "please", so swapping it to "kindly" can't be patched in
+    lingua = DroppingLingua()
+    compressor, sink = make_compressor(lingua)
+    compressor.compress_prompt(prompt("Alice"))
+    result = compressor.compress_prompt(prompt("Alice", lead="kindly"))
+
+    assert lingua.calls == 2
+    assert result.final_output == prompt("Alice", lead="kindly")
+    assert "near_duplicate" not in (result.metadata or {})
+    assert counter_total(sink, "near_duplicate_rejected") == 1
+
+
+def test_async_path_uses_near_duplicates():
+    lingua = DroppingLingua()
+    compressor, _ = make_compressor(lingua)
+    front = AsyncPromptCompressor(compressor, score_similarity=False)
+
+    async def main():
+        await front.compress_prompt(prompt("Alice"))
+        return await front.compress_prompt(prompt("Bob"))
+
+    result = asyncio.run(main())
+    front.close()
+    assert lingua.calls == 1
+    assert result.final_output == prompt("Bob").replace("please ", "")
+    assert result.metadata["near_duplicate"]["swaps"] == 1
+
+
+def test_pipelined_path_uses_near_duplicates():
+    lingua = DroppingLingua()
+    compressor, _ = make_compressor(lingua)
+    pipeline = PipelinedPromptCompressor(compressor)
+
+    first = list(pipeline.run([prompt("Alice")]))
+    second = list(pipeline.run([prompt("Bob")]))
+    assert lingua.calls == 1
+    assert first[0].final_output == prompt("Alice").replace("please ", "")
+    assert second[0].final_output == prompt("Bob").replace("please ", "")
+    assert second[0].metadata["near_duplicate"]["swaps"] == 1
@@ -0,0 +1,94 @@
+"""Streaming normalization must match whole-text normalization exactly."""
+
+import random
+import sys
+import unicodedata
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from enums.normalization_pipeline import NormalizationPipeline
+from enums.unicode_mode import UnicodeMode
+from utils.normalization import compile_normalization_plan, normalize_stream, normalize_text, normalize_text_custom
+
+# Fragments that exercise every rule, including runs that straddle chunk edges
+FRAGMENTS = [
+    "soooo", "cool", "yesssss", "!!!", "???", "......", "..", "---", "——", "–",
+    " ", "  ", "\n", "\t", "\r\n", "　", "​", "﻿", "é", "naïve",
+    "😂😂😂", "🔥", "Ｆｕｌｌ", "https://example.com/a?b=1", "user.name+x@mail.com",
+    "1234567", "42", "word", "Hello", "x", "aaaaaaaaaaaa", "ab" * 20,
+]
+
+# normalize_text pipelines and the flags they compile to
+PIPELINE_FLAGS = {
+    NormalizationPipeline.LLM: dict(unicode_mode=UnicodeMode.COMPATIBILITY, strip_marks=True,
+                                    alias_urls=True, alias_emails=True),
+    NormalizationPipeline.LIGHT: dict(unicode_mode=UnicodeMode.CANONICAL, collapse_emoji_flag=False,
+                                      normalize_punct_flag=False),
+    NormalizationPipeline.STORAGE: dict(unicode_mode=UnicodeMode.CANONICAL, remove_zero_width_flag=False,
+                                        normalize_elongation_flag=False, collapse_emoji_flag=False,
+                                        normalize_punct_flag=False, normalize_whitespace_flag=False),
+}
+
+
+def random_text(rng: random.Random, fragments: int) -> str:
+    return "".join(rng.choice(FRAGMENTS) for _ in range(fragments))
+
+
+def random_chunks(rng: random.Random, text: str) -> list[str]:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.choice((0, 1, 1, 2, 3, 7, 64, 700))
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+@pytest.mark.parametrize("pipeline", list(PIPELINE_FLAGS))
+def test_stream_matches_normalize_text(pipeline):
+    rng = random.Random(pipeline.value)
+    for _ in range(200):
+        text = random_text(rng, rng.randrange(1, 120))
+        expected = normalize_text(text, pipeline)
+        streamed = "".join(normalize_stream(random_chunks(rng, text), **PIPELINE_FLAGS[pipeline]))
+        assert streamed == expected, (text, pipeline)
+
+
+def test_stream_matches_custom_flags():
+    rng = random.Random(7)
+    flag_names = ["remove_zero_width_flag", "strip_marks", "normalize_elongation_flag", "collapse_emoji_flag",
+                  "normalize_punct_flag", "normalize_whitespace_flag", "alias_numbers", "lowercase"]
+    for _ in range(300):
+        flags = {name: rng.random() < 0.5 for name in flag_names}
+        flags["unicode_mode"] = rng.choice(list(UnicodeMode))
+        text = random_text(rng, rng.randrange(1, 120))
+        streamed = "".join(normalize_stream(random_chunks(rng, text), **flags))
+        assert streamed == normalize_text_custom(text, **flags), (text, flags)
+
+
+def test_stream_without_whitespace_cuts_between_words():
+    # No whitespace at all: the buffer must fall back to alphanumeric cuts
+    rng = random.Random(3)
+    text = "".join(rng.choice(["ab", "cd", "xyz", "!!", "...", "ooo"]) for _ in range(5000))
+    plan = compile_normalization_plan()
+    chunks = random_chunks(rng, text)
+    pieces = list(plan.stream(chunks, max_buffer_chars=256))
+    assert "".join(pieces) == plan(text)
+    assert len(pieces) > 1
+
+
+@pytest.mark.parametrize("mode", list(UnicodeMode))
+def test_large_text_unicode_blocks_match_unicodedata(mode):
+    # Past the block size, NFKC goes through the compatibility-char replacement
+    rng = random.Random(11)
+    pool = FRAGMENTS + ["ﬁ", "½", "㎏", "①", "ǅ", "ᾅ", "é", "̣́", "\ud83d", "\ude02", "ᄀ", "ᅡ"]
+    plan = compile_normalization_plan(unicode_mode=mode, remove_zero_width_flag=False,
+                                      normalize_elongation_flag=False, collapse_emoji_flag=False,
+                                      normalize_punct_flag=False, normalize_whitespace_flag=False)
+    for _ in range(5):
+        text = random_text(rng, 20000)
+        assert plan(text) == unicodedata.normalize(mode.value, text)
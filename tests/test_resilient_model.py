@@ -0,0 +1,56 @@
+"""ResilientModel in-flight deduplication under cancellation."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from utils.resilient_model import ResilientModel
+
+
+class SlowModel:
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"rewritten: {contents}"
+
+
+def test_follower_survives_cancelled_leader():
+    model = SlowModel()
+    resilient = ResilientModel(model, deadline=None)
+
+    async def main():
+        leader = asyncio.create_task(asyncio.wait_for(resilient.generate_content_async("same prompt"), 0.05))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(resilient.generate_content_async("same prompt"))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(main())
+    assert isinstance(leader_result, asyncio.TimeoutError)
+    assert follower_result == "rewritten: same prompt"
+    # The follower took the call over after the leader was cancelled
+    assert model.calls == 2
+    assert resilient.stats()["deduplicated"] == 1
+
+
+def test_followers_share_one_replacement_call():
+    model = SlowModel()
+    resilient = ResilientModel(model, deadline=None)
+
+    async def main():
+        leader = asyncio.create_task(resilient.generate_content_async("same prompt"))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(resilient.generate_content_async("same prompt")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ["rewritten: same prompt"] * 3
+    assert model.calls == 2
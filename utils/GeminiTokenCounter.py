@@ -1,41 +1,23 @@
-import os
+import logging
 import time
 from typing import List, Union
 
-from dotenv import load_dotenv
-import google.generativeai as genai
-import PIL.Image
+from utils.gemini_client import MODEL_MAIN, get_genai, get_model
+from utils.token_counters import TokenCounter
 
-# --------------------------------------------------
-# Load environment variables
-# --------------------------------------------------
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-GENAI_API_KEY = os.getenv("GENAI_API_KEY")
-MODEL_MAIN = os.getenv("MODEL_MAIN")
 
-if not GENAI_API_KEY:
-    raise RuntimeError("GENAI_API_KEY not set in environment")
-
-if not MODEL_MAIN:
-    raise RuntimeError("MODEL_MAIN not set in environment")
-
-# --------------------------------------------------
-# Gemini configuration
-# --------------------------------------------------
-genai.configure(api_key=GENAI_API_KEY)
-
-
-class GeminiTokenCounter:
+class GeminiTokenCounter(TokenCounter):
     def __init__(self, model: str = MODEL_MAIN):
         self.model_name = model
-        self.model = genai.GenerativeModel(model)
+        self.model = get_model(model)
 
     # -------------------------------
     # Model info
     # -------------------------------
     def print_model_limits(self):
-        info = genai.get_model(self.model_name)
+        info = get_genai().get_model(self.model_name)
         print("\n=== Model Context Window ===")
         print(f"Model: {self.model_name}")
         print(f"Input token limit : {info.input_token_limit}")
@@ -44,11 +26,14 @@ class GeminiTokenCounter:
     # -------------------------------
     # Text token count
     # -------------------------------
-    def count_text(self, text: str, operation: str):
+    def count_text(self, text: str, operation: str = ""):
         total = self.model.count_tokens(text)
-        print(f"\n=== Text Token Count for ({operation}) ===")
-        print(f"Text: {text}")
-        print(f"Total tokens: {total.total_tokens}")
+        logger.debug("Text token count (%s): %d tokens, %d chars", operation, total.total_tokens, len(text))
+        return total.total_tokens
+
+    async def count_text_async(self, text: str, operation: str = ""):
+        total = await self.model.count_tokens_async(text)
+        logger.debug("Text token count (%s): %d tokens, %d chars", operation, total.total_tokens, len(text))
         return total.total_tokens
 
     # -------------------------------
@@ -74,6 +59,8 @@ class GeminiTokenCounter:
     # Image token count
     # -------------------------------
     def count_image(self, prompt: str, image_path: str):
+        import PIL.Image
+
         image = PIL.Image.open(image_path)
         total = self.model.count_tokens([prompt, image])
         print("\n=== Image Token Count ===")
@@ -86,6 +73,7 @@ class GeminiTokenCounter:
     # Audio / Video token count
     # -------------------------------
     def count_media_file(self, prompt: str, file_path: str):
+        genai = get_genai()
         uploaded = genai.upload_file(file_path)
 
         while not getattr(uploaded.state, "name", None) == "ACTIVE":
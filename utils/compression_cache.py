@@ -0,0 +1,167 @@
+"""
+CompressionCache
+Content-addressed cache of full CompressionResults.
+
+Keys are a SHA-256 over the input text and the pipeline config, so any
+change to normalization flags, models, ratio or use_llm yields a new key.
+Two tiers:
+- memory: LRU bounded by entry count, with optional TTL
+- disk (optional): SQLite table that survives restarts, bounded by entry
+  count; expired and excess rows are purged every `purge_interval` writes
+"""
+
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from evaluation.result import CompressionResult
+
+
+class CompressionCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float | None = None,
+        db_path: str | None = None,
+        max_disk_entries: int | None = 100_000,
+        purge_interval: int = 1000,
+    ):
+        """
+        :param max_entries: Memory tier capacity; least recently used entries are evicted.
+        :param ttl_seconds: Entry lifetime in both tiers (None = never expire).
+        :param db_path: SQLite file for the persistent tier (None = memory only).
+        :param max_disk_entries: Disk tier capacity; the oldest rows are deleted (None = unbounded).
+        :param purge_interval: Writes between purges of expired and excess rows, so the
+            table may exceed max_disk_entries by up to this many rows.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.purge_interval = max(1, purge_interval)
+
+        self._memory: OrderedDict[str, tuple[float, CompressionResult]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        self._db = None
+        self._writes_since_purge = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+            # Rows left over from earlier runs may be expired or over the bound
+            self._purge_disk(time.time())
+
+    @staticmethod
+    def make_key(text: str, config: dict) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key: str) -> CompressionResult | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, result = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, payload FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    created, payload = row
+                    if not self._expired(created, now):
+                        result = CompressionResult(**json.loads(payload))
+                        self._remember(key, created, result)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return result
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: CompressionResult) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, result)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, created, payload) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(dataclasses.asdict(result))),
+                )
+                self._db.commit()
+                self._writes_since_purge += 1
+                if self._writes_since_purge >= self.purge_interval:
+                    self._purge_disk(now)
+
+    def _purge_disk(self, now: float) -> None:
+        """Delete expired rows, then the oldest rows beyond max_disk_entries."""
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+        if self.max_disk_entries is not None:
+            cursor = self._db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self.disk_evictions += cursor.rowcount
+        self._db.commit()
+        self._writes_since_purge = 0
+
+    def _remember(self, key: str, created: float, result: CompressionResult) -> None:
+        self._memory[key] = (created, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,82 @@
+"""
+Shared Gemini configuration.
+
+Single place that reads GENAI_API_KEY / MODEL_MAIN, configures
+google.generativeai and hands out GenerativeModel instances. The SDK is
+imported and configured on first use, not at import, so modules that only
+might call Gemini stay cheap to import.
+
+Every model is wrapped in a ResilientModel (rate limiting, retries with
+backoff, deadlines, in-flight deduplication) shared by all callers:
+- GEMINI_RATE_LIMIT: requests per second per model (unset = unlimited)
+- GEMINI_MAX_RETRIES: retries on 429/5xx/timeouts (default 5)
+- GEMINI_DEADLINE_S: seconds per call including retries (default 120)
+- GEMINI_BASE_URL: talk REST to this endpoint over pooled connections
+  instead of using the SDK (e.g. benchmarks/gemini_stub_server.py)
+"""
+
+import os
+import threading
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------
+# Load environment variables
+# --------------------------------------------------
+load_dotenv()
+
+GENAI_API_KEY = os.getenv("GENAI_API_KEY")
+MODEL_MAIN = os.getenv("MODEL_MAIN")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "0")) or None
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_DEADLINE_S = float(os.getenv("GEMINI_DEADLINE_S", "120")) or None
+
+_lock = threading.Lock()
+_genai = None
+_models: dict[str, object] = {}
+
+
+def get_genai():
+    """The configured google.generativeai module."""
+    global _genai
+    with _lock:
+        if _genai is None:
+            if not GENAI_API_KEY:
+                raise RuntimeError("GENAI_API_KEY not set in environment")
+
+            import google.generativeai as genai
+
+            genai.configure(api_key=GENAI_API_KEY)
+            _genai = genai
+        return _genai
+
+
+def _base_model(model_name: str, genai):
+    if GEMINI_BASE_URL:
+        from utils.rest_model import RestGenerativeModel
+
+        return RestGenerativeModel(model_name, GEMINI_BASE_URL, api_key=GENAI_API_KEY)
+    return genai.GenerativeModel(model_name)
+
+
+def get_model(model_name: str | None = None):
+    """Shared ResilientModel for `model_name` (defaults to MODEL_MAIN)."""
+    model_name = model_name or MODEL_MAIN
+    if not model_name:
+        raise RuntimeError("MODEL_MAIN not set in environment")
+
+    # Configured outside _lock, which get_genai takes itself
+    genai = None if GEMINI_BASE_URL else get_genai()
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            from utils.resilient_model import ResilientModel
+
+            model = _models[model_name] = ResilientModel(
+                _base_model(model_name, genai),
+                rate_limit=GEMINI_RATE_LIMIT,
+                max_retries=GEMINI_MAX_RETRIES,
+                deadline=GEMINI_DEADLINE_S,
+            )
+        return model
@@ -0,0 +1,212 @@
+"""
+Instrumentation
+Structured timing and counter events for the compression pipeline.
+
+- span(name): wall and CPU time of a block, optionally copied into a dict
+  that ends up in CompressionResult.metadata["timings"]
+- count(name, value): token counts, LLM calls, cache hits/misses
+
+Events go to pluggable sinks:
+- JsonlSink: one JSON object per event appended to a file
+- PrometheusSink: cumulative counters, rendered in the text exposition format
+- HistogramSink: in-memory latency histograms with quantile estimates
+
+NULL_INSTRUMENTATION (the default everywhere) is disabled: span() returns a
+shared no-op context manager and count() returns immediately, so an
+uninstrumented pipeline pays one attribute check per stage.
+"""
+
+import bisect
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+# -------------------------------
+# Sinks
+# -------------------------------
+class Sink(ABC):
+    @abstractmethod
+    def emit(self, event: dict) -> None:
+        ...
+
+
+class JsonlSink(Sink):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def emit(self, event: dict) -> None:
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusSink(Sink):
+    """
+    Spans become <prefix>_span_seconds_total, <prefix>_span_cpu_seconds_total
+    and <prefix>_span_calls_total labelled by name; counters become
+    <prefix>_<name>_total with their attributes as labels.
+    """
+
+    def __init__(self, prefix: str = "prompt_compression"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, tuple], float] = {}
+
+    def _add(self, metric: str, labels: dict, value: float) -> None:
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        self._values[key] = self._values.get(key, 0.0) + value
+
+    def emit(self, event: dict) -> None:
+        with self._lock:
+            if event["type"] == "span":
+                labels = {"name": event["name"]}
+                self._add(f"{self.prefix}_span_seconds_total", labels, event["wall_ms"] / 1000)
+                self._add(f"{self.prefix}_span_cpu_seconds_total", labels, event["cpu_ms"] / 1000)
+                self._add(f"{self.prefix}_span_calls_total", labels, 1)
+            else:
+                self._add(f"{self.prefix}_{event['name']}_total", event.get("attrs", {}), event["value"])
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for (metric, labels), value in sorted(self._values.items()):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{metric}{{{label_text}}} {value:g}" if label_text else f"{metric} {value:g}")
+            return "\n".join(lines) + "\n"
+
+
+class HistogramSink(Sink):
+    """Wall-time histogram per span name, plus counter totals."""
+
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, buckets_ms: tuple = BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._histograms: dict[str, list[int]] = {}
+        self._sums: dict[str, float] = {}
+        self._counters: dict[str, float] = {}
+
+    def emit(self, event: dict) -> None:
+        with self._lock:
+            if event["type"] == "span":
+                counts = self._histograms.setdefault(event["name"], [0] * (len(self.buckets_ms) + 1))
+                counts[bisect.bisect_left(self.buckets_ms, event["wall_ms"])] += 1
+                self._sums[event["name"]] = self._sums.get(event["name"], 0.0) + event["wall_ms"]
+            else:
+                self._counters[event["name"]] = self._counters.get(event["name"], 0) + event["value"]
+
+    def _quantile(self, counts: list[int], q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        target = q * sum(counts)
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if n and seen >= target:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else float("inf")
+        return 0.0
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = {}
+            for name, counts in self._histograms.items():
+                total = sum(counts)
+                spans[name] = {
+                    "count": total,
+                    "mean_ms": self._sums[name] / total if total else 0.0,
+                    "p50_ms": self._quantile(counts, 0.50),
+                    "p90_ms": self._quantile(counts, 0.90),
+                    "p99_ms": self._quantile(counts, 0.99),
+                }
+            return {"spans": spans, "counters": dict(self._counters)}
+
+
+# -------------------------------
+# Spans
+# -------------------------------
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("owner", "name", "record", "cpu", "attrs", "wall_ms", "cpu_ms", "_wall0", "_cpu0")
+
+    def __init__(self, owner: "Instrumentation", name: str, record: dict | None, cpu: bool, attrs: dict):
+        self.owner = owner
+        self.name = name
+        self.record = record
+        self.cpu = cpu
+        self.attrs = attrs
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+
+    def __enter__(self):
+        self._cpu0 = time.thread_time() if self.cpu else 0.0
+        self._wall0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_ms = (time.perf_counter() - self._wall0) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu0) * 1000 if self.cpu else 0.0
+        if self.record is not None:
+            self.record[self.name] = {"wall_ms": round(self.wall_ms, 3), "cpu_ms": round(self.cpu_ms, 3)}
+        self.owner._emit({
+            "type": "span",
+            "name": self.name,
+            "wall_ms": self.wall_ms,
+            "cpu_ms": self.cpu_ms,
+            "error": exc[0].__name__ if exc[0] is not None else None,
+            **({"attrs": self.attrs} if self.attrs else {}),
+        })
+        return False
+
+
+class Instrumentation:
+    def __init__(self, sinks: list[Sink] | None = None, enabled: bool = True):
+        """
+        :param sinks: Event receivers; an enabled instance with no sinks still
+                      fills per-result timings.
+        :param enabled: False turns every call into a no-op.
+        """
+        self.sinks = list(sinks or [])
+        self.enabled = enabled
+
+    def span(self, name: str, record: dict | None = None, cpu: bool = True, **attrs):
+        """
+        Time a block. With `record`, {name: {"wall_ms", "cpu_ms"}} is stored in it.
+        cpu=False skips CPU time (for blocks that mostly await other threads).
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, record, cpu, attrs)
+
+    def count(self, name: str, value: float = 1, **attrs) -> None:
+        if not self.enabled:
+            return
+        self._emit({"type": "counter", "name": name, "value": value, **({"attrs": attrs} if attrs else {})})
+
+    def _emit(self, event: dict) -> None:
+        event["ts"] = time.time()
+        for sink in self.sinks:
+            sink.emit(event)
+
+
+NULL_INSTRUMENTATION = Instrumentation(enabled=False)
@@ -2,32 +2,19 @@
 Gemini LLM client.
 """
 
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import asyncio
 
-# --------------------------------------------------
-# Load environment variables
-# --------------------------------------------------
-load_dotenv()
+from utils.gemini_client import MODEL_MAIN, get_model
 
-GENAI_API_KEY = os.getenv("GENAI_API_KEY")
-MODEL_MAIN = os.getenv("MODEL_MAIN")
-
-if not GENAI_API_KEY:
-    raise RuntimeError("GENAI_API_KEY not set in environment")
-
-if not MODEL_MAIN:
-    raise RuntimeError("MODEL_MAIN not set in environment")
-
-# --------------------------------------------------
-# Configure Gemini
-# --------------------------------------------------
-genai.configure(api_key=GENAI_API_KEY)
-
-# Initialize model once
-_model = genai.GenerativeModel(MODEL_MAIN)
+def call_main_llm(prompt: str, model=None) -> str:
+    response = (model or get_model(MODEL_MAIN)).generate_content(prompt)
+    return response.text.strip()
 
-def call_main_llm(prompt: str) -> str:
-    response = _model.generate_content(prompt)
+async def call_main_llm_async(prompt: str, timeout: float | None = None, model=None) -> str:
+    """
+    Non-blocking variant of call_main_llm.
+    Raises asyncio.TimeoutError if the call takes longer than `timeout` seconds.
+    """
+    response = await asyncio.wait_for((model or get_model(MODEL_MAIN)).generate_content_async(prompt), timeout)
     return response.text.strip()
+
@@ -4,34 +4,26 @@ Uses a lightweight Gemini model (e.g., gemini-1.5-flash)
 to rewrite prompts concisely without losing semantics.
 """
 
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import asyncio
 
-# Load API key and configure
-load_dotenv()
-GENAI_API_KEY = os.getenv("GENAI_API_KEY")
-MODEL_COMPRESSOR = os.getenv("MODEL_MAIN")
+from utils.gemini_client import MODEL_MAIN, get_model
 
-if not GENAI_API_KEY:
-    raise RuntimeError("GENAI_API_KEY not set in environment")
+# Compression model (created on first call)
+MODEL_COMPRESSOR = MODEL_MAIN
 
-genai.configure(api_key=GENAI_API_KEY)
+SPLIT_MARKER = "Now, here is the text to summarize:"
 
-# Create compression model
-_model = genai.GenerativeModel(MODEL_COMPRESSOR)
 
-def call_compression_llm(prompt: str) -> str:
+def _build_request(prompt: str, target_tokens: int | None = None) -> tuple[str, str]:
     """
-    Rewrite or summarize a long instruction + content block more efficiently.
-    - Detects and separates 'instruction' and 'content' sections.
-    - Compresses only the content while preserving task context.
+    Split the prompt into its instruction and content parts and build the
+    system directive that compresses only the content.
+    Returns (instruction, system_prompt).
     """
 
     # 1️ Detect if the prompt has an instruction part
-    split_marker = "Now, here is the text to summarize:"
-    if split_marker in prompt:
-        instruction, content = prompt.split(split_marker, 1)
+    if SPLIT_MARKER in prompt:
+        instruction, content = prompt.split(SPLIT_MARKER, 1)
         instruction = instruction.strip()
         content = content.strip()
     else:
@@ -43,17 +35,49 @@ def call_compression_llm(prompt: str) -> str:
         "while preserving its full meaning, structure, and key details. "
         "Do NOT rewrite or remove any meta-instructions. "
         "Only shorten the content below the separator.\n\n"
-        "--- TEXT CONTENT START ---\n"
+        + (f"Keep the rewritten content under {target_tokens} tokens.\n\n" if target_tokens else "")
+        + "--- TEXT CONTENT START ---\n"
         f"{content}\n"
         "--- TEXT CONTENT END ---"
     )
+    return instruction, system_prompt
+
+
+def _reattach(instruction: str, rewritten: str) -> str:
+    # 4️ Reattach instruction if present
+    if instruction:
+        return f"{instruction}\n\n{SPLIT_MARKER}\n{rewritten}"
+    return rewritten
+
+
+def call_compression_llm(prompt: str, model=None, target_tokens: int | None = None) -> str:
+    """
+    Rewrite or summarize a long instruction + content block more efficiently.
+    - Detects and separates 'instruction' and 'content' sections.
+    - Compresses only the content while preserving task context.
+    - With target_tokens, asks for a rewrite under that many tokens.
+    """
+    instruction, system_prompt = _build_request(prompt, target_tokens)
 
     # 3️ Generate the rewritten text
-    response = _model.generate_content([system_prompt])
+    response = (model or get_model(MODEL_COMPRESSOR)).generate_content([system_prompt])
 
     rewritten = response.text.strip()
+    return _reattach(instruction, rewritten)
 
-    # 4️ Reattach instruction if present
-    if instruction:
-        return f"{instruction}\n\n{split_marker}\n{rewritten}"
-    return rewritten
\ No newline at end of file
+
+async def call_compression_llm_async(
+    prompt: str, timeout: float | None = None, model=None, target_tokens: int | None = None
+) -> str:
+    """
+    Non-blocking variant of call_compression_llm.
+    Raises asyncio.TimeoutError if the call takes longer than `timeout` seconds.
+    """
+    instruction, system_prompt = _build_request(prompt, target_tokens)
+
+    response = await asyncio.wait_for(
+        (model or get_model(MODEL_COMPRESSOR)).generate_content_async([system_prompt]), timeout
+    )
+
+    rewritten = response.text.strip()
+    return _reattach(instruction, rewritten)
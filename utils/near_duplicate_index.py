@@ -0,0 +1,203 @@
+"""
+NearDuplicateIndex
+MinHash LSH over rule-based output, for reusing the compression of a prompt
+that differs from an earlier one only by a timestamp, a name or spacing.
+
+- Signature: `num_perm` MinHash values over word 3-gram shingles, kept as
+  uint16 (b-bit MinHash) so a million entries fit in num_perm × 2 MB.
+- LSH: the signature is cut into `bands`; each band hashes into a
+  direct-mapped NumPy table (one slot per bucket, newest wins), so bucket
+  memory is fixed at bands × table_size × 4 bytes.
+- Candidates from all bands are verified by the share of equal signature
+  values (an estimate of Jaccard similarity) against `threshold`.
+- Storage is a ring of `capacity` slots; the oldest entry is evicted and
+  its bucket pointers are cleared.
+
+Lookups are a handful of NumPy operations, independent of the entry count.
+"""
+
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+
+_EMPTY = -1
+
+
+class NearDuplicateIndex:
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        capacity: int = 100_000,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        """
+        :param threshold: Minimum estimated Jaccard similarity for a match.
+        :param capacity: Entries kept; the oldest is evicted first.
+        :param num_perm: MinHash values per signature (a multiple of `bands`).
+        :param bands: LSH bands; more bands find less similar candidates.
+        :param shingle_size: Words per shingle.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+
+        self.threshold = threshold
+        self.capacity = capacity
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) >> 48 keeps 16 well-mixed bits
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2 ** 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self._table_size = max(1024, capacity)
+        self._signatures = np.zeros((capacity, num_perm), dtype=np.uint16)
+        self._tables = np.full((bands, self._table_size), _EMPTY, dtype=np.int32)
+        self._values: list = [None] * capacity
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def config(self) -> dict:
+        return {"threshold": self.threshold, "num_perm": self.num_perm, "bands": self.bands,
+                "shingle_size": self.shingle_size}
+
+    # -------------------------------
+    # Hashing
+    # -------------------------------
+    def _shingles(self, text: str) -> list[str]:
+        words = _WORD_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(words) <= k:
+            return [" ".join(words)] if words else [""]
+        return [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((hash(s) for s in set(self._shingles(text))), dtype=np.int64).view(np.uint64)
+        with np.errstate(over="ignore"):
+            mixed = hashes[:, None] * self._a + self._b
+        return (mixed.min(axis=0) >> np.uint64(48)).astype(np.uint16)
+
+    def _buckets(self, signature: np.ndarray) -> np.ndarray:
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            keys = (rows * self._band_mix).sum(axis=1)
+        return (keys % np.uint64(self._table_size)).astype(np.int64)
+
+    # -------------------------------
+    # Index
+    # -------------------------------
+    def _evict(self, slot: int) -> None:
+        buckets = self._buckets(self._signatures[slot])
+        band_ids = np.arange(self.bands)
+        owned = self._tables[band_ids, buckets] == slot
+        self._tables[band_ids[owned], buckets[owned]] = _EMPTY
+        self._values[slot] = None
+        self.evictions += 1
+
+    def add_signature(self, signature: np.ndarray, value) -> None:
+        with self._lock:
+            slot = self._next
+            if self._values[slot] is not None:
+                self._evict(slot)
+            self._signatures[slot] = signature
+            self._tables[np.arange(self.bands), self._buckets(signature)] = slot
+            self._values[slot] = value
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def add(self, text: str, value) -> None:
+        self.add_signature(self.signature(text), value)
+
+    def lookup_signature(self, signature: np.ndarray) -> tuple[object, float] | None:
+        with self._lock:
+            candidates = self._tables[np.arange(self.bands), self._buckets(signature)]
+            candidates = np.unique(candidates[candidates != _EMPTY])
+            if candidates.size:
+                similarity = (self._signatures[candidates] == signature).mean(axis=1)
+                best = int(similarity.argmax())
+                if similarity[best] >= self.threshold:
+                    self.hits += 1
+                    return self._values[int(candidates[best])], float(similarity[best])
+            self.misses += 1
+            return None
+
+    def lookup(self, text: str) -> tuple[object, float] | None:
+        """(stored value, estimated similarity) of the closest entry above threshold, or None."""
+        return self.lookup_signature(self.signature(text))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_bytes": self._signatures.nbytes + self._tables.nbytes,
+            }
+
+
+# -------------------------------
+# Patching a reused output
+# -------------------------------
+def word_swaps(old_source: str, new_source: str) -> dict[str, str] | None:
+    """
+    Word substitutions turning `old_source` into `new_source` (e.g. a new
+    timestamp or user name), or None when the two differ in any other way:
+    inserted or deleted words, replacements of unequal length, or one word
+    replaced differently (or kept) in different places. Only a pure
+    substitution can be carried into an output compressed from the old input.
+    """
+    from difflib import SequenceMatcher
+
+    old_words, new_words = old_source.split(), new_source.split()
+    swaps: dict[str, str] = {}
+    unchanged: set[str] = set()
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes():
+        if tag == "equal":
+            unchanged.update(old_words[i1:i2])
+            continue
+        if tag != "replace" or i2 - i1 != j2 - j1:
+            return None
+        for old, new in zip(old_words[i1:i2], new_words[j1:j2]):
+            if swaps.setdefault(old, new) != new:
+                return None
+    # A swapped word that also stays put elsewhere can't be replaced everywhere in the output
+    if not unchanged.isdisjoint(swaps):
+        return None
+    return swaps
+
+
+def swaps_preserved(swaps: dict[str, str], source: str, output: str) -> bool:
+    """
+    Whether every swapped word occurs in `output` as often as in `source`.
+    A stage that dropped or reworded it (e.g. "approve" → "approval") would
+    otherwise keep the old word, unpatched, in the reused output.
+    """
+    source_words, output_words = Counter(source.split()), Counter(output.split())
+    return all(output_words[old] == source_words[old] for old in swaps)
+
+
+def apply_swaps(swaps: dict[str, str], text: str) -> str:
+    """Replace whole words of `text` in one pass, so swaps never chain (Alice↔Bob works)."""
+    if not swaps:
+        return text
+    pattern = "|".join(re.escape(old) for old in sorted(swaps, key=len, reverse=True))
+    return re.sub(rf"(?<!\S)(?:{pattern})(?!\S)", lambda m: swaps[m.group()], text)
@@ -0,0 +1,300 @@
+"""
+ResilientModel
+Wraps a GenerativeModel-compatible object (the SDK model, RestGenerativeModel
+or the benchmark stub) with the call discipline every Gemini caller needs:
+
+- token-bucket rate limiting shared by all callers of the wrapper
+- retries with exponential backoff and full jitter on 429/5xx/timeouts,
+  honouring Retry-After when the server sends one
+- a per-call deadline covering every attempt and backoff sleep
+- in-flight deduplication: identical concurrent requests share one call
+
+generate_content / count_tokens and their async variants keep the SDK's
+signatures, plus an optional `deadline=` in seconds.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# google.api_core exception names, matched by name so the module is not imported here
+_RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "RequestTimeout",
+}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(exc, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if isinstance(code, int) and code in _RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in _RETRYABLE_NAMES
+
+
+class TokenBucket:
+    """`rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token (possibly going negative) and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class _LeaderCancelled(Exception):
+    """The shared call was cancelled by the caller that started it."""
+
+
+def _request_key(method: str, contents, kwargs: dict) -> str:
+    payload = json.dumps([method, contents, kwargs], sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResilientModel:
+    def __init__(
+        self,
+        model,
+        *,
+        rate_limit: float | None = None,
+        burst: int | None = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        deadline: float | None = 120.0,
+        dedup: bool = True,
+        seed: int | None = None,
+    ):
+        """
+        :param model: Object with generate_content(_async) / count_tokens(_async).
+        :param rate_limit: Requests per second across all callers (None = unlimited).
+        :param burst: Token bucket capacity (defaults to one second of rate).
+        :param max_retries: Retries after the first attempt for retryable errors.
+        :param backoff_base: First backoff ceiling in seconds; doubles per retry.
+        :param backoff_max: Upper bound of any single backoff.
+        :param deadline: Default seconds per call, attempts and backoff included (None = no deadline).
+        :param dedup: Share one in-flight call between identical concurrent requests.
+        """
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.dedup = dedup
+        self._rng = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._inflight_async: dict[tuple[int, str], asyncio.Future] = {}
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "deduplicated": 0, "failures": 0, "throttled_s": 0.0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def _bump(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += value
+
+    # -------------------------------
+    # Backoff
+    # -------------------------------
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after:
+            return min(self.backoff_max, float(retry_after))
+        # Full jitter: uniform over [0, base * 2^attempt]
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _remaining(deadline_at: float | None) -> float | None:
+        return None if deadline_at is None else deadline_at - time.monotonic()
+
+    @staticmethod
+    def _with_timeout(kwargs: dict, remaining: float | None) -> dict:
+        if remaining is None:
+            return kwargs
+        options = dict(kwargs.get("request_options") or {})
+        options["timeout"] = min(options.get("timeout", remaining), remaining)
+        return {**kwargs, "request_options": options}
+
+    # -------------------------------
+    # Sync
+    # -------------------------------
+    def _call(self, method: str, contents, kwargs: dict, deadline: float | None):
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        fn = getattr(self.model, method)
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self._bump("throttled_s", self.bucket.acquire())
+            remaining = self._remaining(deadline_at)
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"{method} deadline of {deadline}s exceeded")
+
+            self._bump("attempts")
+            try:
+                return fn(contents, **self._with_timeout(kwargs, remaining))
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._bump("failures")
+                    raise
+                delay = self._backoff(attempt, e)
+                remaining = self._remaining(deadline_at)
+                if remaining is not None and delay >= remaining:
+                    self._bump("failures")
+                    raise
+                logger.warning("%s failed (%s: %s); retry %d in %.2fs", method, type(e).__name__, e, attempt + 1, delay)
+                self._bump("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def _dedup_call(self, method: str, contents, kwargs: dict):
+        deadline = kwargs.pop("deadline", self.deadline)
+        self._bump("calls")
+        if not self.dedup:
+            return self._call(method, contents, kwargs, deadline)
+
+        key = _request_key(method, contents, kwargs)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats["deduplicated"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._call(method, contents, kwargs, deadline)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def generate_content(self, contents, **kwargs):
+        return self._dedup_call("generate_content", contents, kwargs)
+
+    def count_tokens(self, contents, **kwargs):
+        return self._dedup_call("count_tokens", contents, kwargs)
+
+    # -------------------------------
+    # Async
+    # -------------------------------
+    async def _call_async(self, method: str, contents, kwargs: dict, deadline: float | None):
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        fn = getattr(self.model, method)
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self._bump("throttled_s", await self.bucket.acquire_async())
+            remaining = self._remaining(deadline_at)
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"{method} deadline of {deadline}s exceeded")
+
+            self._bump("attempts")
+            try:
+                return await asyncio.wait_for(fn(contents, **self._with_timeout(kwargs, remaining)), remaining)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._bump("failures")
+                    raise
+                delay = self._backoff(attempt, e)
+                remaining = self._remaining(deadline_at)
+                if remaining is not None and delay >= remaining:
+                    self._bump("failures")
+                    raise
+                logger.warning("%s failed (%s: %s); retry %d in %.2fs", method, type(e).__name__, e, attempt + 1, delay)
+                self._bump("retries")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _dedup_call_async(self, method: str, contents, kwargs: dict):
+        deadline = kwargs.pop("deadline", self.deadline)
+        self._bump("calls")
+        if not self.dedup:
+            return await self._call_async(method, contents, kwargs, deadline)
+
+        # asyncio futures belong to one event loop
+        key = (id(asyncio.get_running_loop()), _request_key(method, contents, kwargs))
+        while True:
+            with self._lock:
+                future = self._inflight_async.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+                else:
+                    self._stats["deduplicated"] += 1
+            if leader:
+                break
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # The first waiter to wake up leads a fresh call; the rest follow it
+                continue
+
+        try:
+            result = await self._call_async(method, contents, kwargs, deadline)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only the leader's caller gave up: followers must not see its cancellation
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()   # followers may not exist; mark the exception retrieved
+            raise
+        finally:
+            with self._lock:
+                self._inflight_async.pop(key, None)
+
+    async def generate_content_async(self, contents, **kwargs):
+        return await self._dedup_call_async("generate_content_async", contents, kwargs)
+
+    async def count_tokens_async(self, contents, **kwargs):
+        return await self._dedup_call_async("count_tokens_async", contents, kwargs)
@@ -0,0 +1,150 @@
+"""
+RestGenerativeModel
+Minimal Gemini REST client (generateContent / countTokens) over a pool of
+keep-alive HTTP connections.
+
+Used instead of the SDK model when GEMINI_BASE_URL is set, e.g. to point
+the pipeline at benchmarks/gemini_stub_server.py. Responses expose the
+attributes the pipeline reads from the SDK (`.text`, `.usage_metadata`,
+`.total_tokens`). HTTP errors raise GeminiHTTPError with `.code` and
+`.retry_after`, which ResilientModel knows how to retry.
+"""
+
+import asyncio
+import http.client
+import json
+import threading
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+
+class GeminiHTTPError(Exception):
+    def __init__(self, code: int, message: str, retry_after: float | None = None):
+        super().__init__(f"HTTP {code}: {message}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+def _to_contents(contents) -> list[dict]:
+    """SDK-style contents (str, list of str, or chat messages) → REST `contents`."""
+    if isinstance(contents, str):
+        contents = [contents]
+    if contents and all(isinstance(item, dict) and "role" in item for item in contents):
+        return [
+            {
+                "role": message["role"],
+                "parts": [part if isinstance(part, dict) else {"text": str(part)} for part in message.get("parts", [])],
+            }
+            for message in contents
+        ]
+    return [{"role": "user", "parts": [part if isinstance(part, dict) else {"text": str(part)} for part in contents]}]
+
+
+class RestGenerativeModel:
+    def __init__(self, model_name: str, base_url: str, api_key: str | None = None,
+                 pool_size: int = 16, timeout: float = 60.0):
+        """
+        :param base_url: e.g. https://generativelanguage.googleapis.com or http://127.0.0.1:8089
+        :param pool_size: Idle keep-alive connections kept for reuse.
+        :param timeout: Socket timeout when the call has no request_options timeout.
+        """
+        self.model_name = model_name
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        parts = urlsplit(base_url)
+        self._https = parts.scheme == "https"
+        self._host = parts.netloc
+        self._prefix = parts.path.rstrip("/")
+
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    # -------------------------------
+    # Connection pool
+    # -------------------------------
+    def _acquire(self) -> http.client.HTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.connections_opened += 1
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, timeout=self.timeout)
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _post(self, method: str, body: dict, timeout: float | None) -> dict:
+        path = f"{self._prefix}/v1beta/models/{self.model_name}:{method}"
+        if self.api_key:
+            path += f"?key={self.api_key}"
+        payload = json.dumps(body).encode("utf-8")
+
+        conn = self._acquire()
+        try:
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            conn.request("POST", path, body=payload, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            if isinstance(e, OSError):
+                raise
+            raise ConnectionError(str(e)) from e
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+        if response.status >= 400:
+            retry_after = response.getheader("Retry-After")
+            try:
+                message = json.loads(data)["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = data.decode("utf-8", "replace")[:200]
+            raise GeminiHTTPError(response.status, message, float(retry_after) if retry_after else None)
+        return json.loads(data)
+
+    # -------------------------------
+    # SDK-compatible surface
+    # -------------------------------
+    @staticmethod
+    def _timeout(request_options: dict | None) -> float | None:
+        return (request_options or {}).get("timeout")
+
+    def generate_content(self, contents, request_options: dict | None = None, **kwargs):
+        body = {"contents": _to_contents(contents)}
+        if kwargs.get("generation_config"):
+            body["generationConfig"] = kwargs["generation_config"]
+        data = self._post("generateContent", body, self._timeout(request_options))
+        candidates = data.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return SimpleNamespace(
+            text="".join(part.get("text", "") for part in parts),
+            usage_metadata=data.get("usageMetadata"),
+        )
+
+    def count_tokens(self, contents, request_options: dict | None = None, **kwargs):
+        data = self._post("countTokens", {"contents": _to_contents(contents)}, self._timeout(request_options))
+        return SimpleNamespace(total_tokens=data.get("totalTokens", 0))
+
+    async def generate_content_async(self, contents, **kwargs):
+        return await asyncio.to_thread(self.generate_content, contents, **kwargs)
+
+    async def count_tokens_async(self, contents, **kwargs):
+        return await asyncio.to_thread(self.count_tokens, contents, **kwargs)
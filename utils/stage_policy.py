@@ -0,0 +1,146 @@
+"""
+StagePolicy
+Per-prompt decisions on whether the Lingua and LLM stages are worth running.
+
+- Lingua is skipped for inputs too short to prune.
+- The LLM rewrite is skipped for short inputs, when Lingua already removed
+  enough (utils.conditionUtil.should_use_llm_rewrite), while recent calls
+  are slower than the latency budget, and once the token budget for paid
+  calls is used up.
+
+Latency is an exponentially decaying average, and while it is over budget
+one probe call every `llm_probe_interval_s` still goes through, so the
+rewrite comes back once Gemini recovers. Budget skips depend on process
+state rather than on the prompt, so they are marked "transient" and
+PromptCompressor does not cache their results.
+
+Decisions are made on a local token estimate so they never cost a
+count_tokens round-trip. Every decision carries a reason, which
+PromptCompressor stores in CompressionResult.metadata["policy"].
+"""
+
+import threading
+import time
+
+from utils.conditionUtil import should_use_llm_rewrite
+from utils.token_counters import TokenCounter, ApproxTokenCounter
+
+
+class StagePolicy:
+    def __init__(
+        self,
+        min_lingua_tokens: int = 32,
+        min_llm_tokens: int = 128,
+        redundancy_factor: float = 0.85,
+        llm_latency_budget_s: float | None = None,
+        llm_token_budget: int | None = None,
+        counter: TokenCounter | None = None,
+        latency_decay: float = 0.2,
+        llm_probe_interval_s: float = 30.0,
+    ):
+        """
+        :param min_lingua_tokens: Inputs shorter than this skip Lingua.
+        :param min_llm_tokens: Lingua outputs shorter than this skip the rewrite.
+        :param redundancy_factor: Rewrite only if Lingua kept more than this share of tokens.
+        :param llm_latency_budget_s: Skip the rewrite while the recent call latency exceeds this.
+        :param llm_token_budget: Total tokens that may be sent to the rewrite over the policy's lifetime.
+        :param counter: Estimator used for decisions (defaults to ApproxTokenCounter).
+        :param latency_decay: Weight of the newest call in the latency average.
+        :param llm_probe_interval_s: While over the latency budget, let one call
+                                     through this often to re-measure.
+        """
+        self.min_lingua_tokens = min_lingua_tokens
+        self.min_llm_tokens = min_llm_tokens
+        self.redundancy_factor = redundancy_factor
+        self.llm_latency_budget_s = llm_latency_budget_s
+        self.llm_token_budget = llm_token_budget
+        self.counter = counter or ApproxTokenCounter()
+        self.latency_decay = latency_decay
+        self.llm_probe_interval_s = llm_probe_interval_s
+
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.llm_tokens_sent = 0
+        self.llm_probes = 0
+        self._llm_latency: float | None = None
+        self._last_probe = 0.0
+        self.skipped = {"lingua": 0, "llm": 0}
+
+    def config(self) -> dict:
+        """Settings that change decisions; part of the cache fingerprint."""
+        return {
+            "min_lingua_tokens": self.min_lingua_tokens,
+            "min_llm_tokens": self.min_llm_tokens,
+            "redundancy_factor": self.redundancy_factor,
+            "llm_latency_budget_s": self.llm_latency_budget_s,
+            "llm_token_budget": self.llm_token_budget,
+        }
+
+    def estimate(self, text: str) -> int:
+        return self.counter.count_text(text)
+
+    # -------------------------------
+    # Decisions
+    # -------------------------------
+    def decide_lingua(self, rule_output: str) -> dict:
+        tokens = self.estimate(rule_output)
+        if tokens < self.min_lingua_tokens:
+            return self._skip("lingua", f"short input ({tokens} < {self.min_lingua_tokens} tokens)")
+        return {"run": True, "reason": f"{tokens} tokens"}
+
+    def decide_llm(self, rule_output: str, lingua_output: str) -> dict:
+        tokens_in = self.estimate(rule_output)
+        tokens_out = tokens_in if lingua_output is rule_output else self.estimate(lingua_output)
+
+        if tokens_out < self.min_llm_tokens:
+            return self._skip("llm", f"short input ({tokens_out} < {self.min_llm_tokens} tokens)")
+        if tokens_in and not should_use_llm_rewrite(tokens_in, tokens_out, self.redundancy_factor):
+            return self._skip("llm", f"lingua kept {tokens_out / tokens_in:.2f} <= {self.redundancy_factor}")
+
+        reason = f"lingua kept {tokens_out / tokens_in:.2f} of {tokens_in} tokens"
+        with self._lock:
+            if self.llm_token_budget is not None and self.llm_tokens_sent + tokens_out > self.llm_token_budget:
+                self.skipped["llm"] += 1
+                return {"run": False, "reason": f"token budget ({self.llm_tokens_sent}/{self.llm_token_budget} used)",
+                        "transient": True}
+            latency = self._llm_latency
+            if self.llm_latency_budget_s is not None and latency is not None and latency > self.llm_latency_budget_s:
+                now = time.monotonic()
+                if now - self._last_probe < self.llm_probe_interval_s:
+                    self.skipped["llm"] += 1
+                    return {"run": False, "reason": f"latency budget ({latency:.2f}s > {self.llm_latency_budget_s}s)",
+                            "transient": True}
+                self._last_probe = now
+                self.llm_probes += 1
+                reason += f"; latency probe ({latency:.2f}s > {self.llm_latency_budget_s}s)"
+            # Reserve the budget now so concurrent decisions cannot overspend it
+            self.llm_calls += 1
+            self.llm_tokens_sent += tokens_out
+
+        return {"run": True, "reason": reason}
+
+    def _skip(self, stage: str, reason: str) -> dict:
+        with self._lock:
+            self.skipped[stage] += 1
+        return {"run": False, "reason": reason}
+
+    # -------------------------------
+    # Feedback
+    # -------------------------------
+    def record_llm_latency(self, seconds: float) -> None:
+        with self._lock:
+            if self._llm_latency is None:
+                self._llm_latency = seconds
+            else:
+                self._llm_latency += self.latency_decay * (seconds - self._llm_latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "llm_tokens_sent": self.llm_tokens_sent,
+                "recent_llm_latency_s": self._llm_latency or 0.0,
+                "llm_probes": self.llm_probes,
+                "skipped_lingua": self.skipped["lingua"],
+                "skipped_llm": self.skipped["llm"],
+            }
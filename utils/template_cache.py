@@ -0,0 +1,181 @@
+"""
+TemplateCache
+Recognizes recurring instruction prefixes so they are processed once.
+
+Most traffic is "<one of a few dozen fixed instructions> + <variable
+content>". A prompt's template prefix is found by:
+1. markers: everything up to and including the first configured marker
+   (by default the compression client's SPLIT_MARKER)
+2. a learned prefix trie: word pieces of every prompt's head are counted in
+   a trie; the longest prefix ending at a line break that at least
+   `min_occurrences` earlier prompts shared is taken as a template
+
+The per-template work (rule-based cleanup and token counts) is cached in an
+LRU of `max_templates` entries; callers only process the variable content.
+"""
+
+import itertools
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from utils.llm_compression_client import SPLIT_MARKER
+
+# Words and whitespace runs; whitespace is keyed as "\n" or " " in the trie so
+# a template followed by different amounts of blank space is still one path
+_PIECE_RE = re.compile(r"\S+|\s+")
+
+
+def _trie_key(piece: str) -> str:
+    if piece[0].isspace():
+        return "\n" if "\n" in piece else " "
+    return piece
+
+
+@dataclass
+class Template:
+    prefix: str
+    source: str               # "marker" or "learned"
+    rule_output: str = ""
+    tokens_before: int = 0
+    tokens_after_rule: int = 0
+    hits: int = 0
+    ready: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+
+class _Node:
+    __slots__ = ("children", "count")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.count = 0
+
+
+class TemplateCache:
+    def __init__(
+        self,
+        markers: tuple[str, ...] = (SPLIT_MARKER,),
+        learn: bool = True,
+        min_occurrences: int = 3,
+        min_prefix_chars: int = 32,
+        max_prefix_pieces: int = 256,
+        max_nodes: int = 200_000,
+        max_templates: int = 256,
+    ):
+        """
+        :param markers: Strings that end an instruction block; the first one found wins.
+        :param learn: Also detect unmarked prefixes with the prefix trie.
+        :param min_occurrences: Earlier prompts that must share a learned prefix.
+        :param min_prefix_chars: Shorter prefixes are not worth a template.
+        :param max_prefix_pieces: Head length (in word pieces) the trie looks at.
+        :param max_nodes: Trie size cap; once reached, only existing paths are counted.
+        :param max_templates: Cached templates; the least recently used is evicted.
+        """
+        self.markers = tuple(markers)
+        self.learn = learn
+        self.min_occurrences = min_occurrences
+        self.min_prefix_chars = min_prefix_chars
+        self.max_prefix_pieces = max_prefix_pieces
+        self.max_nodes = max_nodes
+        self.max_templates = max_templates
+
+        self._root = _Node()
+        self._nodes = 1
+        self._templates: OrderedDict[str, Template] = OrderedDict()
+        self._lock = threading.Lock()
+        self.misses = 0
+
+    def config(self) -> dict:
+        return {
+            "markers": list(self.markers),
+            "learn": self.learn,
+            "min_occurrences": self.min_occurrences,
+            "min_prefix_chars": self.min_prefix_chars,
+        }
+
+    # -------------------------------
+    # Detection
+    # -------------------------------
+    def _marker_prefix(self, prompt: str) -> str | None:
+        for marker in self.markers:
+            index = prompt.find(marker)
+            if index >= 0:
+                return prompt[: index + len(marker)]
+        return None
+
+    def _learned_prefix(self, pieces: list[str]) -> str | None:
+        """Longest already-frequent prefix ending at a line break; counts this prompt in."""
+        keys = [_trie_key(piece) for piece in pieces]
+        node, length, best = self._root, 0, None
+        for depth, key in enumerate(keys):
+            child = node.children.get(key)
+            if child is None or child.count < self.min_occurrences:
+                break
+            node = child
+            length += len(pieces[depth])
+            if key == "\n" and length >= self.min_prefix_chars:
+                best = depth + 1
+
+        # Count this prompt's head so recurring prefixes become templates
+        node = self._root
+        for key in keys:
+            child = node.children.get(key)
+            if child is None:
+                if self._nodes >= self.max_nodes:
+                    break
+                child = node.children[key] = _Node()
+                self._nodes += 1
+            child.count += 1
+            node = child
+
+        return "".join(pieces[:best]) if best else None
+
+    def split(self, prompt: str) -> tuple[Template, str] | None:
+        """
+        (template, content) when `prompt` starts with a known or learnable
+        template, else None. The template's cached fields are empty until
+        prepare() fills them.
+        """
+        prefix = self._marker_prefix(prompt) if self.markers else None
+        source = "marker"
+        with self._lock:
+            if prefix is None and self.learn:
+                head = itertools.islice((m.group() for m in _PIECE_RE.finditer(prompt)), self.max_prefix_pieces)
+                prefix = self._learned_prefix(list(head))
+                source = "learned"
+            if prefix is None or len(prefix) < self.min_prefix_chars:
+                self.misses += 1
+                return None
+
+            # Learned prefixes end in a blank run whose length varies; key without it
+            key = prefix.rstrip() if source == "learned" else prefix
+            template = self._templates.get(key)
+            if template is None:
+                template = self._templates[key] = Template(prefix=key, source=source)
+                while len(self._templates) > self.max_templates:
+                    self._templates.popitem(last=False)
+            else:
+                self._templates.move_to_end(key)
+            template.hits += 1
+            return template, prompt[len(prefix):]
+
+    @staticmethod
+    def prepare(template: Template, fill) -> Template:
+        """Run fill(template) once per template, even under concurrent callers."""
+        if not template.ready:
+            with template.lock:
+                if not template.ready:
+                    fill(template)
+                    template.ready = True
+        return template
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "templates": len(self._templates),
+                "hits": sum(t.hits for t in self._templates.values()),
+                "misses": self.misses,
+                "trie_nodes": self._nodes,
+            }
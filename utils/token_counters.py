@@ -0,0 +1,205 @@
+"""
+Token Counters
+--------------
+Pluggable token counting backends for the compression pipeline.
+
+Every counter exposes `count_text(text, operation)`. GeminiTokenCounter
+implements it with a `count_tokens` round-trip; the local backends below
+answer without touching the network:
+
+- ApproxTokenCounter: calibrated estimate from word and punctuation pieces.
+- SentencePieceTokenCounter: exact counts from a SentencePiece vocabulary file
+  (e.g. the Gemma tokenizer.model, which shares Gemini's vocabulary family).
+- VerifyingTokenCounter: wraps a local counter and samples a fraction of calls
+  against a remote counter to track drift.
+"""
+
+import math
+import os
+from abc import ABC, abstractmethod
+import random
+import re
+import threading
+from typing import Iterable
+
+
+class TokenCounter(ABC):
+    """Base interface for token counters used by the compressors."""
+
+    @abstractmethod
+    def count_text(self, text: str, operation: str = "") -> int:
+        ...
+
+    async def count_text_async(self, text: str, operation: str = "") -> int:
+        """Local counters answer inline; remote counters override this."""
+        return self.count_text(text, operation)
+
+
+# Words, numbers and single punctuation/symbol characters
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class ApproxTokenCounter(TokenCounter):
+    """
+    Estimates token counts from word and symbol pieces.
+
+    Each piece costs ceil(len / chars_per_token) tokens, so short words are
+    one token and long words split into several subword tokens. The result
+    is multiplied by `scale`, which `calibrate` fits against a reference
+    counter.
+    """
+
+    def __init__(self, chars_per_token: float = 6.0, scale: float = 1.0):
+        self.chars_per_token = chars_per_token
+        self.scale = scale
+
+    def _raw_count(self, text: str) -> float:
+        step = self.chars_per_token
+        total = 0.0
+        for piece in _PIECE_RE.findall(text):
+            n = len(piece)
+            total += 1 if n <= step else math.ceil(n / step)
+        return total
+
+    def count_text(self, text: str, operation: str = "") -> int:
+        if not text:
+            return 0
+        return max(1, round(self._raw_count(text) * self.scale))
+
+    def calibrate(self, samples: Iterable[str], reference: TokenCounter) -> float:
+        """
+        Fit `scale` so the summed estimate matches `reference` over `samples`.
+        Returns the new scale.
+        """
+        raw_total = 0.0
+        ref_total = 0
+        for text in samples:
+            raw_total += self._raw_count(text)
+            ref_total += reference.count_text(text, "calibration")
+        if raw_total:
+            self.scale = ref_total / raw_total
+        return self.scale
+
+
+class SentencePieceTokenCounter(TokenCounter):
+    """
+    Exact token counts from a local SentencePiece model file.
+    Requires the optional `sentencepiece` package.
+    """
+
+    def __init__(self, model_file: str | None = None):
+        model_file = model_file or os.getenv("TOKENIZER_MODEL_FILE")
+        if not model_file:
+            raise ValueError("SentencePieceTokenCounter needs a model file (or TOKENIZER_MODEL_FILE)")
+
+        try:
+            import sentencepiece as spm
+        except ImportError as e:
+            raise RuntimeError("sentencepiece is required for SentencePieceTokenCounter") from e
+
+        self.model_file = model_file
+        self._processor = spm.SentencePieceProcessor(model_file=model_file)
+
+    def count_text(self, text: str, operation: str = "") -> int:
+        if not text:
+            return 0
+        return len(self._processor.encode(text))
+
+
+class VerifyingTokenCounter(TokenCounter):
+    """
+    Answers from a local counter and checks a random sample of calls
+    against a remote counter, recording the drift between the two.
+    """
+
+    def __init__(
+        self,
+        local: TokenCounter,
+        remote: TokenCounter,
+        sample_rate: float = 0.01,
+        seed: int | None = None,
+    ):
+        self.local = local
+        self.remote = remote
+        self.sample_rate = sample_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.samples = 0
+        self._abs_error = 0
+        self._rel_error = 0.0
+        self.max_rel_error = 0.0
+
+    def count_text(self, text: str, operation: str = "") -> int:
+        local_count = self.local.count_text(text, operation)
+
+        with self._lock:
+            sampled = self._rng.random() < self.sample_rate
+        if sampled:
+            self.verify(text, local_count, operation)
+
+        return local_count
+
+    async def count_text_async(self, text: str, operation: str = "") -> int:
+        local_count = await self.local.count_text_async(text, operation)
+
+        with self._lock:
+            sampled = self._rng.random() < self.sample_rate
+        if sampled:
+            await self.verify_async(text, local_count, operation)
+
+        return local_count
+
+    def verify(self, text: str, local_count: int | None = None, operation: str = "") -> int:
+        """Count `text` remotely and record the error of the local count."""
+        if local_count is None:
+            local_count = self.local.count_text(text, operation)
+        return self._record(local_count, self.remote.count_text(text, operation))
+
+    async def verify_async(self, text: str, local_count: int | None = None, operation: str = "") -> int:
+        """verify() without blocking the event loop on the remote call."""
+        if local_count is None:
+            local_count = await self.local.count_text_async(text, operation)
+        return self._record(local_count, await self.remote.count_text_async(text, operation))
+
+    def _record(self, local_count: int, remote_count: int) -> int:
+        error = abs(local_count - remote_count)
+        rel = error / remote_count if remote_count else float(error > 0)
+        with self._lock:
+            self.samples += 1
+            self._abs_error += error
+            self._rel_error += rel
+            self.max_rel_error = max(self.max_rel_error, rel)
+        return remote_count
+
+    def drift(self) -> dict:
+        """Summary of the sampled local-vs-remote error."""
+        with self._lock:
+            n = self.samples
+            return {
+                "samples": n,
+                "mean_abs_error": self._abs_error / n if n else 0.0,
+                "mean_rel_error": self._rel_error / n if n else 0.0,
+                "max_rel_error": self.max_rel_error,
+            }
+
+
+def make_token_counter(backend: str | None = None, **kwargs) -> TokenCounter:
+    """
+    Build a counter by backend name: "gemini", "approx", "sentencepiece",
+    or "verify" (approx locally, sampled against Gemini).
+    Defaults to the TOKEN_COUNTER environment variable, then "gemini".
+    """
+    backend = (backend or os.getenv("TOKEN_COUNTER") or "gemini").lower()
+
+    if backend == "approx":
+        return ApproxTokenCounter(**kwargs)
+    if backend == "sentencepiece":
+        return SentencePieceTokenCounter(**kwargs)
+    if backend == "gemini":
+        from utils.GeminiTokenCounter import GeminiTokenCounter
+        return GeminiTokenCounter(**kwargs)
+    if backend == "verify":
+        from utils.GeminiTokenCounter import GeminiTokenCounter
+        return VerifyingTokenCounter(ApproxTokenCounter(), GeminiTokenCounter(), **kwargs)
+
+    raise ValueError(f"Unknown token counter backend: {backend}")